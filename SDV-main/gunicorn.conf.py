@@ -0,0 +1,25 @@
+# gunicorn.conf.py
+# gunicorn lo carga automáticamente desde el directorio de trabajo; las opciones de la
+# línea de comandos (Dockerfile, Procfile) tienen prioridad sobre las de este archivo.
+
+import os
+import shutil
+
+# Métricas de Prometheus compartidas entre workers (ver vacations/metrics.py)
+os.environ.setdefault(
+    'PROMETHEUS_MULTIPROC_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'prometheus')
+)
+
+def on_starting(server):
+    # Los archivos de una ejecución anterior sumarían valores de procesos que ya no existen
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+def child_exit(server, worker):
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
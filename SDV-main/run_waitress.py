@@ -1,7 +1,22 @@
 from waitress import serve
 from vacations import create_app
+from vacations.assets import MANIFEST_NAME, DIST_DIR, build_assets, vendor_assets
+import os
 import socket
 
+def prepare_assets():
+    """Descarga las librerías de terceros que falten y compila static/dist (flask sdv vendor-assets / build-assets)."""
+    static_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'vacations', 'static')
+    try:
+        downloaded = vendor_assets(static_root)
+    except OSError as e:
+        # Sin salida a internet: las librerías faltantes se siguen sirviendo desde el CDN
+        print(f"No se pudieron descargar las librerías de terceros: {e}")
+        downloaded = []
+    if downloaded or not os.path.exists(os.path.join(static_root, DIST_DIR, MANIFEST_NAME)):
+        build_assets(static_root)
+
+prepare_assets()
 app = create_app()
 
 def get_local_ip():
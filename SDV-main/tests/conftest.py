@@ -0,0 +1,58 @@
+# tests/conftest.py
+# Fixtures comunes: una aplicación con base de datos propia por test (los datos de
+# ejemplo de seed_database) y un cliente con login.
+#
+# Cada test que usa app corre con los dos motores. PostgreSQL necesita una base local
+# de pruebas en TEST_DATABASE_URL (postgresql://usuario@localhost/sdv_test): su esquema
+# public se borra y se recrea en cada test. Sin esa variable esos casos se omiten.
+
+import os
+
+import pytest
+
+from vacations import create_app
+
+BACKENDS = ('sqlite', 'postgresql')
+
+def reset_postgres(url):
+    import psycopg2
+
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    finally:
+        conn.close()
+
+@pytest.fixture(params=BACKENDS)
+def app(request, tmp_path):
+    if request.param == 'postgresql':
+        url = os.environ.get('TEST_DATABASE_URL')
+        if not url:
+            pytest.skip("PostgreSQL: defina TEST_DATABASE_URL con una base de pruebas")
+        reset_postgres(url)
+        database = {'DATABASE_URL': url}
+    else:
+        database = {'DATABASE': str(tmp_path / 'vacaciones.db'), 'DATABASE_URL': None}
+
+    app = create_app({'TESTING': True, 'SECRET_KEY': 'test', **database})
+    yield app
+    app.extensions['db_backend'].close()
+
+@pytest.fixture
+def backend(app):
+    return app.extensions['db_backend'].name
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+@pytest.fixture
+def login(client):
+    """login('rrhh') inicia sesión con uno de los usuarios de ejemplo (contraseña 123)."""
+    def login(username, password='123'):
+        client.get('/auth/logout')
+        response = client.post('/auth/login', data={'username': username, 'password': password})
+        assert response.status_code == 302, f"login de {username} falló"
+    return login
@@ -0,0 +1,37 @@
+# tests/test_all_requests.py
+# /hr/all_requests: el listado lee la base principal, la exportación la copia de reportes.
+
+import io
+
+import pytest
+
+from vacations import snapshot
+from vacations.db import get_db
+
+@pytest.fixture
+def stale_snapshot(app, backend):
+    """Copia de reportes tomada antes de cambiar una solicitud. Devuelve su id."""
+    if backend != 'sqlite':
+        pytest.skip("la copia de reportes solo existe con SQLite")
+    app.config.update(REPORT_SNAPSHOT=True, REPORT_SNAPSHOT_WRITES=10000, REPORT_SNAPSHOT_MAX_AGE=10000)
+    assert snapshot.refresh_locked(app) is not None
+    with app.app_context():
+        db = get_db()
+        request_id = db.execute("SELECT id FROM vacation_requests ORDER BY id LIMIT 1").fetchone()[0]
+        db.execute("UPDATE vacation_requests SET days_requested = 77.25 WHERE id = ?", (request_id,))
+        db.commit()
+    return request_id
+
+def test_interactive_list_reads_the_live_database(client, login, stale_snapshot):
+    login('rrhh')
+    html = client.get('/hr/all_requests').get_data(as_text=True)
+    assert '77.25' in html
+    assert 'Datos al' not in html
+
+def test_export_reads_the_snapshot(client, login, stale_snapshot):
+    openpyxl = pytest.importorskip('openpyxl')
+    login('rrhh')
+    response = client.get('/hr/all_requests?export=true')
+    sheet = openpyxl.load_workbook(io.BytesIO(response.data)).active
+    days = {row[0]: row[7] for row in sheet.iter_rows(min_row=2, values_only=True)}
+    assert days[stale_snapshot] != 77.25
@@ -0,0 +1,122 @@
+# tests/test_api.py
+# API /api/v1: paginación por cursor, alcance por rol, ?fields=, peticiones condicionales
+# y la conexión que la respuesta en streaming devuelve al pool.
+
+import pytest
+
+from vacations.db import get_db
+
+TOKEN = 'token-de-prueba'
+
+@pytest.fixture
+def api(app, client):
+    app.config['API_TOKEN'] = TOKEN
+    def get(path, **headers):
+        return client.get(path, headers={'Authorization': f'Bearer {TOKEN}', **headers})
+    return get
+
+def employee_id(app, username):
+    with app.app_context():
+        return get_db().execute("SELECT id FROM employees WHERE username = ?", (username,)).fetchone()[0]
+
+def execute(app, sql, params=()):
+    with app.app_context():
+        db = get_db()
+        db.execute(sql, params)
+        db.commit()
+
+def test_cursor_pages_cover_every_employee_once(app, api):
+    with app.app_context():
+        expected = [row[0] for row in get_db().execute("SELECT id FROM employees ORDER BY id").fetchall()]
+    seen, cursor = [], None
+    while True:
+        body = api('/api/v1/employees?limit=2' + (f'&cursor={cursor}' if cursor else '')).get_json()
+        assert len(body['data']) <= 2
+        seen.extend(item['id'] for item in body['data'])
+        cursor = body['next_cursor']
+        if cursor is None:
+            break
+    assert seen == expected
+
+def test_invalid_cursor_and_limit(api):
+    assert api('/api/v1/employees?cursor=no-es-un-cursor').status_code == 400
+    assert api('/api/v1/employees?limit=0').status_code == 400
+
+def test_requires_authentication(app, client):
+    app.config['API_TOKEN'] = TOKEN
+    assert client.get('/api/v1/employees').status_code == 401
+    assert client.get('/api/v1/employees', headers={'Authorization': 'Bearer otro'}).status_code == 401
+
+def test_employee_sees_only_themself(app, client, login):
+    ana = employee_id(app, 'empleado1')
+    login('empleado1')
+    assert [item['id'] for item in client.get('/api/v1/employees').get_json()['data']] == [ana]
+    assert client.get(f"/api/v1/employees/{employee_id(app, 'empleado2')}").status_code == 404
+    requests = client.get('/api/v1/requests').get_json()['data']
+    assert requests and {item['employee_id'] for item in requests} == {ana}
+
+def test_manager_sees_their_team(app, client, login):
+    jefe, ana = employee_id(app, 'jefe_ventas'), employee_id(app, 'empleado1')
+    execute(app, "UPDATE employees SET manager_id = ? WHERE id = ?", (jefe, ana))
+    login('jefe_ventas')
+    assert sorted(item['id'] for item in client.get('/api/v1/employees').get_json()['data']) == sorted([jefe, ana])
+    assert client.get(f"/api/v1/employees/{employee_id(app, 'empleado2')}/balances").status_code == 404
+
+def test_fields_selects_and_validates(api):
+    body = api('/api/v1/employees?fields=full_name,id').get_json()
+    assert body['data'] and all(list(item) == ['full_name', 'id'] for item in body['data'])
+    assert api('/api/v1/employees?fields=id,password').status_code == 400
+    assert api('/api/v1/employees?fields=,').status_code == 400
+    balances = api('/api/v1/balances?fields=id,balances&limit=2').get_json()['data']
+    assert all(set(item) == {'id', 'balances'} for item in balances)
+
+@pytest.mark.parametrize('path, sql', [
+    ('/api/v1/employees', "UPDATE employees SET job_title = 'Gerente' WHERE username = 'empleado1'"),
+    ('/api/v1/requests', "UPDATE vacation_requests SET days_requested = days_requested WHERE id = (SELECT MIN(id) FROM vacation_requests)"),
+])
+def test_if_none_match_returns_304_until_the_data_changes(app, api, path, sql):
+    first = api(path)
+    etag = first.headers['ETag']
+    repeat = api(path, **{'If-None-Match': etag})
+    assert repeat.status_code == 304
+    assert repeat.data == b''
+
+    execute(app, sql)
+    changed = api(path, **{'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+
+def test_request_counters_do_not_block_concurrent_writers(app, backend):
+    if backend != 'postgresql':
+        pytest.skip("SQLite ya serializa las escrituras")
+    pool = app.extensions['db_backend']
+    first, second = pool.connect(), pool.connect()
+    try:
+        before = first.execute("SELECT version FROM data_version WHERE name = 'vacation_periods'").fetchone()[0]
+        first.commit()
+        period_ids = [row[0] for row in first.execute("SELECT id FROM vacation_periods ORDER BY id LIMIT 2").fetchall()]
+        first.execute("UPDATE vacation_periods SET days_taken = days_taken WHERE id = ?", (period_ids[0],))
+        # Con el contador por sentencia la segunda transacción esperaba a la primera
+        second.execute("SET lock_timeout = '2s'")
+        second.execute("UPDATE vacation_periods SET days_taken = days_taken WHERE id = ?", (period_ids[1],))
+        second.commit()
+        first.commit()
+        # Una vez por transacción, al confirmarla
+        after = first.execute("SELECT version FROM data_version WHERE name = 'vacation_periods'").fetchone()[0]
+        assert after == before + 2
+    finally:
+        pool.release(first)
+        pool.release(second)
+
+def test_streamed_pages_return_their_connection(app, api):
+    pool = app.extensions['db_backend']
+    pool.pool_timeout = 2  # una conexión perdida agota el pool en segundos, no en 30
+    pages = getattr(pool, 'maxconn', 3) + 2
+    for _ in range(pages):
+        assert api('/api/v1/requests?limit=3').get_json()['data']
+    # Respuestas que el servidor cierra sin empezar el cuerpo (cliente desconectado)
+    for _ in range(pages):
+        with app.test_request_context('/api/v1/employees', headers={'Authorization': f'Bearer {TOKEN}'}):
+            app.full_dispatch_request().close()
+    # Sin fuga el pool sigue con conexiones libres
+    assert api('/api/v1/employees').status_code == 200
@@ -0,0 +1,16 @@
+# tests/test_attachments.py
+
+import io
+
+def test_max_content_length_follows_attachment_limit(app):
+    assert app.config['MAX_CONTENT_LENGTH'] > app.config['ATTACHMENT_MAX_SIZE']
+
+def test_oversized_upload_is_rejected_before_the_view(app, client, login):
+    login('empleado1')
+    app.config['MAX_CONTENT_LENGTH'] = 1024
+    response = client.post('/vacations/new', data={
+        'attachment': (io.BytesIO(b'x' * 4096), 'certificado.pdf'),
+    }, content_type='multipart/form-data', headers={'Referer': 'http://localhost/vacations/new'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/vacations/new')
+    assert 'supera el tamaño máximo' in client.get('/vacations/new').get_data(as_text=True)
@@ -0,0 +1,39 @@
+# tests/test_calendars.py
+# Los calendarios siguen mostrando las licencias ya archivadas (vacation_requests_all).
+
+import json
+from datetime import date
+
+import pytest
+from flask import template_rendered
+
+from vacations import archive
+from vacations.db import get_db
+
+@pytest.fixture
+def archived_leave(app):
+    """Licencia finalizada de Ana (empleado1) movida a vacation_requests_archive."""
+    with app.app_context():
+        db = get_db()
+        db.execute(
+            """
+            INSERT INTO vacation_requests (employee_id, start_date, end_date, request_type, days_requested, status)
+            VALUES ((SELECT id FROM employees WHERE username = 'empleado1'), ?, ?, 'FullDay', 3, 'Finalizado')
+            """,
+            (date(2001, 3, 5), date(2001, 3, 7))
+        )
+        db.commit()
+        assert archive.archive_requests(db, date(2001, 4, 1)) == 1
+
+def rendered_events(app, client, path):
+    events = []
+    def capture(sender, template, context, **extra):
+        events.extend(json.loads(context.get('calendar_events') or context.get('events') or '[]'))
+    with template_rendered.connected_to(capture, app):
+        client.get(path)
+    return events
+
+@pytest.mark.parametrize('path', ['/dashboard', '/hr/team_calendar'])
+def test_calendar_includes_archived_leave(app, client, login, archived_leave, path):
+    login('rrhh')
+    assert '2001-03-05' in [event['start'] for event in rendered_events(app, client, path)]
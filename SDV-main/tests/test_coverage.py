@@ -0,0 +1,58 @@
+# tests/test_coverage.py
+# Ausentes por día: solo empleados activos y conteos guardados dentro de la ventana.
+
+from datetime import date, timedelta
+
+import pytest
+
+from vacations import coverage
+from vacations.db import get_db
+
+START = date.today() + timedelta(days=30)
+
+@pytest.fixture
+def ana_absent(app):
+    """Vacaciones aprobadas de Ana (empleado1). Devuelve su departamento."""
+    with app.app_context():
+        db = get_db()
+        db.execute(
+            """
+            INSERT INTO vacation_requests (employee_id, start_date, end_date, request_type, days_requested, status)
+            VALUES ((SELECT id FROM employees WHERE username = 'empleado1'), ?, ?, 'FullDay', 3, 'Aprobado por RRHH')
+            """,
+            (START, START + timedelta(days=2))
+        )
+        db.commit()
+        return db.execute("SELECT department FROM employees WHERE username = 'empleado1'").fetchone()[0]
+
+def absent(app, department, start=START, end=START + timedelta(days=2)):
+    with app.test_request_context():
+        return coverage.absent_by_day(get_db(), start, end, [department])[department]
+
+def bucket_days(app):
+    with app.app_context():
+        return [row[0] for row in get_db().execute("SELECT day FROM coverage_buckets").fetchall()]
+
+def test_inactive_employees_are_not_counted(app, ana_absent):
+    assert absent(app, ana_absent)[START] == 1
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE employees SET is_active = 0 WHERE username = 'empleado1'")
+        db.commit()
+    # El cambio de estado invalida los conteos guardados
+    assert absent(app, ana_absent)[START] == 0
+
+def test_buckets_outside_the_window_are_not_kept(app, ana_absent):
+    far = date.today() + timedelta(days=coverage.BUCKET_WINDOW_DAYS + 100)
+    with app.app_context():
+        db = get_db()
+        db.execute(
+            "INSERT INTO coverage_buckets (department, day, absent) VALUES (?, ?, 0)",
+            (ana_absent, date.today() - timedelta(days=coverage.BUCKET_WINDOW_DAYS + 1))
+        )
+        db.commit()
+
+    assert absent(app, ana_absent, far, far + timedelta(days=9))[far] == 0
+    absent(app, ana_absent)
+    days = [day if isinstance(day, date) else date.fromisoformat(str(day)) for day in bucket_days(app)]
+    assert sorted(days) == [START + timedelta(days=i) for i in range(3)]
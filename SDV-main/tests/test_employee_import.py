@@ -0,0 +1,55 @@
+# tests/test_employee_import.py
+
+import io
+
+from vacations.db import get_backend, get_db
+from vacations.employee_import import import_employees
+
+def employee(username, **extra):
+    return {'username': username, 'full_name': f"Nombre {username}", 'hire_date': '01/02/2024', **extra}
+
+def test_duplicate_in_the_middle_of_a_batch(app):
+    """Un usuario creado por otra sesión a mitad del lote no deshace las filas anteriores."""
+    with app.app_context():
+        db = get_db()
+        backend = get_backend()
+
+        def rows():
+            yield 2, employee('nuevo1')
+            # Otra sesión crea nuevo2 después de que la importación precargó los usuarios
+            other = backend.connect()
+            other.execute(
+                "INSERT INTO employees (username, password, full_name, hire_date, role) VALUES ('nuevo2', 'x', 'Otra Sesión', '2024-01-01', 'Empleado')"
+            )
+            other.commit()
+            backend.release(other)
+            yield 3, employee('nuevo2')
+            yield 4, employee('nuevo3', manager_username='nuevo1')
+
+        report = import_employees(db, rows(), default_password='clave', workers=1)
+
+        assert [(entry['username'], entry['ok']) for entry in report] == [('nuevo1', True), ('nuevo2', False), ('nuevo3', True)]
+        assert report[1]['message'] == "el usuario ya existe"
+        created = {row['username']: row for row in db.execute(
+            "SELECT id, username, full_name, manager_id FROM employees WHERE username LIKE 'nuevo%'"
+        ).fetchall()}
+        assert set(created) == {'nuevo1', 'nuevo2', 'nuevo3'}
+        assert created['nuevo2']['full_name'] == 'Otra Sesión'
+        assert created['nuevo3']['manager_id'] == created['nuevo1']['id']
+
+def test_import_route_reports_each_row(client, login):
+    login('rrhh')
+    data = (
+        "Usuario,Nombre Completo,Fecha Contratación,Usuario Jefe\n"
+        "csv1,Uno,01/03/2024,rrhh\n"
+        "csv1,Repetido,01/03/2024,\n"
+        "csv2,Dos,fecha,\n"
+    ).encode('utf-8')
+    response = client.post('/hr/employees/import', data={
+        'file': (io.BytesIO(data), 'empleados.csv'), 'default_password': 'clave',
+    }, content_type='multipart/form-data')
+    html = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert "1 empleados creados, 2 filas con errores" in html
+    assert "repetido en el archivo" in html
+    assert "fecha de contratación inválida" in html
@@ -0,0 +1,24 @@
+# tests/test_metrics.py
+
+import pytest
+
+from vacations import create_app
+
+pytest.importorskip('prometheus_client')
+
+def make_app(tmp_path, **config):
+    return create_app({'SECRET_KEY': 'test', 'DATABASE': str(tmp_path / 'vacaciones.db'), 'DATABASE_URL': None, **config})
+
+def test_metrics_requires_token_and_has_a_single_charset(tmp_path):
+    client = make_app(tmp_path, METRICS=True, METRICS_TOKEN='secreto').test_client()
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer secreto'})
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].count('charset') == 1
+    assert b'sdv_pending_approvals' in response.data
+
+def test_metrics_without_token_is_not_registered_in_production(tmp_path):
+    assert make_app(tmp_path, METRICS=True).test_client().get('/metrics').status_code == 404
+
+def test_metrics_off_by_default(tmp_path):
+    assert make_app(tmp_path).test_client().get('/metrics').status_code == 404
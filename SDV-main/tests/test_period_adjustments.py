@@ -0,0 +1,79 @@
+# tests/test_period_adjustments.py
+# Ajuste masivo de saldos: la confirmación aplica una sola vez lo previsualizado.
+
+import html
+import math
+import re
+
+import pytest
+
+from vacations import period_adjustments
+from vacations.db import get_db
+from vacations.employee_import import ImportFormatError
+
+YEAR = 2095
+
+@pytest.fixture
+def ana(app):
+    with app.app_context():
+        db = get_db()
+        employee_id = db.execute("SELECT id FROM employees WHERE username = 'empleado1'").fetchone()[0]
+        leave_type_id = db.execute("SELECT id FROM leave_types ORDER BY id LIMIT 1").fetchone()[0]
+        db.execute(
+            "INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued, days_taken) VALUES (?, ?, ?, 10, 0)",
+            (employee_id, YEAR, leave_type_id)
+        )
+        db.commit()
+    return employee_id, leave_type_id
+
+def accrued(app, employee_id, leave_type_id):
+    with app.app_context():
+        return get_db().execute(
+            "SELECT total_days_accrued FROM vacation_periods WHERE employee_id = ? AND year = ? AND leave_type_id = ?",
+            (employee_id, YEAR, leave_type_id)
+        ).fetchone()[0]
+
+def preview(client, ana, days='5'):
+    employee_id, leave_type_id = ana
+    response = client.post('/hr/periods/bulk', data={
+        'source': 'form', 'mode': 'add', 'comment': 'Licencia especial', 'year': YEAR,
+        'employee_id': employee_id, f'days_{leave_type_id}': days,
+    })
+    page = response.get_data(as_text=True)
+    fields = dict(re.findall(r'name="(payload|confirm_token|mode|comment)" value="([^"]*)"', page))
+    return {name: html.unescape(value) for name, value in fields.items()}
+
+def test_add_mode_confirmation_applies_once(app, client, login, ana):
+    login('rrhh')
+    confirm = preview(client, ana)
+    assert client.post('/hr/periods/bulk/apply', data=confirm).status_code == 302
+    # Doble clic / reenvío del mismo formulario
+    response = client.post('/hr/periods/bulk/apply', data=confirm)
+    assert response.headers['Location'].endswith('/hr/periods/bulk')
+    assert accrued(app, *ana) == 15
+    assert 'ya se aplicó' in client.get('/hr/periods/bulk').get_data(as_text=True)
+
+def test_confirmation_is_rejected_if_periods_changed(app, client, login, ana):
+    login('rrhh')
+    confirm = preview(client, ana)
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE vacation_periods SET total_days_accrued = 12 WHERE year = ?", (YEAR,))
+        db.commit()
+    client.post('/hr/periods/bulk/apply', data=confirm)
+    assert accrued(app, *ana) == 12
+    assert 'cambiaron desde la vista previa' in client.get('/hr/periods/bulk').get_data(as_text=True)
+
+@pytest.mark.parametrize('days', ['nan', 'inf', '-Infinity'])
+def test_non_finite_amounts_are_rejected(client, login, ana, days):
+    login('rrhh')
+    employee_id, leave_type_id = ana
+    response = client.post('/hr/periods/bulk', data={
+        'source': 'form', 'mode': 'add', 'comment': 'x', 'year': YEAR,
+        'employee_id': employee_id, f'days_{leave_type_id}': days,
+    })
+    assert response.status_code == 302
+
+def test_decode_rejects_non_finite_days():
+    with pytest.raises(ImportFormatError):
+        period_adjustments.decode([[1, YEAR, 1, math.nan]])
@@ -0,0 +1,55 @@
+# tests/test_query_budget.py
+# Presupuestos de consultas por petición (ver vacations/testing.py): un N+1 nuevo hace
+# fallar el test. Los datos extra verifican que la cantidad no crece con las filas.
+
+from datetime import date, timedelta
+
+import pytest
+
+from vacations.db import get_db
+from vacations.testing import query_budget
+
+def add_requests(app, status, count=20):
+    """Agrega solicitudes de Ana (empleado1) y Carlos (empleado2) en el estado indicado. Devuelve sus ids."""
+    with app.app_context():
+        db = get_db()
+        ids = []
+        for i in range(count):
+            start = date(2030, 1, 7) + timedelta(days=7 * i)
+            username = 'empleado1' if i % 2 == 0 else 'empleado2'
+            db.execute(
+                """
+                INSERT INTO vacation_requests (employee_id, start_date, end_date, request_type, days_requested, status)
+                VALUES ((SELECT id FROM employees WHERE username = ?), ?, ?, 'FullDay', 2, ?)
+                """,
+                (username, start, start + timedelta(days=1), status)
+            )
+            ids.append(db.execute("SELECT MAX(id) FROM vacation_requests").fetchone()[0])
+        db.commit()
+    return ids
+
+@pytest.mark.parametrize('username, budget', [('rrhh', 11), ('jefe_ventas', 6), ('empleado1', 6)])
+def test_dashboard(app, client, login, username, budget):
+    add_requests(app, 'Aprobado por RRHH')
+    add_requests(app, 'Pendiente')
+    login(username)
+    # La primera visita actualiza estados por fecha y carga el caché de referencia
+    client.get('/dashboard')
+    with query_budget(app, budget):
+        assert client.get('/dashboard').status_code == 200
+
+def test_hr_approve_request(app, client, login):
+    request_id = add_requests(app, 'Aprobado por Jefe', count=1)[0]
+    login('rrhh')
+    with query_budget(app, 7):
+        response = client.post(f'/hr/approve/{request_id}')
+    assert response.status_code == 302
+    with app.app_context():
+        status = get_db().execute("SELECT status FROM vacation_requests WHERE id = ?", (request_id,)).fetchone()[0]
+    assert status == 'Aprobado por RRHH'
+
+def test_budget_exceeded_lists_statements(app, client, login):
+    login('rrhh')
+    with pytest.raises(AssertionError, match="presupuesto: 1"):
+        with query_budget(app, 1):
+            client.get('/dashboard')
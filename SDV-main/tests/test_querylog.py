@@ -0,0 +1,12 @@
+# tests/test_querylog.py
+
+import logging
+
+def test_slow_query_log_omits_parameters(app, client, caplog):
+    app.config['SLOW_QUERY_MS'] = 1e-9  # toda consulta es lenta
+    with caplog.at_level(logging.WARNING):
+        client.post('/auth/login', data={'username': 'usuario_secreto', 'password': 'x'})
+    slow = [record.getMessage() for record in caplog.records if record.getMessage().startswith('Consulta lenta')]
+    assert slow
+    assert not any('usuario_secreto' in message for message in slow)
+    assert all('parámetros)' in message for message in slow)
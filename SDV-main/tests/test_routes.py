@@ -0,0 +1,30 @@
+# tests/test_routes.py
+# Las páginas principales responden para cada rol, con los dos motores.
+
+import pytest
+
+PAGES = (
+    '/dashboard', '/vacations/new', '/vacations/manage', '/hr/approvals', '/hr/all_requests',
+    '/hr/periods', '/hr/stats', '/hr/team_calendar', '/hr/employees', '/hr/cancellations',
+    '/hr/all_requests?export=true', '/hr/generate_periods',
+)
+
+@pytest.mark.parametrize('username', ['rrhh', 'asistente_rrhh', 'jefe_ventas', 'empleado1'])
+def test_pages(client, login, username):
+    login(username)
+    for page in PAGES:
+        response = client.get(page)
+        assert response.status_code in (200, 302), (username, page, response.status_code)
+
+def test_login_rejects_wrong_password(client):
+    response = client.post('/auth/login', data={'username': 'rrhh', 'password': 'incorrecta'})
+    assert response.status_code == 200
+
+def test_schema_setup_is_skipped_when_unchanged(app, backend, capsys):
+    if backend != 'postgresql':
+        pytest.skip("solo PostgreSQL guarda el hash del esquema")
+    from vacations import create_app
+
+    second = create_app({**app.config})
+    second.extensions['db_backend'].close()
+    assert "Aplicando schema_postgres.sql" not in capsys.readouterr().out
@@ -0,0 +1,48 @@
+# tests/test_transitions.py
+# El jefe solo aprueba o rechaza solicitudes en estado Pendiente.
+
+from datetime import date
+
+import pytest
+
+from vacations.db import get_db
+
+def state(app, request_id):
+    """(estado de la solicitud, días tomados de Ana en total)."""
+    with app.app_context():
+        db = get_db()
+        status = db.execute("SELECT status FROM vacation_requests WHERE id = ?", (request_id,)).fetchone()[0]
+        taken = db.execute(
+            "SELECT SUM(days_taken) FROM vacation_periods WHERE employee_id = (SELECT id FROM employees WHERE username = 'empleado1')"
+        ).fetchone()[0]
+        return status, taken
+
+@pytest.fixture
+def hr_approved(app, client, login):
+    """Solicitud de Ana (a cargo de jefe_ventas) aprobada por su jefe y por RRHH (días descontados). Devuelve su id."""
+    with app.app_context():
+        db = get_db()
+        db.execute("UPDATE employees SET manager_id = (SELECT id FROM employees WHERE username = 'jefe_ventas') WHERE username = 'empleado1'")
+        db.execute(
+            """
+            INSERT INTO vacation_requests (employee_id, start_date, end_date, request_type, days_requested, status)
+            VALUES ((SELECT id FROM employees WHERE username = 'empleado1'), ?, ?, 'FullDay', 2, 'Pendiente')
+            """,
+            (date(2031, 2, 3), date(2031, 2, 4))
+        )
+        db.commit()
+        request_id = db.execute("SELECT MAX(id) FROM vacation_requests").fetchone()[0]
+    login('jefe_ventas')
+    client.post(f'/vacations/approve/{request_id}')
+    login('rrhh')
+    client.post(f'/hr/approve/{request_id}')
+    assert state(app, request_id)[0] == 'Aprobado por RRHH'
+    return request_id
+
+@pytest.mark.parametrize('action', ['approve', 'reject'])
+def test_manager_cannot_act_on_hr_approved_request(app, client, login, hr_approved, action):
+    before = state(app, hr_approved)
+    login('jefe_ventas')
+    client.post(f'/vacations/{action}/{hr_approved}')
+    assert state(app, hr_approved) == before
+    assert 'No se pudo encontrar la solicitud' in client.get('/vacations/manage').get_data(as_text=True)
@@ -0,0 +1,97 @@
+# tests/test_writer.py
+# Hilo escritor (solo SQLite): timeout, contexto de aplicación de las unidades,
+# escrituras de la petición sin confirmar antes de run_write y reinicio del hilo.
+
+import threading
+from concurrent.futures import Future
+
+import pytest
+
+from vacations import metrics
+from vacations.db import get_db
+from vacations.writer import WriteTimeout, execute_write, run_write
+
+@pytest.fixture
+def blocked_writer(app, backend):
+    """Ocupa el hilo escritor hasta que el test libera el evento."""
+    if backend != 'sqlite':
+        pytest.skip("el hilo escritor solo existe con SQLite")
+    release = threading.Event()
+    started = threading.Event()
+
+    def hold(conn):
+        started.set()
+        release.wait(10)
+
+    future = app.extensions['write_coordinator'].submit(hold)
+    assert started.wait(5)
+    yield release
+    release.set()
+    future.result(5)
+
+def period_count(app, year):
+    with app.app_context():
+        return get_db().execute("SELECT COUNT(*) FROM vacation_periods WHERE year = ?", (year,)).fetchone()[0]
+
+def test_timeout_cancels_the_pending_unit(app, blocked_writer):
+    with app.test_request_context():
+        with pytest.raises(WriteTimeout) as info:
+            run_write(lambda conn: conn.execute(
+                "INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued, days_taken) VALUES (4, 2090, 1, 5, 0)"
+            ), timeout=0.1)
+    assert info.value.applied is False
+    blocked_writer.set()
+    # La unidad cancelada no se ejecuta cuando el escritor se libera
+    with app.test_request_context():
+        run_write(lambda conn: None, timeout=5)
+    assert period_count(app, 2090) == 0
+
+def test_timeout_is_reported_with_flash_and_redirect(app, client, login, blocked_writer):
+    login('rrhh')
+    app.config['WRITE_TIMEOUT'] = 0.1
+    response = client.post('/hr/period/add', data={
+        'employee_id': 4, 'year': 2091, 'total_days_accrued': 10, 'leave_type_id': 1,
+    }, headers={'Referer': 'http://localhost/hr/period/add'})
+    assert response.status_code == 302
+    assert response.headers['Location'].endswith('/hr/period/add')
+    assert 'La base de datos está ocupada' in client.get('/hr/period/add').get_data(as_text=True)
+
+def test_units_see_the_writer_connection_through_get_db(app, backend):
+    if backend != 'sqlite':
+        pytest.skip("el hilo escritor solo existe con SQLite")
+    with app.test_request_context():
+        assert run_write(lambda conn: get_db() is conn, timeout=5)
+
+def test_uncommitted_request_write_does_not_stall_run_write(app, backend):
+    if backend != 'sqlite':
+        pytest.skip("el hilo escritor solo existe con SQLite")
+    app.config['WRITE_TIMEOUT'] = 2
+    with app.test_request_context():
+        db = get_db()
+        db.execute("UPDATE employees SET job_title = 'Analista' WHERE id = 4")
+        execute_write(
+            "INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued, days_taken) VALUES (4, 2092, 1, 5, 0)"
+        )
+    assert period_count(app, 2092) == 1
+    with app.app_context():
+        assert get_db().execute("SELECT job_title FROM employees WHERE id = 4").fetchone()[0] == 'Analista'
+
+def test_dead_writer_restarts_on_the_existing_queue(app, backend):
+    if backend != 'sqlite':
+        pytest.skip("el hilo escritor solo existe con SQLite")
+    coordinator = app.extensions['write_coordinator']
+    with app.test_request_context():
+        run_write(lambda conn: None, timeout=5)
+    # Simula un hilo escritor muerto con una unidad ya encolada
+    coordinator._thread = threading.Thread(target=lambda: None)
+    coordinator._thread.start()
+    coordinator._thread.join()
+    queued = coordinator._queue
+    pending = Future()
+    queued.put((lambda conn: 'encolada', pending))
+    metrics.write_queue_changed(1)
+
+    with app.test_request_context():
+        assert run_write(lambda conn: 'nueva', timeout=5) == 'nueva'
+    assert coordinator._queue is queued
+    assert pending.result(5) == 'encolada'
@@ -0,0 +1,104 @@
+# vacations/accrual.py
+# Motor de acumulación de días según políticas de antigüedad configurables
+# (tabla accrual_policies: escalas por tipo de licencia y empresa).
+
+from .db import get_db
+
+# Antigüedad en años cumplidos al aniversario de ingreso dentro del año del periodo.
+_SENIORITY_SQL = "({year} - CAST(strftime('%Y', {hire_date}) AS INTEGER))"
+
+# Días según la escala aplicable: primero las escalas propias de la empresa del
+# empleado y, si ninguna aplica, la escala general (company IS NULL).
+_POLICY_DAYS_SQL = """(
+    SELECT ap.days FROM accrual_policies ap
+    WHERE ap.leave_type_id = {leave_type_id}
+      AND (ap.company = {company} OR ap.company IS NULL)
+      AND (ap.max_years IS NULL OR {seniority} <= ap.max_years)
+    ORDER BY ap.company IS NULL, ap.max_years IS NULL, ap.max_years
+    LIMIT 1
+)"""
+
+def policy_days_sql(leave_type_id, company, year, hire_date):
+    """
+    Devuelve la subconsulta SQL que calcula los días otorgados para las columnas
+    indicadas, para reutilizarla en sentencias masivas (INSERT/UPDATE ... SELECT).
+    """
+    seniority = _SENIORITY_SQL.format(year=year, hire_date=hire_date)
+    return _POLICY_DAYS_SQL.format(leave_type_id=leave_type_id, company=company, seniority=seniority)
+
+def accrued_days_for(hire_date, year, leave_type_id, company=None):
+    """
+    Días otorgados para un empleado según la política vigente, o None si el tipo de
+    licencia no tiene escala configurada.
+    """
+    db = get_db()
+    row = db.execute(
+        "SELECT " + policy_days_sql('?', '?', '?', '?') + " AS days",
+        (leave_type_id, company, year, hire_date)
+    ).fetchone()
+    return row['days'] if row else None
+
+def _expected_periods_sql(year=None, leave_type_id=None, include_adjusted=False):
+    """Construye la consulta de periodos cuyo total difiere del que indica la política."""
+    conditions = ["EXISTS (SELECT 1 FROM accrual_policies p WHERE p.leave_type_id = vp.leave_type_id)"]
+    params = []
+    if year:
+        conditions.append("vp.year = ?")
+        params.append(year)
+    if leave_type_id:
+        conditions.append("vp.leave_type_id = ?")
+        params.append(leave_type_id)
+    if not include_adjusted:
+        # Los periodos ajustados manualmente por RRHH no se recalculan
+        conditions.append("(vp.adjustment_comment IS NULL OR vp.adjustment_comment = '')")
+
+    query = f"""
+        SELECT * FROM (
+            SELECT vp.id AS period_id, vp.total_days_accrued AS current_days,
+                   {policy_days_sql('vp.leave_type_id', 'e.company', 'vp.year', 'e.hire_date')} AS expected_days
+            FROM vacation_periods vp
+            JOIN employees e ON vp.employee_id = e.id
+            WHERE {' AND '.join(conditions)}
+        )
+        WHERE expected_days IS NOT NULL AND expected_days != current_days
+    """
+    return query, params
+
+def preview_recalculation(year=None, leave_type_id=None, include_adjusted=False):
+    """
+    Lista los periodos que cambiarían al aplicar la política vigente, con el valor
+    actual y el nuevo, sin modificar nada.
+    """
+    diff_query, params = _expected_periods_sql(year, leave_type_id, include_adjusted)
+    db = get_db()
+    return db.execute(
+        f"""
+        SELECT d.period_id, d.current_days, d.expected_days, d.expected_days - d.current_days AS difference,
+               vp.year, vp.days_taken, e.full_name, e.company, lt.name AS leave_name
+        FROM ({diff_query}) d
+        JOIN vacation_periods vp ON vp.id = d.period_id
+        JOIN employees e ON vp.employee_id = e.id
+        JOIN leave_types lt ON vp.leave_type_id = lt.id
+        ORDER BY e.full_name, vp.year, lt.name
+        """,
+        params
+    ).fetchall()
+
+def apply_recalculation(year=None, leave_type_id=None, include_adjusted=False):
+    """
+    Recalcula total_days_accrued de todos los periodos afectados en una sola sentencia.
+    Devuelve la cantidad de periodos actualizados.
+    """
+    diff_query, params = _expected_periods_sql(year, leave_type_id, include_adjusted)
+    db = get_db()
+    cur = db.execute(
+        f"""
+        UPDATE vacation_periods SET total_days_accrued = d.expected_days
+        FROM ({diff_query}) d
+        WHERE vacation_periods.id = d.period_id
+        """,
+        params
+    )
+    updated = cur.rowcount
+    db.commit()
+    return updated
@@ -1,24 +1,18 @@
-import sqlite3
-from ldap3 import Server, Connection, ALL
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 import os
 from flask import current_app
 
-def get_db_connection(db_path):
-    """Crea una conexión a la base de datos usando la ruta proporcionada."""
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    return conn
+def get_db_connection():
+    """Crea una conexión propia (fuera de la petición) con el motor configurado."""
+    return current_app.extensions['db_backend'].connect()
 
 def sync_users_from_ad(config):
     """
     Se conecta al Directorio Activo, obtiene los usuarios y actualiza la BD local.
     """
-    # --- CORRECCIÓN AQUÍ ---
-    # La función ahora obtiene la ruta de la base de datos desde la configuración
-    # de la aplicación, en lugar de recibirla como un argumento.
-    db_path = current_app.config['DATABASE']
+    # ldap3 se importa aquí: solo se necesita durante la sincronización
+    from ldap3 import Server, Connection, ALL
 
     server = Server(config['server'], port=config['port'], use_ssl=config['use_ssl'], get_info=ALL)
     conn = Connection(server, user=config['user'], password=config['password'], auto_bind=True)
@@ -48,7 +42,7 @@ def sync_users_from_ad(config):
     if not ad_users:
         raise Exception("No se encontraron usuarios en el Directorio Activo con los filtros proporcionados.")
 
-    db_conn = get_db_connection(db_path)
+    db_conn = get_db_connection()
     db_cur = db_conn.cursor()
 
     # Obtener solo los usuarios gestionados por AD para la comparación
@@ -124,7 +118,7 @@ def sync_users_from_ad(config):
         deactivated_count += 1
 
     db_conn.commit()
-    db_conn.close()
+    current_app.extensions['db_backend'].release(db_conn)
 
     return {
         "created": created_count,
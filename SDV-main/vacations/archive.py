@@ -0,0 +1,100 @@
+# vacations/archive.py
+# Partición caliente/fría de las solicitudes.
+#
+# vacation_requests guarda solo el conjunto de trabajo. Las solicitudes cerradas
+# (Finalizado, Rechazado, Anulado) que terminaron hace más de ARCHIVE_AFTER_DAYS días se
+# mueven a vacation_requests_archive con flask sdv archive-requests (apto para cron),
+# junto con su attachment_path: los archivos quedan en UPLOAD_FOLDER.
+#
+# Los reportes, exportaciones, impresiones y calendarios leen la vista
+# vacation_requests_all (ambas tablas). Al borrar de la tabla caliente, los triggers de
+# intervalos y de cobertura quitan las filas archivadas de sus índices.
+
+from datetime import date, datetime, timedelta
+
+CLOSED_STATUSES = ('Finalizado', 'Rechazado', 'Anulado')
+
+# Columnas de vacation_requests (el orden físico difiere entre SQLite y PostgreSQL)
+REQUEST_COLUMNS = (
+    'id', 'employee_id', 'start_date', 'end_date', 'start_time', 'end_time', 'request_type',
+    'leave_type_id', 'days_requested', 'replacement_name', 'replacement_employee_id', 'status',
+    'cancellation_reason', 'interruption_reason', 'modification_reason', 'attachment_path',
+    'request_date', 'manager_approval_date', 'hr_approval_date', 'version',
+)
+_COLUMNS_SQL = ', '.join(REQUEST_COLUMNS)
+
+def setup_archive(cur):
+    """Crea la tabla de archivo y la vista vacation_requests_all (SQLite)."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS vacation_requests_archive (
+        id INTEGER PRIMARY KEY,
+        employee_id INTEGER NOT NULL,
+        start_date DATE NOT NULL,
+        end_date DATE NOT NULL,
+        start_time TEXT,
+        end_time TEXT,
+        request_type TEXT NOT NULL,
+        leave_type_id INTEGER,
+        days_requested REAL NOT NULL,
+        replacement_name TEXT,
+        replacement_employee_id INTEGER,
+        status TEXT NOT NULL,
+        cancellation_reason TEXT,
+        interruption_reason TEXT,
+        modification_reason TEXT,
+        attachment_path TEXT,
+        request_date TIMESTAMP,
+        manager_approval_date TIMESTAMP,
+        hr_approval_date TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 0,
+        archived_at TIMESTAMP NOT NULL
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_vacation_requests_archive_employee ON vacation_requests_archive (employee_id, start_date)")
+    cur.execute(f"""
+    CREATE VIEW IF NOT EXISTS vacation_requests_all AS
+        SELECT {_COLUMNS_SQL} FROM vacation_requests
+        UNION ALL
+        SELECT {_COLUMNS_SQL} FROM vacation_requests_archive
+    """)
+
+def horizon(days, today=None):
+    """Fecha de corte: se archivan las solicitudes que terminaron antes de este día."""
+    return (today or date.today()) - timedelta(days=days)
+
+def _closed_before(before):
+    placeholders = ', '.join('?' for _ in CLOSED_STATUSES)
+    return f"status IN ({placeholders}) AND end_date < ?", (*CLOSED_STATUSES, before)
+
+def preview_archive(db, before):
+    """Cantidad de solicitudes a archivar por estado."""
+    condition, params = _closed_before(before)
+    rows = db.execute(
+        f"SELECT status, COUNT(*) AS total FROM vacation_requests WHERE {condition} GROUP BY status ORDER BY status", params
+    ).fetchall()
+    return {row['status']: row['total'] for row in rows}
+
+def archive_requests(db, before, batch_size=500):
+    """
+    Mueve a vacation_requests_archive las solicitudes cerradas que terminaron antes de
+    `before`, en lotes de una transacción cada uno (la base no queda bloqueada mucho
+    tiempo). Devuelve la cantidad archivada.
+    """
+    condition, params = _closed_before(before)
+    archived_at = datetime.now()
+    moved = 0
+    while True:
+        ids = [row['id'] for row in db.execute(
+            f"SELECT id FROM vacation_requests WHERE {condition} ORDER BY id LIMIT ?", (*params, batch_size)
+        ).fetchall()]
+        if not ids:
+            return moved
+        batch = f"id IN ({', '.join('?' for _ in ids)}) AND {condition}"
+        db.execute(
+            f"INSERT INTO vacation_requests_archive ({_COLUMNS_SQL}, archived_at) "
+            f"SELECT {_COLUMNS_SQL}, ? FROM vacation_requests WHERE {batch}",
+            (archived_at, *ids, *params)
+        )
+        db.execute(f"DELETE FROM vacation_requests WHERE {batch}", (*ids, *params))
+        db.commit()
+        moved += len(ids)
@@ -0,0 +1,194 @@
+# vacations/assets.py
+# Recursos estáticos propios (sin CDN): librerías de terceros copiadas en static/vendor,
+# compiladas a static/dist con nombres por hash de contenido y variantes gzip/brotli.
+#
+#   python vacations/assets.py       -> descarga lo faltante en vendor y compila dist
+#   flask sdv vendor-assets / build-assets
+#
+# En las plantillas: {{ asset_url('vendor/bootstrap/bootstrap.min.css') }}
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+import urllib.request
+
+from flask import current_app, request, send_file, abort, url_for
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin brotli solo se generan variantes gzip
+    brotli = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+# Un año: los archivos con hash nunca cambian de contenido
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.map', '.txt')
+
+# Librerías de terceros (versión fija) -> origen para descargarlas en static/vendor
+VENDOR_ASSETS = {
+    'vendor/bootstrap/bootstrap.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css',
+    'vendor/bootstrap/bootstrap.bundle.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js',
+    'vendor/bootstrap-icons/bootstrap-icons.css': 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/bootstrap-icons.css',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff2': 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff2',
+    'vendor/bootstrap-icons/fonts/bootstrap-icons.woff': 'https://cdn.jsdelivr.net/npm/bootstrap-icons@1.10.5/font/fonts/bootstrap-icons.woff',
+    'vendor/bootstrap-datepicker/bootstrap-datepicker.min.css': 'https://cdn.jsdelivr.net/npm/bootstrap-datepicker@1.9.0/dist/css/bootstrap-datepicker.min.css',
+    'vendor/bootstrap-datepicker/bootstrap-datepicker.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap-datepicker@1.9.0/dist/js/bootstrap-datepicker.min.js',
+    'vendor/bootstrap-datepicker/bootstrap-datepicker.es.min.js': 'https://cdn.jsdelivr.net/npm/bootstrap-datepicker@1.9.0/dist/locales/bootstrap-datepicker.es.min.js',
+    'vendor/select2/select2.min.css': 'https://cdn.jsdelivr.net/npm/select2@4.1.0-rc.0/dist/css/select2.min.css',
+    'vendor/select2/select2.min.js': 'https://cdn.jsdelivr.net/npm/select2@4.1.0-rc.0/dist/js/select2.min.js',
+    'vendor/select2-bootstrap-5-theme/select2-bootstrap-5-theme.min.css': 'https://cdn.jsdelivr.net/npm/select2-bootstrap-5-theme@1.3.0/dist/select2-bootstrap-5-theme.min.css',
+    'vendor/jquery/jquery.min.js': 'https://code.jquery.com/jquery-3.6.0.min.js',
+    'vendor/fullcalendar/main.min.css': 'https://cdn.jsdelivr.net/npm/fullcalendar@5.11.3/main.min.css',
+    'vendor/fullcalendar/main.min.js': 'https://cdn.jsdelivr.net/npm/fullcalendar@5.11.3/main.min.js',
+    'vendor/fullcalendar/locales-all.min.js': 'https://cdn.jsdelivr.net/npm/fullcalendar@5.11.3/locales-all.min.js',
+    'vendor/chart.js/chart.umd.js': 'https://cdn.jsdelivr.net/npm/chart.js@4.4.1/dist/chart.umd.js',
+}
+
+_CSS_URL_RE = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+
+def vendor_assets(static_folder, force=False):
+    """Descarga en static/vendor las librerías que falten. Devuelve las rutas descargadas."""
+    downloaded = []
+    for logical_path, source_url in VENDOR_ASSETS.items():
+        target = os.path.join(static_folder, *logical_path.split('/'))
+        if os.path.exists(target) and not force:
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with urllib.request.urlopen(source_url, timeout=60) as response, open(target + '.part', 'wb') as out:
+            shutil.copyfileobj(response, out)
+        os.replace(target + '.part', target)
+        downloaded.append(logical_path)
+    return downloaded
+
+def _source_files(static_folder):
+    """Rutas lógicas (con '/') de todos los archivos de static, excepto dist."""
+    for root, dirs, files in os.walk(static_folder):
+        if root == static_folder and DIST_DIR in dirs:
+            dirs.remove(DIST_DIR)
+        for name in files:
+            full_path = os.path.join(root, name)
+            yield os.path.relpath(full_path, static_folder).replace(os.sep, '/')
+
+def _hashed_name(logical_path, content):
+    base, ext = posixpath.splitext(logical_path)
+    return f"{base}.{hashlib.sha256(content).hexdigest()[:12]}{ext}"
+
+def _rewrite_css_urls(logical_path, content, manifest):
+    """Reemplaza en un CSS las referencias url(...) a otros recursos por su versión con hash."""
+    css_dir = posixpath.dirname(logical_path)
+
+    def replace(match):
+        quote, url = match.groups()
+        if url.startswith(('data:', 'http:', 'https:', '//', '#')):
+            return match.group(0)
+        path = re.split(r'[?#]', url, maxsplit=1)[0]
+        target = posixpath.normpath(posixpath.join(css_dir, path))
+        if target not in manifest:
+            return match.group(0)
+        relative = posixpath.relpath(manifest[target], css_dir)
+        # El hash ya identifica la versión: se descarta la query (?v=...) original
+        fragment = url[url.index('#'):] if '#' in url else ''
+        return f"url({quote}{relative}{fragment}{quote})"
+
+    return _CSS_URL_RE.sub(replace, content.decode('utf-8')).encode('utf-8')
+
+def _write_variants(path, content):
+    with open(path, 'wb') as f:
+        f.write(content)
+    if not path.endswith(COMPRESSIBLE_EXTENSIONS):
+        return
+    with open(path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+def build_assets(static_folder):
+    """
+    Regenera static/dist: copia cada archivo con el hash de su contenido en el nombre,
+    genera las variantes .gz/.br y escribe el manifiesto (ruta lógica -> ruta con hash).
+    Los CSS se procesan al final para apuntar a las fuentes/imágenes ya renombradas.
+    """
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    if os.path.isdir(dist_folder):
+        shutil.rmtree(dist_folder)
+    os.makedirs(dist_folder)
+
+    sources = sorted(_source_files(static_folder), key=lambda p: p.endswith('.css'))
+    manifest = {}
+    for logical_path in sources:
+        with open(os.path.join(static_folder, *logical_path.split('/')), 'rb') as f:
+            content = f.read()
+        if logical_path.endswith('.css'):
+            content = _rewrite_css_urls(logical_path, content, manifest)
+
+        hashed_path = _hashed_name(logical_path, content)
+        target = os.path.join(dist_folder, *hashed_path.split('/'))
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _write_variants(target, content)
+        manifest[logical_path] = hashed_path
+
+    with open(os.path.join(dist_folder, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(static_folder):
+    path = os.path.join(static_folder, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def asset_url(logical_path):
+    """
+    URL de un recurso estático: la versión con hash si dist está compilado; si no, el
+    archivo sin procesar de static o, como último recurso, el CDN de origen.
+    """
+    manifest = current_app.extensions['asset_manifest']
+    if logical_path in manifest:
+        return url_for('serve_asset', filename=manifest[logical_path])
+    if os.path.exists(os.path.join(current_app.static_folder, *logical_path.split('/'))):
+        return url_for('static', filename=logical_path)
+    if logical_path in VENDOR_ASSETS:
+        return VENDOR_ASSETS[logical_path]
+    return url_for('static', filename=logical_path)
+
+def serve_asset(filename):
+    """Entrega un archivo de dist con caché inmutable y la mejor variante comprimida aceptada."""
+    full_path = safe_join(os.path.join(current_app.static_folder, DIST_DIR), filename)
+    if full_path is None or not os.path.isfile(full_path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+    encoding = None
+    for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+        if request.accept_encodings[candidate] and os.path.isfile(full_path + suffix):
+            encoding, full_path = candidate, full_path + suffix
+            break
+
+    response = send_file(full_path, mimetype=mimetype, conditional=True)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Cache-Control'] = IMMUTABLE_CACHE
+    response.vary.add('Accept-Encoding')
+    return response
+
+def init_app(app):
+    """Registra la ruta /assets y el helper asset_url() de Jinja."""
+    app.extensions['asset_manifest'] = load_manifest(app.static_folder)
+    app.add_url_rule('/assets/<path:filename>', 'serve_asset', serve_asset)
+    app.jinja_env.globals['asset_url'] = asset_url
+
+if __name__ == '__main__':
+    # Uso en el build (Dockerfile): no requiere crear la aplicación ni la base de datos
+    static_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+    for path in vendor_assets(static_root):
+        print(f"Descargado: {path}")
+    print(f"Recursos compilados: {len(build_assets(static_root))}")
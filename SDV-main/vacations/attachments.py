@@ -0,0 +1,99 @@
+# vacations/attachments.py
+# Almacenamiento de adjuntos direccionado por contenido: cada archivo se guarda una
+# sola vez con el nombre de su SHA-256, en carpetas por prefijo (ab/cd/abcd...pdf).
+
+import hashlib
+import mimetypes
+import os
+import tempfile
+
+from flask import current_app, send_file, send_from_directory, Response, abort, flash
+from werkzeug.security import safe_join
+from werkzeug.utils import secure_filename
+
+CHUNK_SIZE = 64 * 1024
+# Margen de MAX_CONTENT_LENGTH sobre ATTACHMENT_MAX_SIZE para el resto del formulario
+FORM_OVERHEAD = 1024 * 1024
+
+class AttachmentTooLarge(ValueError):
+    """El adjunto supera ATTACHMENT_MAX_SIZE."""
+
+def _extension(filename):
+    """Extensión (en minúsculas) del nombre original, ya saneado."""
+    return os.path.splitext(secure_filename(filename or ''))[1].lower()
+
+def too_large_message(max_size):
+    return f"El adjunto supera el tamaño máximo permitido ({round(max_size / (1024 * 1024), 1):g} MB)."
+
+def request_too_large(e):
+    """
+    413 de Werkzeug: el cuerpo supera MAX_CONTENT_LENGTH y se rechaza sin recibirlo
+    entero. Vuelve al formulario de origen con el mensaje.
+    """
+    from .routes import redirect_back
+
+    flash(too_large_message(current_app.config['ATTACHMENT_MAX_SIZE']), "danger")
+    return redirect_back()
+
+def save_upload(file_storage):
+    """
+    Copia el archivo subido a disco por bloques mientras calcula su SHA-256 y devuelve
+    la ruta relativa a UPLOAD_FOLDER que se guarda en vacation_requests.attachment_path.
+    Lanza AttachmentTooLarge si se supera el tamaño máximo configurado.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    max_size = current_app.config['ATTACHMENT_MAX_SIZE']
+    tmp_folder = os.path.join(upload_folder, '.tmp')
+    os.makedirs(tmp_folder, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, tmp_path = tempfile.mkstemp(dir=tmp_folder)
+    try:
+        with os.fdopen(fd, 'wb') as tmp:
+            while True:
+                chunk = file_storage.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise AttachmentTooLarge(too_large_message(max_size))
+                digest.update(chunk)
+                tmp.write(chunk)
+
+        sha256 = digest.hexdigest()
+        relative_path = '/'.join([sha256[:2], sha256[2:4], sha256 + _extension(file_storage.filename)])
+        final_path = os.path.join(upload_folder, *relative_path.split('/'))
+        if os.path.exists(final_path):
+            # Contenido ya almacenado: se reutiliza el archivo existente
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(final_path), exist_ok=True)
+            os.replace(tmp_path, final_path)
+        return relative_path
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def send_attachment(relative_path):
+    """
+    Entrega un adjunto. Con X_ACCEL_REDIRECT_PREFIX (nginx) o USE_X_SENDFILE (Apache,
+    lighttpd) el proxy sirve el archivo; si no, lo envía Flask.
+    """
+    upload_folder = current_app.config['UPLOAD_FOLDER']
+    full_path = safe_join(upload_folder, relative_path)
+    if full_path is None or not os.path.isfile(full_path):
+        abort(404)
+
+    accel_prefix = current_app.config.get('X_ACCEL_REDIRECT_PREFIX')
+    if accel_prefix:
+        mimetype = mimetypes.guess_type(full_path)[0] or 'application/octet-stream'
+        response = Response(mimetype=mimetype)
+        response.headers['X-Accel-Redirect'] = accel_prefix.rstrip('/') + '/' + relative_path
+        return response
+
+    if current_app.config.get('USE_X_SENDFILE'):
+        return send_file(full_path, conditional=True)
+
+    return send_from_directory(upload_folder, relative_path, conditional=True)
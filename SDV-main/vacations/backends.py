@@ -0,0 +1,219 @@
+# vacations/backends.py
+# Motores de base de datos. Las rutas usan get_db() sin importar el motor:
+#
+#   SQLiteBackend    -> archivo en instance/ (por defecto).
+#   PostgresBackend  -> DATABASE_URL=postgresql://..., con un pool de conexiones por proceso.
+#
+# La conexión de PostgreSQL imita la interfaz de sqlite3 (execute con '?', filas con
+# acceso por nombre e índice, commit/rollback). Las funciones de fecha que usa el SQL
+# compartido (strftime, julianday) se definen en schema_postgres.sql.
+
+import os
+import re
+import sqlite3
+import threading
+
+# Literales entre comillas simples: sus '?' y '%' no son parámetros
+_SQL_LITERAL_RE = re.compile(r"('(?:[^']|'')*')")
+
+class SQLiteBackend:
+    """Una conexión nueva por petición sobre el archivo de la base de datos."""
+
+    name = 'sqlite'
+    integrity_errors = (sqlite3.IntegrityError,)
+    explain_prefix = 'EXPLAIN QUERY PLAN '
+
+    def __init__(self, database):
+        self.database = database
+
+    def connect(self):
+        conn = sqlite3.connect(self.database, detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def connect_lazy(self):
+        """Conexión sin conversión de tipos ni row_factory (filas livianas de rows.py)."""
+        return sqlite3.connect(self.database)
+
+    def release(self, conn):
+        conn.close()
+
+    def close(self):
+        pass
+
+def _to_pyformat(sql):
+    """Convierte los parámetros '?' de sqlite3 al estilo %s de psycopg2."""
+    parts = _SQL_LITERAL_RE.split(sql)
+    for i in range(0, len(parts), 2):
+        parts[i] = parts[i].replace('%', '%%').replace('?', '%s')
+    for i in range(1, len(parts), 2):
+        parts[i] = parts[i].replace('%', '%%')
+    return ''.join(parts)
+
+class PostgresCursor:
+    """Cursor con la interfaz de sqlite3: execute() devuelve el propio cursor."""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection.raw.cursor(cursor_factory=connection.row_factory)
+
+    def execute(self, sql, params=()):
+        try:
+            if params:
+                self._cursor.execute(_to_pyformat(sql), tuple(params))
+            else:
+                self._cursor.execute(sql)
+        except self.connection.backend.errors.Error:
+            # PostgreSQL aborta la transacción ante un error; como en sqlite3, la
+            # conexión debe seguir usable después de capturar la excepción.
+            self.connection.raw.rollback()
+            raise
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        try:
+            self._cursor.executemany(_to_pyformat(sql), [tuple(p) for p in seq_of_params])
+        except self.connection.backend.errors.Error:
+            self.connection.raw.rollback()
+            raise
+        return self
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def lastrowid(self):
+        # Sin equivalente en PostgreSQL: usar INSERT ... RETURNING id
+        return None
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def close(self):
+        self._cursor.close()
+
+class PostgresConnection:
+    """Conexión del pool con la interfaz de sqlite3 que usan las rutas."""
+
+    def __init__(self, backend, raw):
+        self.backend = backend
+        self.raw = raw
+        self.row_factory = backend.extras.DictCursor
+
+    def cursor(self):
+        return PostgresCursor(self)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def executescript(self, script):
+        """Ejecuta un script SQL en la transacción actual; quien llama confirma."""
+        with self.raw.cursor() as cur:
+            cur.execute(script)
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    @property
+    def in_transaction(self):
+        return self.raw.get_transaction_status() != self.backend.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.backend.release(self)
+
+class PostgresBackend:
+    """
+    Pool de conexiones (ThreadedConnectionPool) por proceso; se recrea tras el fork.
+    Con todas las conexiones en uso, la petición espera hasta pool_timeout segundos
+    en lugar de fallar (ThreadedConnectionPool lanza PoolError si está agotado).
+    """
+
+    name = 'postgresql'
+    explain_prefix = 'EXPLAIN '
+
+    def __init__(self, dsn, minconn=1, maxconn=10, pool_timeout=30):
+        import psycopg2
+        import psycopg2.extensions
+        import psycopg2.extras
+        import psycopg2.pool
+
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.pool_timeout = pool_timeout
+        self.errors = psycopg2
+        self.extensions = psycopg2.extensions
+        self.extras = psycopg2.extras
+        self.integrity_errors = (psycopg2.IntegrityError,)
+        self._pool_class = psycopg2.pool.ThreadedConnectionPool
+        self._pool = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Las conexiones abiertas antes del fork de gunicorn no se comparten entre workers
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    self._pool = self._pool_class(self.minconn, self.maxconn, self.dsn)
+                    self._slots = threading.BoundedSemaphore(self.maxconn)
+                    self._pid = os.getpid()
+        return self._pool
+
+    def connect(self):
+        pool = self._get_pool()
+        if not self._slots.acquire(timeout=self.pool_timeout):
+            raise self.errors.OperationalError("No hay conexiones libres en el pool de la base de datos.")
+        try:
+            return PostgresConnection(self, pool.getconn())
+        except Exception:
+            self._slots.release()
+            raise
+
+    def release(self, conn):
+        pool = self._get_pool()
+        try:
+            if conn.raw.closed:
+                pool.putconn(conn.raw, close=True)
+            else:
+                # Lo no confirmado se descarta para que la próxima petición reciba la conexión limpia
+                conn.raw.rollback()
+                pool.putconn(conn.raw)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Cierra las conexiones del pool (tests, apagado ordenado)."""
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.closeall()
+        self._pool = None
+
+def create_backend(config):
+    """Elige el motor según DATABASE_URL (PostgreSQL) o DATABASE (archivo SQLite)."""
+    url = config.get('DATABASE_URL')
+    if url and url.startswith(('postgres://', 'postgresql://')):
+        return PostgresBackend(
+            url, config.get('DB_POOL_MIN', 1), config.get('DB_POOL_MAX', 10), config.get('DB_POOL_TIMEOUT', 30)
+        )
+    return SQLiteBackend(config['DATABASE'])
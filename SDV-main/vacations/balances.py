@@ -0,0 +1,62 @@
+# vacations/balances.py
+# Movimientos de saldo sobre vacation_periods: los días se descuentan de los periodos
+# más antiguos primero (FIFO) y se devuelven a los más recientes primero (LIFO).
+# Las funciones reciben la conexión para poder usarse dentro de una unidad de escritura.
+
+def deduct_days(conn, employee_id, days):
+    """Descuenta días de los periodos con saldo (FIFO). Devuelve los que no se pudieron descontar."""
+    periods = conn.execute(
+        "SELECT id, total_days_accrued, days_taken FROM vacation_periods WHERE employee_id = ? AND total_days_accrued > days_taken ORDER BY year ASC",
+        (employee_id,)
+    ).fetchall()
+
+    for period in periods:
+        if days <= 0:
+            break
+        deduct = min(days, period['total_days_accrued'] - period['days_taken'])
+        if deduct > 0:
+            conn.execute("UPDATE vacation_periods SET days_taken = days_taken + ? WHERE id = ?", (deduct, period['id']))
+            days -= deduct
+    return days
+
+def refund_days(conn, employee_id, days):
+    """Devuelve días a los periodos usados, del más nuevo al más antiguo (LIFO)."""
+    periods = conn.execute(
+        "SELECT id, days_taken FROM vacation_periods WHERE employee_id = ? AND days_taken > 0 ORDER BY year DESC",
+        (employee_id,)
+    ).fetchall()
+
+    for period in periods:
+        if days <= 0:
+            break
+        refund = min(days, period['days_taken'])
+        conn.execute("UPDATE vacation_periods SET days_taken = days_taken - ? WHERE id = ?", (refund, period['id']))
+        days -= refund
+    return days
+
+def employee_balances(conn, employee_ids):
+    """
+    Saldo por tipo de licencia de cada empleado, en una consulta:
+    {employee_id: [{leave_type_id, leave_type, accrued, taken, balance}, ...]}.
+    """
+    if not employee_ids:
+        return {}
+    placeholders = ', '.join('?' for _ in employee_ids)
+    rows = conn.execute(f"""
+        SELECT vp.employee_id, vp.leave_type_id, lt.name AS leave_type,
+               SUM(vp.total_days_accrued) AS accrued, SUM(vp.days_taken) AS taken,
+               SUM(vp.total_days_accrued - vp.days_taken) AS balance
+        FROM vacation_periods vp
+        LEFT JOIN leave_types lt ON lt.id = vp.leave_type_id
+        WHERE vp.employee_id IN ({placeholders})
+        GROUP BY vp.employee_id, vp.leave_type_id, lt.name
+        ORDER BY vp.employee_id, vp.leave_type_id
+    """, list(employee_ids)).fetchall()
+
+    result = {}
+    for row in rows:
+        result.setdefault(row['employee_id'], []).append({
+            'leave_type_id': row['leave_type_id'], 'leave_type': row['leave_type'],
+            'accrued': row['accrued'], 'taken': row['taken'], 'balance': row['balance'],
+        })
+    return result
@@ -0,0 +1,261 @@
+# vacations/benchmarks.py
+# Microbenchmarks de los caminos críticos (flask sdv bench):
+#
+#   - calculate_working_days sobre rangos de 1 día a 1 año
+#   - get_paraguay_holidays con cientos de feriados recurrentes
+#   - format_date_filter sobre una tabla grande de fechas
+#   - descuento FIFO de saldo (balances.deduct_days, usado al aprobar en RRHH)
+#   - dashboard de cada rol con bases de 100, 5.000 y 50.000 empleados
+#   - lectura de filas sqlite3.Row vs LazyRow (rows.py) y el listado/exportación de RRHH
+#
+# Las bases sintéticas (ver synthetic.py) se generan una vez en instance/benchmarks y se
+# reutilizan. Cada ejecución guarda sus resultados en instance/benchmarks/results como
+# <fecha>-<commit>.json para compararlos entre commits (--compare).
+
+import glob
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from datetime import date, datetime, timedelta
+
+DEFAULT_SIZES = (100, 5000, 50000)
+DASHBOARD_ROLES = ('Empleado', 'Jefe', 'RRHH')
+BENCH_PASSWORD = '123'
+ROWS_EMPLOYEES = 5000
+
+# Misma consulta que el listado de todas las solicitudes de RRHH
+ROWS_QUERY = """
+    SELECT vr.*, e.full_name as employee_name, m.full_name as manager_name, lt.name as leave_name
+    FROM vacation_requests vr
+    JOIN employees e ON vr.employee_id = e.id
+    LEFT JOIN leave_types lt ON vr.leave_type_id = lt.id
+    LEFT JOIN employees m ON e.manager_id = m.id
+    ORDER BY vr.request_date DESC
+"""
+
+class Runner:
+    """Ejecuta cada caso hasta min_rounds veces y al menos min_time segundos (con un calentamiento)."""
+
+    def __init__(self, min_rounds=5, min_time=0.5, max_rounds=1000, echo=print):
+        self.min_rounds = min_rounds
+        self.min_time = min_time
+        self.max_rounds = max_rounds
+        self.echo = echo
+        self.results = {}
+
+    def bench(self, name, fn):
+        fn()
+        timings = []
+        started = time.perf_counter()
+        while len(timings) < self.max_rounds and (len(timings) < self.min_rounds or time.perf_counter() - started < self.min_time):
+            t0 = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - t0)
+        result = {
+            'rounds': len(timings),
+            'min': min(timings),
+            'median': statistics.median(timings),
+            'mean': statistics.fmean(timings),
+            'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        }
+        self.results[name] = result
+        self.echo(f"{name:<50} {result['median'] * 1000:10.3f} ms  (min {result['min'] * 1000:.3f}, {result['rounds']} rondas)")
+        return result
+
+def _project_root():
+    return os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def _git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, cwd=_project_root(), check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], capture_output=True, text=True, cwd=_project_root()).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'sin-git'
+    return commit + ('-dirty' if dirty else '')
+
+def _bench_app(database):
+    from . import create_app
+    return create_app({
+        'DATABASE': database,
+        'DATABASE_URL': None,
+        'WRITE_QUEUE': False,
+        'QUERY_LOG': False,
+        'METRICS': False,
+        'PROFILING': False,
+    })
+
+def bench_database(folder, employees, recurring_holidays=12, rebuild=False, echo=print):
+    """Ruta de una base SQLite sintética con `employees` empleados (se genera si no existe)."""
+    path = os.path.join(folder, f"bench-{employees}-{recurring_holidays}.db")
+    if os.path.exists(path) and not rebuild:
+        return path
+
+    from . import synthetic
+    from .db import get_db
+
+    os.makedirs(folder, exist_ok=True)
+    partial = path + '.tmp'
+    if os.path.exists(partial):
+        os.remove(partial)
+    echo(f"Generando base sintética de {employees} empleados...")
+    app = _bench_app(partial)
+    with app.app_context():
+        counts = synthetic.generate(get_db(), employees, recurring_holidays=recurring_holidays, password=BENCH_PASSWORD)
+    echo("  " + ", ".join(f"{table}: {count}" for table, count in counts.items()))
+    os.replace(partial, path)
+    return path
+
+def _bench_units(runner, database):
+    from . import balances
+    from .db import get_db
+    from .utils import calculate_working_days, format_date_filter, get_paraguay_holidays
+
+    app = _bench_app(database)
+    with app.app_context():
+        today = date.today()
+        for days in (1, 7, 30, 90, 365):
+            end = today + timedelta(days=days - 1)
+            runner.bench(f"calculate_working_days[{days}d]", lambda end=end: calculate_working_days(today, end))
+
+        recurring = get_db().execute("SELECT COUNT(*) FROM custom_holidays WHERE is_recurring = 1").fetchone()[0]
+        runner.bench(f"get_paraguay_holidays[{recurring} recurrentes]", get_paraguay_holidays)
+        runner.bench(
+            f"get_paraguay_holidays[{recurring} recurrentes, 5 años]",
+            lambda: get_paraguay_holidays(date(today.year - 2, 1, 1), date(today.year + 2, 12, 31))
+        )
+
+        # Tabla de 10.000 filas con las formas de fecha que llegan a las plantillas
+        base = datetime(today.year, 1, 1, 8, 30)
+        values = []
+        for i in range(2500):
+            moment = base + timedelta(hours=i)
+            values += [moment.date(), moment, moment.strftime('%Y-%m-%d'), moment.strftime('%Y-%m-%d %H:%M:%S.%f')]
+        runner.bench("format_date_filter[10000 valores]", lambda: [format_date_filter(value) for value in values])
+
+        # Descuento FIFO sobre el empleado con más periodos; se deshace en cada ronda
+        db = get_db()
+        employee = db.execute(
+            "SELECT employee_id, COUNT(*) AS periods, SUM(total_days_accrued - days_taken) AS balance "
+            "FROM vacation_periods GROUP BY employee_id ORDER BY periods DESC, balance DESC LIMIT 1"
+        ).fetchone()
+
+        def deduct():
+            balances.deduct_days(db, employee['employee_id'], employee['balance'])
+            db.rollback()
+        runner.bench(f"balances.deduct_days[{employee['periods']} periodos]", deduct)
+
+def _login(app, username):
+    client = app.test_client()
+    response = client.post('/auth/login', data={'username': username, 'password': BENCH_PASSWORD})
+    return client if response.status_code == 302 else None
+
+def _get(client, url):
+    def fetch():
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+    return fetch
+
+def _bench_dashboards(runner, database, employees):
+    app = _bench_app(database)
+    from . import synthetic
+    from .db import get_db
+
+    with app.app_context():
+        users = {}
+        for role in DASHBOARD_ROLES:
+            row = get_db().execute(
+                # Preferir usuarios sintéticos: un jefe con equipo de verdad, no el de ejemplo
+                "SELECT username FROM employees WHERE role = ? AND is_active = 1 ORDER BY username LIKE ? DESC, id LIMIT 1",
+                (role, synthetic.USERNAME_PREFIX + '_%')
+            ).fetchone()
+            if row:
+                users[role] = row['username']
+
+    for role, username in users.items():
+        client = _login(app, username)
+        if client is None:
+            runner.echo(f"  No se pudo iniciar sesión como {username}; se omite.")
+            continue
+        runner.bench(f"dashboard[{role}, {employees} empleados]", _get(client, '/dashboard'))
+
+def _bench_rows(runner, database):
+    from .db import get_db
+    from .rows import get_lazy_db
+
+    app = _bench_app(database)
+    with app.app_context():
+        count = get_db().execute("SELECT COUNT(*) FROM vacation_requests").fetchone()[0]
+        hr_username = get_db().execute("SELECT username FROM employees WHERE role = 'RRHH' AND is_active = 1 ORDER BY id LIMIT 1").fetchone()['username']
+
+        # Referencia: tuplas crudas (sin conversión); la diferencia es el costo de armar las filas
+        runner.bench(f"filas[tupla cruda, {count} solicitudes]", lambda: get_lazy_db().conn.execute(ROWS_QUERY).fetchall())
+
+        # Solo leer las filas, y leer las columnas que muestra el listado
+        for label, connection in (('sqlite3.Row', get_db), ('LazyRow', get_lazy_db)):
+            runner.bench(f"filas[{label}, {count} solicitudes]", lambda connection=connection: connection().execute(ROWS_QUERY).fetchall())
+            runner.bench(
+                f"filas[{label}, {count} solicitudes, columnas del listado]",
+                lambda connection=connection: [
+                    (row['employee_name'], row['start_date'], row['end_date'], row['days_requested'], row['status'])
+                    for row in connection().execute(ROWS_QUERY).fetchall()
+                ]
+            )
+
+    client = _login(app, hr_username)
+    if client is None:
+        runner.echo(f"  No se pudo iniciar sesión como {hr_username}; se omite.")
+        return
+    runner.bench(f"hr.all_requests[{count} solicitudes]", _get(client, '/hr/all_requests'))
+    runner.bench(f"hr.all_requests[{count} solicitudes, exportar]", _get(client, '/hr/all_requests?export=true'))
+
+def run_benchmarks(folder, sizes=DEFAULT_SIZES, only=None, rebuild=False, min_time=0.5, echo=print):
+    """Ejecuta los benchmarks y guarda los resultados. Devuelve (ruta del archivo, resultados)."""
+    runner = Runner(min_time=min_time, echo=echo)
+    wanted = lambda group: not only or group in only
+
+    if wanted('units'):
+        _bench_units(runner, bench_database(folder, 100, recurring_holidays=300, rebuild=rebuild, echo=echo))
+    if wanted('rows'):
+        _bench_rows(runner, bench_database(folder, ROWS_EMPLOYEES, rebuild=rebuild, echo=echo))
+    if wanted('dashboard'):
+        for employees in sizes:
+            _bench_dashboards(runner, bench_database(folder, employees, rebuild=rebuild, echo=echo), employees)
+
+    commit = _git_commit()
+    report = {
+        'commit': commit,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': runner.results,
+    }
+    results_folder = os.path.join(folder, 'results')
+    os.makedirs(results_folder, exist_ok=True)
+    path = os.path.join(results_folder, f"{datetime.now():%Y%m%d-%H%M%S}-{commit}.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return path, runner.results
+
+def find_results(folder, reference):
+    """Archivo de resultados por ruta o por commit (el más reciente de ese commit)."""
+    if os.path.isfile(reference):
+        return reference
+    matches = sorted(glob.glob(os.path.join(folder, 'results', f"*-{reference}*.json")))
+    return matches[-1] if matches else None
+
+def compare(baseline_path, results):
+    """Filas (nombre, mediana base, mediana actual, variación %) para los casos comunes."""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    rows = []
+    for name, current in results.items():
+        if name in baseline:
+            before = baseline[name]['median']
+            rows.append((name, before, current['median'], (current['median'] - before) / before * 100 if before else 0.0))
+    return rows
+
+def default_folder(app):
+    return os.path.join(app.instance_path, 'benchmarks')
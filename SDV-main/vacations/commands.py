@@ -0,0 +1,201 @@
+# vacations/commands.py
+# Comandos de consola (flask sdv ...) para tareas programadas y de mantenimiento.
+
+import os
+
+import click
+from flask.cli import AppGroup
+
+sdv_cli = AppGroup('sdv', help="Tareas de mantenimiento del Sistema de Vacaciones.")
+
+@sdv_cli.command('generate-periods')
+@click.option('--from-year', 'year_from', type=int, default=None, help="Primer año a generar (por defecto el actual).")
+@click.option('--to-year', 'year_to', type=int, default=None, help="Último año a generar (por defecto igual al primero).")
+@click.option('--leave-type', 'leave_type_ids', type=int, multiple=True, help="Limitar a uno o más tipos de licencia (id).")
+def generate_periods_command(year_from, year_to, leave_type_ids):
+    """Genera los periodos anuales faltantes (apto para cron)."""
+    from .periods import generate_periods
+
+    try:
+        inserted = generate_periods(year_from, year_to, list(leave_type_ids) or None)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    click.echo(f"Periodos insertados: {inserted}")
+
+@sdv_cli.command('recalc-accrual')
+@click.option('--year', type=int, default=None, help="Limitar a un año (por defecto todos).")
+@click.option('--leave-type', 'leave_type_id', type=int, default=None, help="Limitar a un tipo de licencia (id).")
+@click.option('--include-adjusted', is_flag=True, help="Incluir periodos ajustados manualmente por RRHH.")
+@click.option('--apply', 'apply_changes', is_flag=True, help="Aplicar los cambios (por defecto solo se previsualizan).")
+def recalc_accrual_command(year, leave_type_id, include_adjusted, apply_changes):
+    """Recalcula los días otorgados de los periodos según las políticas de antigüedad."""
+    from .accrual import preview_recalculation, apply_recalculation
+
+    diff = preview_recalculation(year, leave_type_id, include_adjusted)
+    for row in diff:
+        click.echo(f"{row['full_name']} | {row['leave_name']} {row['year']}: {row['current_days']} -> {row['expected_days']}")
+    click.echo(f"Periodos con diferencias: {len(diff)}")
+
+    if apply_changes and diff:
+        updated = apply_recalculation(year, leave_type_id, include_adjusted)
+        click.echo(f"Periodos actualizados: {updated}")
+
+@sdv_cli.command('archive-requests')
+@click.option('--older-than-days', type=int, default=None, help="Días desde el fin de la solicitud (por defecto ARCHIVE_AFTER_DAYS).")
+@click.option('--batch-size', type=int, default=500, show_default=True, help="Solicitudes por transacción.")
+@click.option('--apply', 'apply_changes', is_flag=True, help="Mover las solicitudes (por defecto solo se previsualizan).")
+def archive_requests_command(older_than_days, batch_size, apply_changes):
+    """Archiva las solicitudes cerradas antiguas en vacation_requests_archive."""
+    from flask import current_app
+    from .archive import archive_requests, horizon, preview_archive
+    from .db import get_db
+
+    days = current_app.config['ARCHIVE_AFTER_DAYS'] if older_than_days is None else older_than_days
+    before = horizon(days)
+    db = get_db()
+    counts = preview_archive(db, before)
+    for status, total in counts.items():
+        click.echo(f"{status}: {total}")
+    click.echo(f"Solicitudes cerradas que terminaron antes del {before:%d/%m/%Y}: {sum(counts.values())}")
+
+    if apply_changes and counts:
+        moved = archive_requests(db, before, batch_size)
+        click.echo(f"Solicitudes archivadas: {moved}")
+
+@sdv_cli.command('refresh-snapshot')
+def refresh_snapshot_command():
+    """Refresca la copia de reportes (para cron; también se refresca sola tras N cambios)."""
+    from flask import current_app
+    from . import snapshot
+
+    if not snapshot.enabled():
+        click.echo("La copia de reportes está deshabilitada (REPORT_SNAPSHOT=True, solo SQLite).")
+        return
+    elapsed = snapshot.refresh_locked(current_app)
+    if elapsed is None:
+        click.echo("Otro proceso está refrescando la copia (o falló: ver el log).")
+    else:
+        click.echo(f"Copia de reportes actualizada en {elapsed:.2f} s: {snapshot.snapshot_path()}")
+
+@sdv_cli.command('vendor-assets')
+@click.option('--force', is_flag=True, help="Volver a descargar aunque el archivo exista.")
+def vendor_assets_command(force):
+    """Descarga en static/vendor las librerías de terceros (Bootstrap, jQuery, etc.)."""
+    from flask import current_app
+    from .assets import vendor_assets
+
+    for path in vendor_assets(current_app.static_folder, force):
+        click.echo(f"Descargado: {path}")
+
+@sdv_cli.command('build-assets')
+def build_assets_command():
+    """Compila static/dist (nombres con hash, gzip/brotli). Reiniciar la app para aplicarlo."""
+    from flask import current_app
+    from .assets import build_assets
+
+    manifest = build_assets(current_app.static_folder)
+    click.echo(f"Recursos compilados: {len(manifest)}")
+
+@sdv_cli.command('startup-profile')
+@click.option('--precompile-templates', is_flag=True, help="Medir también la precompilación de plantillas.")
+@click.option('--top', type=int, default=10, help="Cantidad de importaciones más lentas a mostrar.")
+def startup_profile_command(precompile_templates, top):
+    """Mide el arranque en frío (importaciones y fases de create_app) en un proceso nuevo."""
+    from .startup import profile_startup
+
+    try:
+        report = profile_startup(precompile_templates, top)
+    except RuntimeError as e:
+        raise click.ClickException(f"No se pudo iniciar la aplicación:\n{e}")
+
+    click.echo(f"{'importar vacations':<24} {report['import'] * 1000:8.1f} ms")
+    for phase, seconds in report['phases']:
+        click.echo(f"  {phase:<22} {seconds * 1000:8.1f} ms")
+    click.echo(f"{'create_app (total)':<24} {report['create_app'] * 1000:8.1f} ms")
+    click.echo(f"Módulos pesados cargados: {', '.join(report['loaded']) or 'ninguno'}")
+    click.echo("Importaciones más lentas (acumulado):")
+    for name, seconds in report['imports']:
+        click.echo(f"  {name:<40} {seconds * 1000:8.1f} ms")
+
+@sdv_cli.command('seed')
+@click.option('--employees', type=int, default=1000, help="Empleados a generar (1 jefe cada 10).")
+@click.option('--requests', type=int, default=None, help="Solicitudes a generar (por defecto 2 por empleado).")
+@click.option('--years', type=int, default=3, help="Años de periodos y solicitudes hacia atrás.")
+@click.option('--holidays', type=int, default=12, help="Feriados recurrentes a agregar.")
+@click.option('--seed', type=int, default=42, help="Semilla aleatoria (misma semilla, mismos datos).")
+@click.option('--password', default='123', help="Contraseña de todos los usuarios generados.")
+@click.confirmation_option(prompt="Se agregarán datos sintéticos a la base configurada. ¿Continuar?")
+def seed_command(employees, requests, years, holidays, seed, password):
+    """Carga datos sintéticos (usuarios synth_*) para pruebas de carga y capacidad."""
+    from .db import get_db
+    from .synthetic import generate
+
+    if employees < 1:
+        raise click.BadParameter("Debe ser al menos 1.", param_hint='--employees')
+    counts = generate(get_db(), employees, requests=requests, years=years, recurring_holidays=holidays, seed=seed, password=password)
+    for table, count in counts.items():
+        click.echo(f"{table}: {count}")
+
+@sdv_cli.command('loadtest')
+@click.option('--url', default='http://127.0.0.1:8000', help="Servidor a probar (gunicorn o waitress con la misma base).")
+@click.option('--users', type=int, default=10, help="Usuarios virtuales concurrentes.")
+@click.option('--iterations', type=int, default=3, help="Recorridos completos por usuario.")
+@click.option('--ramp-up', type=float, default=0, help="Segundos para arrancar a todos los usuarios.")
+@click.option('--password', default='123', help="Contraseña de los usuarios sintéticos y de RRHH.")
+@click.option('--hr-user', default=None, help="Usuario de RRHH que aprueba (por defecto el primero activo).")
+@click.option('--no-exports', is_flag=True, help="Omitir las exportaciones a Excel.")
+def loadtest_command(url, users, iterations, ramp_up, password, hr_user, no_exports):
+    """Prueba de carga con los recorridos de empleado, jefe y RRHH; informa percentiles por paso."""
+    from .loadtest import run_load_test
+
+    try:
+        rows, elapsed = run_load_test(url, users, iterations, ramp_up, password, hr_user, not no_exports)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo(f"{'paso':<18} {'total':>6} {'errores':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'máx ms':>9}")
+    for row in rows:
+        click.echo(
+            f"{row['step']:<18} {row['count']:>6} {row['errors']:>8} {row['p50'] * 1000:9.1f} "
+            f"{row['p95'] * 1000:9.1f} {row['p99'] * 1000:9.1f} {row['max'] * 1000:9.1f}"
+        )
+    total = sum(row['count'] for row in rows)
+    click.echo(f"{total} peticiones en {elapsed:.1f} s ({total / elapsed:.1f}/s)")
+    for row in rows:
+        for error, count in row['error_detail'].items():
+            click.echo(f"  {row['step']}: {error} x{count}")
+
+@sdv_cli.command('bench')
+@click.option('--sizes', default='100,5000,50000', help="Cantidades de empleados de las bases sintéticas (separadas por coma).")
+@click.option('--only', type=click.Choice(['units', 'rows', 'dashboard']), multiple=True, help="Limitar a un grupo de benchmarks.")
+@click.option('--min-time', type=float, default=0.5, help="Segundos mínimos de medición por caso.")
+@click.option('--rebuild', is_flag=True, help="Volver a generar las bases sintéticas.")
+@click.option('--compare', 'reference', default=None, help="Comparar con un archivo de resultados o un commit anterior.")
+def bench_command(sizes, only, min_time, rebuild, reference):
+    """Microbenchmarks de fechas, saldos y dashboards; guarda los resultados por commit."""
+    from flask import current_app
+    from .benchmarks import compare, default_folder, find_results, run_benchmarks
+
+    try:
+        sizes = [int(size) for size in sizes.split(',') if size.strip()]
+    except ValueError:
+        raise click.BadParameter("Debe ser una lista de números, ej: 100,5000")
+
+    folder = default_folder(current_app)
+    baseline = None
+    if reference:
+        baseline = find_results(folder, reference)
+        if baseline is None:
+            raise click.BadParameter(f"No hay resultados para '{reference}'.", param_hint='--compare')
+
+    path, results = run_benchmarks(folder, sizes, only, rebuild, min_time, echo=click.echo)
+    click.echo(f"Resultados guardados en {path}")
+
+    if baseline:
+        rows = compare(baseline, results)
+        if not rows:
+            click.echo(f"{os.path.basename(baseline)} no tiene casos en común con esta ejecución.")
+            return
+        click.echo(f"Comparación con {os.path.basename(baseline)} (mediana):")
+        for name, before, after, change in rows:
+            click.echo(f"  {name:<50} {before * 1000:10.3f} -> {after * 1000:10.3f} ms  ({change:+.1f}%)")
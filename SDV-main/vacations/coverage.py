@@ -0,0 +1,230 @@
+# vacations/coverage.py
+# Cobertura por departamento: cantidad de ausentes por día (barrido de eventos sobre
+# los intervalos aprobados) y umbrales mínimos de personal presente.
+#
+# Los conteos diarios se guardan en coverage_buckets y se invalidan con triggers
+# cuando cambia una solicitud, o el departamento o el estado activo de un empleado.
+# Solo se guardan los días a menos de BUCKET_WINDOW_DAYS de hoy (los demás se calculan
+# en cada consulta) y cada llenado borra los que quedaron fuera de esa ventana: la
+# tabla no crece con las consultas de rangos lejanos. El llenado pasa por run_write.
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from .intervals import APPROVED_STATUSES
+
+# Rango máximo (en días) que se calcula en una sola consulta
+MAX_RANGE_DAYS = 366
+
+# Días hacia atrás y hacia adelante de hoy que se guardan en coverage_buckets
+BUCKET_WINDOW_DAYS = 400
+
+_INVALIDATE_REQUEST_SQL = """
+        DELETE FROM coverage_buckets
+        WHERE department = (SELECT department FROM employees WHERE id = {row}.employee_id)
+          AND day BETWEEN {row}.start_date AND {row}.end_date;
+"""
+
+def setup_coverage(cur):
+    """Crea las tablas de umbrales y de conteos diarios, y los triggers de invalidación."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS staffing_thresholds (
+        department TEXT PRIMARY KEY,
+        min_present INTEGER NOT NULL -- Mínimo de personas presentes por día
+    );
+    """)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS coverage_buckets (
+        department TEXT NOT NULL,
+        day DATE NOT NULL,
+        absent INTEGER NOT NULL,
+        PRIMARY KEY (department, day)
+    ) WITHOUT ROWID;
+    """)
+
+    cur.executescript(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_coverage_request_insert AFTER INSERT ON vacation_requests
+    BEGIN
+        {_INVALIDATE_REQUEST_SQL.format(row='NEW')}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_coverage_request_update
+    AFTER UPDATE OF employee_id, start_date, end_date, status ON vacation_requests
+    BEGIN
+        {_INVALIDATE_REQUEST_SQL.format(row='OLD')}
+        {_INVALIDATE_REQUEST_SQL.format(row='NEW')}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_coverage_request_delete AFTER DELETE ON vacation_requests
+    BEGIN
+        {_INVALIDATE_REQUEST_SQL.format(row='OLD')}
+    END;
+
+    DROP TRIGGER IF EXISTS trg_coverage_employee_update;
+    CREATE TRIGGER trg_coverage_employee_update
+    AFTER UPDATE OF department, is_active ON employees
+    BEGIN
+        DELETE FROM coverage_buckets WHERE department IN (OLD.department, NEW.department);
+    END;
+    """)
+
+def _days(start_date, end_date):
+    return [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+
+def _sweep(db, start_date, end_date, departments):
+    """
+    Barrido de eventos: +1 al inicio y -1 al día siguiente al fin de cada intervalo
+    aprobado; el acumulado al recorrer los días es la cantidad de ausentes.
+    """
+    placeholders = ','.join(['?'] * len(departments))
+    status_placeholders = ','.join(['?'] * len(APPROVED_STATUSES))
+    rows = db.execute(
+        f"""
+        SELECT e.department, vr.start_date, vr.end_date
+        FROM vacation_intervals vi
+        JOIN vacation_requests vr ON vr.id = vi.id
+        JOIN employees e ON e.id = vr.employee_id
+        WHERE vi.start_day <= julianday(?) AND vi.end_day >= julianday(?)
+          AND vi.status IN ({status_placeholders})
+          AND e.is_active = 1 AND e.department IN ({placeholders})
+        """,
+        [end_date, start_date, *APPROVED_STATUSES, *departments]
+    ).fetchall()
+
+    events = defaultdict(lambda: defaultdict(int))
+    for row in rows:
+        events[row['department']][max(row['start_date'], start_date)] += 1
+        events[row['department']][min(row['end_date'], end_date) + timedelta(days=1)] -= 1
+
+    counts = {}
+    for department in departments:
+        dept_events = events[department]
+        absent = 0
+        counts[department] = {}
+        for day in _days(start_date, end_date):
+            absent += dept_events.get(day, 0)
+            counts[department][day] = absent
+    return counts
+
+def absent_by_day(db, start_date, end_date, departments):
+    """
+    Devuelve {departamento: {día: ausentes}} para el rango indicado. Usa los conteos
+    guardados y recalcula (y guarda) solo los departamentos con días invalidados.
+    """
+    if not departments:
+        return {}
+    expected_days = (end_date - start_date).days + 1
+    placeholders = ','.join(['?'] * len(departments))
+    cached_rows = db.execute(
+        f"""
+        SELECT department, day, absent FROM coverage_buckets
+        WHERE department IN ({placeholders}) AND day BETWEEN ? AND ?
+        """,
+        [*departments, start_date, end_date]
+    ).fetchall()
+
+    counts = defaultdict(dict)
+    for row in cached_rows:
+        counts[row['department']][row['day']] = row['absent']
+
+    stale = [d for d in departments if len(counts[d]) < expected_days]
+    if stale:
+        fresh = _sweep(db, start_date, end_date, stale)
+        counts.update(fresh)
+        window_start, window_end = _window()
+        buckets = [
+            (department, day, absent)
+            for department, days in fresh.items() for day, absent in days.items()
+            if window_start <= day <= window_end
+        ]
+        if buckets:
+            from .writer import run_write  # writer importa db, que importa este módulo
+
+            run_write(lambda conn: _store(conn, buckets, window_start, window_end))
+
+    return {d: counts[d] for d in departments}
+
+def _window():
+    today = date.today()
+    return today - timedelta(days=BUCKET_WINDOW_DAYS), today + timedelta(days=BUCKET_WINDOW_DAYS)
+
+def _store(conn, buckets, window_start, window_end):
+    conn.execute("DELETE FROM coverage_buckets WHERE day < ? OR day > ?", (window_start, window_end))
+    conn.executemany(
+        "INSERT INTO coverage_buckets (department, day, absent) VALUES (?, ?, ?) "
+        "ON CONFLICT (department, day) DO UPDATE SET absent = excluded.absent",
+        buckets
+    )
+
+def department_staffing(db, departments=None):
+    """Devuelve {departamento: (personal activo, mínimo presente o None)}."""
+    query = """
+        SELECT e.department, COUNT(*) AS headcount, st.min_present
+        FROM employees e
+        LEFT JOIN staffing_thresholds st ON st.department = e.department
+        WHERE e.is_active = 1 AND e.department IS NOT NULL AND e.department != ''
+    """
+    params = []
+    if departments is not None:
+        query += f" AND e.department IN ({','.join(['?'] * len(departments))})"
+        params.extend(departments)
+    query += " GROUP BY e.department, st.min_present ORDER BY e.department"
+    return {row['department']: (row['headcount'], row['min_present']) for row in db.execute(query, params).fetchall()}
+
+def heatmap(db, start_date, end_date, departments=None):
+    """Ausentes y presentes por día y departamento, marcando los días bajo el mínimo."""
+    staffing = department_staffing(db, departments)
+    counts = absent_by_day(db, start_date, end_date, list(staffing))
+    result = []
+    for department, (headcount, min_present) in staffing.items():
+        days = []
+        for day, absent in sorted(counts[department].items()):
+            present = headcount - absent
+            days.append({
+                'date': day.strftime('%Y-%m-%d'),
+                'absent': absent,
+                'present': present,
+                'below_minimum': min_present is not None and present < min_present
+            })
+        result.append({'department': department, 'headcount': headcount, 'min_present': min_present, 'days': days})
+    return result
+
+def request_coverage(db, requests):
+    """
+    Cobertura que quedaría en el departamento si se aprobara cada solicitud pendiente.
+    Devuelve {id de solicitud: {'absent', 'headcount', 'min_present', 'below_minimum'}}.
+    Las solicitudes deben incluir id, department, start_date y end_date.
+    """
+    by_department = defaultdict(list)
+    for req in requests:
+        if req['department']:
+            by_department[req['department']].append(req)
+    if not by_department:
+        return {}
+
+    staffing = department_staffing(db, list(by_department))
+    result = {}
+    for department, dept_requests in by_department.items():
+        if department not in staffing:
+            continue
+        headcount, min_present = staffing[department]
+        range_start = min(r['start_date'] for r in dept_requests)
+        range_end = max(r['end_date'] for r in dept_requests)
+        if (range_end - range_start).days >= MAX_RANGE_DAYS:
+            # Rangos muy dispersos: una consulta por solicitud
+            daily = {}
+            for r in dept_requests:
+                daily.update(absent_by_day(db, r['start_date'], r['end_date'], [department])[department])
+        else:
+            daily = absent_by_day(db, range_start, range_end, [department])[department]
+
+        for r in dept_requests:
+            # La solicitud aún no está aprobada: se suma al pico de ausentes del rango
+            peak = max(daily[day] for day in _days(r['start_date'], r['end_date'])) + 1
+            result[r['id']] = {
+                'absent': peak,
+                'headcount': headcount,
+                'min_present': min_present,
+                'below_minimum': min_present is not None and headcount - peak < min_present
+            }
+    return result
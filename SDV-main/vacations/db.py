@@ -1,8 +1,14 @@
 
+import hashlib
 import sqlite3
 from flask import current_app, g
 from datetime import datetime, date, timedelta
 from werkzeug.security import generate_password_hash
+from .intervals import setup_interval_index
+from .coverage import setup_coverage
+from .archive import setup_archive
+from .backends import create_backend
+from . import querylog
 
 def adapt_datetime_iso(val):
     return val.isoformat()
@@ -16,35 +22,115 @@ sqlite3.register_converter("timestamp", convert_timestamp)
 sqlite3.register_adapter(date, adapt_datetime_iso)
 sqlite3.register_converter("date", convert_date)
 
+def get_backend():
+    return current_app.extensions['db_backend']
+
 def get_db():
     if 'db' not in g:
-        g.db = sqlite3.connect(
-            current_app.config['DATABASE'],
-            detect_types=sqlite3.PARSE_DECLTYPES
-        )
-        g.db.row_factory = sqlite3.Row
+        g.db = querylog.wrap(get_backend().connect(), querylog.current_log())
     return g.db
 
 def close_db(e=None):
     db = g.pop('db', None)
     if db is not None:
-        db.close()
-
-def calculate_accrued_days(hire_date):
-    today = date.today()
-    seniority_years = (today - hire_date).days / 365.25
-    if seniority_years <= 5:
-        return 12
-    elif seniority_years <= 10:
-        return 18
-    else:
-        return 30
+        get_backend().release(querylog.unwrap(db))
+
+def integrity_errors():
+    """Excepciones de clave duplicada del motor en uso (para usar en except)."""
+    return get_backend().integrity_errors
+
+# Tablas de referencia cuyos cambios se registran en data_version (ver refcache.py)
+VERSIONED_TABLES = ('leave_types', 'roles', 'custom_holidays', 'saturday_config', 'email_config', 'employees')
+
+# Tablas transaccionales que también se cuentan en data_version: la copia de reportes se
+# refresca tras N cambios (ver snapshot.py) y la API arma ETag/Last-Modified (routes/api.py).
+# En PostgreSQL se cuentan una vez por transacción, al confirmarla (ver schema_postgres.sql)
+COUNTED_TABLES = ('vacation_requests', 'vacation_periods', 'vacation_requests_archive')
+
+# Escala de antigüedad por defecto para 'Vacaciones': (hasta N años cumplidos, días).
+# None indica sin límite superior. Se usa para sembrar la tabla accrual_policies.
+DEFAULT_ACCRUAL_TIERS = [(5, 12), (10, 18), (None, 30)]
+
+def calculate_accrued_days(hire_date, year=None):
+    """
+    Días de vacaciones según la escala por defecto. La antigüedad se mide en años
+    cumplidos al aniversario de ingreso dentro del año del periodo, de modo que el
+    resultado no depende del día en que se calcula.
+    """
+    year = year or date.today().year
+    seniority_years = year - hire_date.year
+    for max_years, days in DEFAULT_ACCRUAL_TIERS:
+        if max_years is None or seniority_years <= max_years:
+            return days
+
+def setup_data_version(cur):
+    """Crea data_version y los triggers que la incrementan en cada cambio (SQLite)."""
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS data_version (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0,
+        changed_at TIMESTAMP
+    );
+    """)
+    # Migración: momento del último cambio (Last-Modified de la API); los triggers se rehacen
+    columns = [row[1] for row in cur.execute("PRAGMA table_info(data_version)").fetchall()]
+    if 'changed_at' not in columns:
+        cur.execute("ALTER TABLE data_version ADD COLUMN changed_at TIMESTAMP")
+        for (trigger,) in cur.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_data_version_%'").fetchall():
+            cur.execute(f'DROP TRIGGER "{trigger}"')
+
+    for table in VERSIONED_TABLES + COUNTED_TABLES:
+        cur.execute("INSERT OR IGNORE INTO data_version (name) VALUES (?)", (table,))
+        for event in ('INSERT', 'UPDATE', 'DELETE'):
+            cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_data_version_{table}_{event.lower()} AFTER {event} ON {table}
+            BEGIN
+                UPDATE data_version SET version = version + 1, changed_at = strftime('%Y-%m-%d %H:%M:%f', 'now') WHERE name = '{table}';
+            END;
+            """)
+
+# Clave del advisory lock que serializa la instalación del esquema entre procesos (PostgreSQL)
+SCHEMA_LOCK_KEY = 0x534456
 
 def setup_database():
     print("Configurando la base de datos...")
     db = get_db()
+    if get_backend().name == 'postgresql':
+        setup_postgres_schema(db)
+    else:
+        setup_sqlite_schema(db)
+    # Con PostgreSQL el commit del seed libera el advisory lock del esquema
+    seed_database(db)
+
+def setup_postgres_schema(db):
+    """
+    Aplica schema_postgres.sql solo si cambió desde la última instalación (su hash queda
+    en schema_info). Los workers que arrancan a la vez se serializan con un advisory lock
+    de transacción: los demás esperan y encuentran el esquema ya instalado.
+    """
+    with current_app.open_resource('schema_postgres.sql') as f:
+        script = f.read().decode('utf-8')
+    digest = hashlib.sha256(script.encode('utf-8')).hexdigest()
+
+    db.execute("SELECT pg_advisory_xact_lock(?)", (SCHEMA_LOCK_KEY,))
+    db.execute("CREATE TABLE IF NOT EXISTS schema_info (id INTEGER PRIMARY KEY, digest TEXT NOT NULL, applied_at TIMESTAMP NOT NULL)")
+    row = db.execute("SELECT digest FROM schema_info WHERE id = 1").fetchone()
+    if row is None or row['digest'] != digest:
+        print("Aplicando schema_postgres.sql...")
+        db.executescript(script)
+        db.execute(
+            "INSERT INTO schema_info (id, digest, applied_at) VALUES (1, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET digest = excluded.digest, applied_at = excluded.applied_at",
+            (digest, datetime.now())
+        )
+
+def setup_sqlite_schema(db):
+    """Crea el esquema de SQLite y aplica las migraciones de bases existentes."""
     cur = db.cursor()
 
+    # WAL: las lecturas no bloquean al escritor (y viceversa) entre workers
+    cur.execute("PRAGMA journal_mode=WAL")
+
     # --- MIGRACIÓN AUTOMÁTICA: Eliminar restricción CHECK obsoleta en status ---
     try:
         schema_row = cur.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='vacation_requests'").fetchone()
@@ -132,11 +218,13 @@ def setup_database():
     try:
         # Verificar si ya tiene la columna leave_type_id
         cols = [row['name'] for row in cur.execute("PRAGMA table_info(vacation_periods)").fetchall()]
-        if 'leave_type_id' not in cols:
+        if cols and 'leave_type_id' not in cols:
             print("Migrando vacation_periods para soportar tipos de licencia...")
             
-            # Obtener ID de 'Vacaciones' para migrar datos existentes
-            vac_type = cur.execute("SELECT id FROM leave_types WHERE name = 'Vacaciones'").fetchone()
+            # Obtener ID de 'Vacaciones' para migrar datos existentes. En bases antiguas
+            # leave_types aún no existe (se crea más abajo) y 'Vacaciones' será el id 1.
+            has_leave_types = cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='leave_types'").fetchone()
+            vac_type = cur.execute("SELECT id FROM leave_types WHERE name = 'Vacaciones'").fetchone() if has_leave_types else None
             vac_type_id = vac_type['id'] if vac_type else 1
 
             cur.execute("DROP TABLE IF EXISTS vacation_periods_old")
@@ -156,9 +244,11 @@ def setup_database():
             """)
             
             # Copiar datos asumiendo que todo lo anterior era 'Vacaciones'
+            # (adjustment_comment puede no existir aún en la tabla antigua)
+            comment_col = 'adjustment_comment' if 'adjustment_comment' in cols else 'NULL'
             cur.execute(f"""
             INSERT INTO vacation_periods (id, employee_id, year, leave_type_id, total_days_accrued, days_taken, adjustment_comment)
-            SELECT id, employee_id, year, {vac_type_id}, total_days_accrued, days_taken, adjustment_comment FROM vacation_periods_old
+            SELECT id, employee_id, year, {vac_type_id}, total_days_accrued, days_taken, {comment_col} FROM vacation_periods_old
             """)
             cur.execute("DROP TABLE vacation_periods_old")
             db.commit()
@@ -212,12 +302,14 @@ def setup_database():
         leave_type_id INTEGER,
         days_requested REAL NOT NULL,
         replacement_name TEXT,
+        replacement_employee_id INTEGER,
         status TEXT NOT NULL DEFAULT 'Pendiente',
         cancellation_reason TEXT,
         interruption_reason TEXT,
         request_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
         manager_approval_date TIMESTAMP,
-        hr_approval_date TIMESTAMP
+        hr_approval_date TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 0
     );
     """)
     cur.execute("""
@@ -288,6 +380,36 @@ def setup_database():
         cur.execute("ALTER TABLE vacation_requests ADD COLUMN attachment_path TEXT")
     except sqlite3.OperationalError: pass
 
+    # Contador para concurrencia optimista (ver transitions.py)
+    try:
+        cur.execute("ALTER TABLE vacation_requests ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+    except sqlite3.OperationalError: pass
+
+    try:
+        cur.execute("ALTER TABLE vacation_requests ADD COLUMN replacement_employee_id INTEGER")
+    except sqlite3.OperationalError: pass
+
+    # Backfill: vincular el reemplazo por id cuando el nombre identifica a un único empleado
+    cur.execute("""
+        UPDATE vacation_requests SET replacement_employee_id = (
+            SELECT MIN(e.id) FROM employees e WHERE e.full_name = vacation_requests.replacement_name HAVING COUNT(*) = 1
+        )
+        WHERE replacement_employee_id IS NULL AND replacement_name IS NOT NULL AND replacement_name != ''
+    """)
+
+    # Índices para las verificaciones de superposición por empleado y por reemplazo
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_vacation_requests_employee ON vacation_requests (employee_id, start_date)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_vacation_requests_replacement ON vacation_requests (replacement_employee_id, start_date)")
+
+    # Índice de intervalos (R*Tree) para consultas de superposición
+    setup_interval_index(cur)
+
+    # Umbrales de personal y conteos diarios de ausentes por departamento
+    setup_coverage(cur)
+
+    # Archivo de solicitudes cerradas y vista con ambas tablas (ver archive.py)
+    setup_archive(cur)
+
     # Columnas nuevas para leave_types
     try:
         cur.execute("ALTER TABLE leave_types ADD COLUMN default_days INTEGER DEFAULT 0")
@@ -299,18 +421,16 @@ def setup_database():
         cur.execute("ALTER TABLE leave_types ADD COLUMN requires_attachment BOOLEAN DEFAULT 0")
     except sqlite3.OperationalError: pass
 
-    # Inicializar Tipos de Licencia por defecto
-    if cur.execute("SELECT COUNT(*) FROM leave_types").fetchone()[0] == 0:
-        cur.execute("INSERT INTO leave_types (name, requires_balance, consumption_type) VALUES ('Vacaciones', 1, 'Flexible')")
-
-    # Inicializar Roles por defecto
-    default_roles = ['Empleado', 'Jefe', 'RRHH', 'Asistente RRHH']
-    for role in default_roles:
-        try:
-            cur.execute("INSERT INTO roles (name, base_role, is_system_role) VALUES (?, ?, 1)", (role, role))
-        except sqlite3.IntegrityError:
-            # Asegurar que los roles del sistema tengan su base_role configurado (para migraciones)
-            cur.execute("UPDATE roles SET base_role = ? WHERE name = ? AND base_role IS NULL", (role, role))
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS accrual_policies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        leave_type_id INTEGER NOT NULL,
+        company TEXT, -- NULL = aplica a todas las empresas
+        max_years INTEGER, -- Hasta N años cumplidos (inclusive). NULL = sin límite
+        days REAL NOT NULL
+    );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_accrual_policies_lookup ON accrual_policies (leave_type_id, company, max_years)")
 
     cur.execute("""
     CREATE TABLE IF NOT EXISTS email_config (
@@ -321,6 +441,34 @@ def setup_database():
     );
     """)
 
+    # Contadores de cambios de las tablas de referencia (caché entre workers)
+    setup_data_version(cur)
+    db.commit()
+
+def seed_database(db):
+    """Datos iniciales (comunes a todos los motores)."""
+    cur = db.cursor()
+
+    # Inicializar Tipos de Licencia por defecto
+    if cur.execute("SELECT COUNT(*) FROM leave_types").fetchone()[0] == 0:
+        cur.execute("INSERT INTO leave_types (name, requires_balance, consumption_type) VALUES ('Vacaciones', 1, 'Flexible')")
+
+    # Inicializar la escala de antigüedad por defecto para 'Vacaciones'
+    if cur.execute("SELECT COUNT(*) FROM accrual_policies").fetchone()[0] == 0:
+        vac_type = cur.execute("SELECT id FROM leave_types WHERE name = 'Vacaciones'").fetchone()
+        if vac_type:
+            cur.executemany(
+                "INSERT INTO accrual_policies (leave_type_id, company, max_years, days) VALUES (?, NULL, ?, ?)",
+                [(vac_type['id'], max_years, days) for max_years, days in DEFAULT_ACCRUAL_TIERS]
+            )
+
+    # Inicializar Roles por defecto
+    default_roles = ['Empleado', 'Jefe', 'RRHH', 'Asistente RRHH']
+    for role in default_roles:
+        cur.execute("INSERT INTO roles (name, base_role, is_system_role) VALUES (?, ?, 1) ON CONFLICT (name) DO NOTHING", (role, role))
+        # Asegurar que los roles del sistema tengan su base_role configurado (para migraciones)
+        cur.execute("UPDATE roles SET base_role = ? WHERE name = ? AND base_role IS NULL", (role, role))
+
     # Inicializar configuración de correo por defecto (SMTP2GO)
     if cur.execute("SELECT COUNT(*) FROM email_config").fetchone()[0] == 0:
         cur.execute("""
@@ -339,7 +487,7 @@ def setup_database():
         ('jefe_ventas', ?, 'Juan Perez (Jefe)', 'jperez@empresa.com', '2018-03-20', 'Jefe', 1, 'Ventas', 'Jefe de Ventas', 'Mi Empresa', 0),
         ('empleado1', ?, 'Ana Lopez', 'alopez@empresa.com', '2022-06-01', 'Empleado', 2, 'Ventas', 'Vendedora', 'Mi Empresa', 0),
         ('empleado2', ?, 'Carlos Vera', 'cvera@empresa.com', '2016-11-10', 'Empleado', 2, 'Marketing', 'Analista de Marketing', 'Mi Empresa', 0);
-        """, (hashed_password, hashed_password, hashed_password, hashed_password))
+        """, (hashed_password,) * 5)
         print("Datos de ejemplo de empleados insertados.")
 
         print("Generando periodos y solicitudes de ejemplo...")
@@ -348,7 +496,7 @@ def setup_database():
         employees_for_period = cur.execute("SELECT id, hire_date FROM employees").fetchall()
         for emp in employees_for_period:
             hire_date_obj = emp['hire_date']
-            accrued_days = calculate_accrued_days(hire_date_obj)
+            accrued_days = calculate_accrued_days(hire_date_obj, current_year)
             cur.execute(
                 "INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued) VALUES (?, ?, (SELECT id FROM leave_types WHERE name='Vacaciones'), ?)",
                 (emp['id'], current_year, accrued_days)
@@ -380,15 +528,8 @@ def setup_database():
 
     db.commit()
 
-def get_email_config():
-    db = get_db()
-    config_row = db.execute("SELECT * FROM email_config ORDER BY id DESC LIMIT 1").fetchone()
-
-    if config_row:
-        return {key.upper(): config_row[key] for key in config_row.keys() if key != 'id'}
-    return {}
-
 def init_app(app):
+    app.extensions['db_backend'] = create_backend(app.config)
     app.teardown_appcontext(close_db)
     with app.app_context():
         setup_database()
\ No newline at end of file
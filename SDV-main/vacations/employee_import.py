@@ -0,0 +1,278 @@
+# vacations/employee_import.py
+# Importación masiva de empleados locales desde XLSX o CSV (RRHH > Empleados > Importar).
+#
+# El archivo se lee fila por fila (openpyxl en modo read_only o el módulo csv), sin
+# cargarlo entero en memoria. Cada fila se valida contra búsquedas precargadas (roles,
+# usuarios existentes, jefes) y las válidas se insertan en lotes de una transacción.
+# Los hashes de contraseña (lo más costoso de dar de alta un empleado) se calculan en
+# paralelo (ver PasswordHasher). El jefe puede ser un empleado existente o uno del mismo archivo:
+# se asigna al final, cuando todos los usuarios ya existen.
+#
+# Columnas (encabezados de la exportación de empleados, sin distinguir mayúsculas):
+# Usuario, Nombre Completo, Fecha Contratación (DD/MM/YYYY) obligatorias; Email, Puesto,
+# Departamento, Empresa, Rol (por defecto Empleado), Contraseña (por defecto la del
+# formulario) y Jefe Directo (nombre completo) o Usuario Jefe.
+
+import csv
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+from werkzeug.security import generate_password_hash
+
+DEFAULT_BATCH_SIZE = 200
+DEFAULT_ROLE = 'Empleado'
+
+# Encabezado (en minúsculas) -> campo
+HEADERS = {
+    'usuario': 'username', 'username': 'username',
+    'nombre completo': 'full_name', 'nombre': 'full_name', 'full_name': 'full_name',
+    'email': 'email', 'correo': 'email', 'correo electrónico': 'email',
+    'puesto': 'job_title', 'job_title': 'job_title',
+    'departamento': 'department', 'department': 'department',
+    'empresa': 'company', 'company': 'company',
+    'fecha contratación': 'hire_date', 'fecha de contratación': 'hire_date', 'hire_date': 'hire_date',
+    'rol': 'role', 'role': 'role',
+    'contraseña': 'password', 'password': 'password',
+    'jefe directo': 'manager_name', 'jefe': 'manager_name',
+    'usuario jefe': 'manager_username', 'manager_username': 'manager_username',
+}
+REQUIRED = ('username', 'full_name', 'hire_date')
+LABELS = {'username': 'Usuario', 'full_name': 'Nombre Completo', 'hire_date': 'Fecha Contratación'}
+
+class ImportFormatError(ValueError):
+    """El archivo no se puede leer o le faltan columnas obligatorias."""
+
+def _cell(value):
+    if value is None:
+        return ''
+    return value if isinstance(value, (date, datetime)) else str(value).strip()
+
+def _xlsx_rows(stream):
+    from openpyxl import load_workbook  # Importación diferida: solo se usa al importar
+    try:
+        workbook = load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ImportFormatError(f"No se pudo leer el archivo Excel: {e}") from e
+    try:
+        for values in workbook.active.iter_rows(values_only=True):
+            yield [_cell(value) for value in values]
+    finally:
+        workbook.close()
+
+def _csv_rows(stream):
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    try:
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        for values in csv.reader(text, dialect):
+            yield [_cell(value) for value in values]
+    except UnicodeDecodeError as e:
+        raise ImportFormatError("El CSV debe estar codificado en UTF-8.") from e
+    finally:
+        text.detach()
+
+def read_table(stream, filename, headers, labels):
+    """
+    Genera (número de fila, dict de campos) de un archivo XLSX o CSV. headers traduce
+    cada encabezado (en minúsculas) a un campo; labels indica los campos obligatorios.
+    """
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.xlsx':
+        rows = _xlsx_rows(stream)
+    elif extension == '.csv':
+        rows = _csv_rows(stream)
+    else:
+        raise ImportFormatError("Formato no soportado: use .xlsx o .csv.")
+
+    header = next(rows, None)
+    if header is None:
+        raise ImportFormatError("El archivo está vacío.")
+    fields = [headers.get(str(name).lower()) for name in header]
+    missing = [label for name, label in labels.items() if name not in fields]
+    if missing:
+        raise ImportFormatError("Faltan columnas obligatorias: " + ", ".join(missing))
+
+    for number, values in enumerate(rows, start=2):
+        if not any(values):
+            continue
+        yield number, {field: value for field, value in zip(fields, values) if field}
+
+def read_rows(stream, filename):
+    """Filas de empleados de un archivo XLSX o CSV (ver read_table)."""
+    return read_table(stream, filename, HEADERS, LABELS)
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in ('%d/%m/%Y', '%Y-%m-%d'):
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"fecha de contratación inválida '{value}' (use DD/MM/YYYY)")
+
+class Lookups:
+    """Roles, usuarios y nombres existentes, cargados una vez por importación."""
+
+    def __init__(self, db):
+        self.roles = {row['name'] for row in db.execute("SELECT name FROM roles").fetchall()}
+        self.usernames = {}
+        self.full_names = {}
+        for row in db.execute("SELECT id, username, full_name FROM employees WHERE is_active = 1").fetchall():
+            self.usernames[row['username'].lower()] = row['id']
+            self.full_names.setdefault(row['full_name'].lower(), []).append(row['id'])
+        self.taken = {row[0].lower() for row in db.execute("SELECT username FROM employees").fetchall()}
+
+    def add(self, employee_id, username, full_name):
+        self.usernames[username.lower()] = employee_id
+        self.full_names.setdefault(full_name.lower(), []).append(employee_id)
+
+    def manager(self, username, full_name):
+        """Id del jefe (o None) y el error si no se encontró o es ambiguo."""
+        if username:
+            found = self.usernames.get(username.lower())
+            return (found, None) if found else (None, f"jefe '{username}' no encontrado")
+        if full_name:
+            found = self.full_names.get(full_name.lower(), [])
+            if len(found) == 1:
+                return found[0], None
+            return None, f"jefe '{full_name}' {'ambiguo: use Usuario Jefe' if found else 'no encontrado'}"
+        return None, None
+
+def validate(fields, lookups, default_password, seen):
+    """Devuelve la fila lista para insertar o levanta ValueError con el motivo."""
+    for name in REQUIRED:
+        if not fields.get(name):
+            raise ValueError(f"falta {LABELS[name]}")
+    username = str(fields['username'])
+    if username.lower() in lookups.taken:
+        raise ValueError(f"el usuario '{username}' ya existe")
+    if username.lower() in seen:
+        raise ValueError(f"el usuario '{username}' está repetido en el archivo (fila {seen[username.lower()]})")
+    role = fields.get('role') or DEFAULT_ROLE
+    if role not in lookups.roles:
+        raise ValueError(f"rol '{role}' inexistente")
+    password = str(fields.get('password') or default_password or '')
+    if not password:
+        raise ValueError("falta la contraseña (columna Contraseña o contraseña inicial del formulario)")
+    return {
+        'username': username,
+        'full_name': str(fields['full_name']),
+        'email': str(fields.get('email') or '') or None,
+        'password': password,
+        'hire_date': _parse_date(fields['hire_date']),
+        'role': role,
+        'department': str(fields.get('department') or '') or None,
+        'job_title': str(fields.get('job_title') or '') or None,
+        'company': str(fields.get('company') or '') or None,
+        'manager_username': str(fields.get('manager_username') or ''),
+        'manager_name': str(fields.get('manager_name') or ''),
+    }
+
+class PasswordHasher:
+    """
+    generate_password_hash en paralelo. Es un pool de hilos: hashlib libera el GIL durante
+    scrypt/pbkdf2, y un pool de procesos volvería a ejecutar run.py (create_app) en cada
+    proceso hijo con spawn (Windows) o heredaría locks de los hilos del worker con fork.
+    """
+
+    def __init__(self, workers):
+        self.workers = max(1, workers or 1)
+        self._pool = None
+
+    def hash_all(self, passwords):
+        if self.workers == 1 or len(passwords) < 2:
+            return [generate_password_hash(password) for password in passwords]
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='import-hash')
+        return list(self._pool.map(generate_password_hash, passwords))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+
+# ON CONFLICT en lugar de capturar IntegrityError: en PostgreSQL el error deshace la
+# transacción entera y con ella las filas del lote ya insertadas
+INSERT_SQL = """
+    INSERT INTO employees (username, full_name, email, password, hire_date, role, department, job_title, company, is_active, is_ad_managed)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 0)
+    ON CONFLICT (username) DO NOTHING
+    RETURNING id
+"""
+
+def _insert_batch(db, batch, hashes, lookups, report):
+    for (number, row), hashed in zip(batch, hashes):
+        inserted = db.execute(INSERT_SQL, (
+            row['username'], row['full_name'], row['email'], hashed, row['hire_date'],
+            row['role'], row['department'], row['job_title'], row['company']
+        )).fetchone()
+        if inserted is None:
+            # Creado por otra sesión después de precargar los usuarios
+            report[number] = {'row': number, 'username': row['username'], 'ok': False, 'message': "el usuario ya existe"}
+            continue
+        employee_id = inserted['id']
+        row['id'] = employee_id
+        lookups.add(employee_id, row['username'], row['full_name'])
+        report[number] = {'row': number, 'username': row['username'], 'ok': True, 'message': "importado"}
+    db.commit()
+
+def import_employees(db, rows, default_password=None, dry_run=False, batch_size=DEFAULT_BATCH_SIZE, workers=None):
+    """
+    Valida e inserta las filas de read_rows(). Devuelve el reporte por fila (lista de
+    dicts row, username, ok, message) ordenado por fila. Con dry_run solo se valida.
+    """
+    lookups = Lookups(db)
+    hasher = PasswordHasher(workers or os.cpu_count())
+    report = {}
+    seen = {}
+    accepted = []
+    batch = []
+
+    def flush():
+        if dry_run:
+            for number, row in batch:
+                # Los jefes del mismo archivo también valen en la validación
+                row['id'] = -number
+                lookups.add(row['id'], row['username'], row['full_name'])
+                report[number] = {'row': number, 'username': row['username'], 'ok': True, 'message': "válido"}
+        elif batch:
+            _insert_batch(db, batch, hasher.hash_all([row['password'] for _, row in batch]), lookups, report)
+        accepted.extend((number, row) for number, row in batch if 'id' in row)
+        batch.clear()
+
+    try:
+        for number, fields in rows:
+            try:
+                row = validate(fields, lookups, default_password, seen)
+            except ValueError as e:
+                report[number] = {'row': number, 'username': fields.get('username') or '', 'ok': False, 'message': str(e)}
+                continue
+            seen[row['username'].lower()] = number
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                flush()
+        flush()
+    finally:
+        hasher.close()
+
+    # Jefes al final: se aceptan jefes que aparecen más abajo en el archivo
+    assignments = []
+    for number, row in accepted:
+        manager_id, error = lookups.manager(row['manager_username'], row['manager_name'])
+        if error:
+            report[number]['message'] += f" (sin jefe: {error})"
+        elif manager_id is not None and manager_id != row['id']:
+            assignments.append((manager_id, row['id']))
+    if assignments and not dry_run:
+        db.executemany("UPDATE employees SET manager_id = ? WHERE id = ?", assignments)
+        db.commit()
+
+    return [report[number] for number in sorted(report)]
@@ -0,0 +1,110 @@
+# vacations/intervals.py
+# Índice de intervalos (R*Tree de SQLite) para detectar superposiciones de
+# vacaciones y compromisos de reemplazo sin recorrer toda la tabla.
+#
+# vacation_intervals:    (días julianos) x (employee_id) por solicitud.
+# replacement_intervals: (días julianos) x (replacement_employee_id) por solicitud.
+# Ambos se mantienen con triggers sobre vacation_requests (ver setup_interval_index).
+
+# Estados que ocupan al empleado (vacación aprobada o en curso)
+APPROVED_STATUSES = ('Aprobado por RRHH', 'Activo')
+# Estados que bloquean una nueva solicitud del mismo empleado
+OPEN_STATUSES = ('Pendiente', 'Aprobado por Jefe', 'Aprobado por RRHH', 'Activo')
+
+_INTERVAL_ROW_SQL = "SELECT {row}.id, julianday({row}.start_date), julianday({row}.end_date), {row}.{key}, {row}.{key}, {row}.status"
+
+def setup_interval_index(cur):
+    """
+    Crea los índices R*Tree y sus triggers. Si los triggers no existían (base nueva o
+    tabla vacation_requests recreada por una migración) se reconstruyen los índices.
+    """
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS vacation_intervals USING rtree(
+        id, start_day, end_day, employee_min, employee_max, +status TEXT
+    );
+    """)
+    cur.execute("""
+    CREATE VIRTUAL TABLE IF NOT EXISTS replacement_intervals USING rtree(
+        id, start_day, end_day, employee_min, employee_max, +status TEXT
+    );
+    """)
+
+    triggers_exist = cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_vacation_intervals_insert'"
+    ).fetchone()
+    if triggers_exist:
+        return
+
+    employee_row = _INTERVAL_ROW_SQL.format(row='NEW', key='employee_id')
+    replacement_row = _INTERVAL_ROW_SQL.format(row='NEW', key='replacement_employee_id')
+    sync_new = f"""
+        INSERT INTO vacation_intervals {employee_row};
+        INSERT INTO replacement_intervals {replacement_row} WHERE NEW.replacement_employee_id IS NOT NULL;
+    """
+    cur.executescript(f"""
+    CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_insert AFTER INSERT ON vacation_requests
+    BEGIN
+        {sync_new}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_update
+    AFTER UPDATE OF employee_id, replacement_employee_id, start_date, end_date, status ON vacation_requests
+    BEGIN
+        DELETE FROM vacation_intervals WHERE id = OLD.id;
+        DELETE FROM replacement_intervals WHERE id = OLD.id;
+        {sync_new}
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS trg_vacation_intervals_delete AFTER DELETE ON vacation_requests
+    BEGIN
+        DELETE FROM vacation_intervals WHERE id = OLD.id;
+        DELETE FROM replacement_intervals WHERE id = OLD.id;
+    END;
+    """)
+    rebuild_interval_index(cur)
+
+def rebuild_interval_index(cur):
+    """Recarga ambos índices desde vacation_requests."""
+    cur.execute("DELETE FROM vacation_intervals")
+    cur.execute("DELETE FROM replacement_intervals")
+    cur.execute(f"INSERT INTO vacation_intervals {_INTERVAL_ROW_SQL.format(row='vr', key='employee_id')} FROM vacation_requests vr")
+    cur.execute(
+        f"INSERT INTO replacement_intervals {_INTERVAL_ROW_SQL.format(row='vr', key='replacement_employee_id')} "
+        "FROM vacation_requests vr WHERE vr.replacement_employee_id IS NOT NULL"
+    )
+
+def _find(db, table, start_date, end_date, statuses, employee_id=None, exclude_request_id=None):
+    query = f"""
+        SELECT vr.id, vr.employee_id, vr.replacement_employee_id, vr.start_date, vr.end_date, vr.status
+        FROM {table} vi
+        JOIN vacation_requests vr ON vr.id = vi.id
+        WHERE vi.start_day <= julianday(?) AND vi.end_day >= julianday(?)
+    """
+    params = [end_date, start_date]
+    if employee_id is not None:
+        query += " AND vi.employee_min <= ? AND vi.employee_max >= ?"
+        params.extend([employee_id, employee_id])
+    if statuses:
+        query += f" AND vi.status IN ({','.join(['?'] * len(statuses))})"
+        params.extend(statuses)
+    if exclude_request_id is not None:
+        query += " AND vi.id != ?"
+        params.append(exclude_request_id)
+    query += " ORDER BY vr.start_date"
+    return db.execute(query, params).fetchall()
+
+def who_is_out(db, start_date, end_date, statuses=APPROVED_STATUSES):
+    """Solicitudes (con su empleado) que se superponen con el rango indicado."""
+    return _find(db, 'vacation_intervals', start_date, end_date, statuses)
+
+def employee_absences(db, employee_id, start_date, end_date, statuses=APPROVED_STATUSES, exclude_request_id=None):
+    """Solicitudes propias del empleado que se superponen con el rango indicado."""
+    return _find(db, 'vacation_intervals', start_date, end_date, statuses, employee_id, exclude_request_id)
+
+def is_employee_busy(db, employee_id, start_date, end_date, statuses=APPROVED_STATUSES, exclude_request_id=None):
+    """True si el empleado tiene una ausencia en el rango indicado."""
+    return bool(employee_absences(db, employee_id, start_date, end_date, statuses, exclude_request_id))
+
+def replacement_commitments(db, employee_id, start_date, end_date, statuses=APPROVED_STATUSES, exclude_request_id=None):
+    """Solicitudes en las que el empleado figura como reemplazo dentro del rango indicado."""
+    return _find(db, 'replacement_intervals', start_date, end_date, statuses, employee_id, exclude_request_id)
@@ -0,0 +1,302 @@
+# vacations/loadtest.py
+# Prueba de carga HTTP con los recorridos reales de la aplicación (flask sdv loadtest):
+#
+#   empleado:  login -> dashboard -> formulario -> nueva solicitud
+#   jefe:      login -> bandeja (manage) -> aprobar la solicitud
+#   RRHH:      login -> aprobaciones -> aprobar -> exportar solicitudes y empleados
+#
+# Se ejecuta contra un servidor local (gunicorn o waitress) que use la misma base de datos:
+# los usuarios sintéticos (flask sdv seed) y las solicitudes creadas se buscan en ella.
+# Cada usuario virtual es un hilo con sus propias sesiones (cookie) y conexiones; al
+# final se informan p50/p95/p99 y errores por paso.
+
+import http.client
+import http.cookies
+import math
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from datetime import date, datetime, timedelta
+
+from flask import current_app
+
+from .db import get_db
+from .synthetic import USERNAME_PREFIX
+
+STEPS = (
+    'login', 'dashboard', 'new_request_form', 'new_request',
+    'manager_login', 'manager_inbox', 'manager_approve',
+    'hr_login', 'hr_approvals', 'hr_approve', 'export_requests', 'export_employees',
+)
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+class HttpSession:
+    """Cliente HTTP mínimo: conexión persistente, cookie de sesión y sin seguir redirecciones."""
+
+    def __init__(self, base_url, timeout=60):
+        parts = urllib.parse.urlsplit(base_url)
+        self.https = parts.scheme == 'https'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self.cookies = {}
+        self._conn = None
+
+    def request(self, method, path, form=None):
+        if self._conn is None:
+            connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            self._conn = connection_class(self.host, self.port, timeout=self.timeout)
+        headers = {}
+        body = None
+        if form is not None:
+            body = urllib.parse.urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{name}={value}" for name, value in self.cookies.items())
+        try:
+            self._conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self._conn.getresponse()
+            content = response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in http.cookies.SimpleCookie(header).items():
+                if morsel.value:
+                    self.cookies[name] = morsel.value
+                else:
+                    self.cookies.pop(name, None)  # session.clear() la borra con valor vacío
+        return response.status, response.headers, content
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+class LoadStats:
+    """Tiempos y errores por paso, compartidos entre los usuarios virtuales."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.timings = {step: [] for step in STEPS}
+        self.errors = {step: Counter() for step in STEPS}
+
+    def record(self, step, elapsed, error=None):
+        with self._lock:
+            self.timings[step].append(elapsed)
+            if error:
+                self.errors[step][error] += 1
+
+    def fail(self, step, error):
+        """Error detectado después de medir el paso (ej: el estado no cambió)."""
+        with self._lock:
+            self.errors[step][error] += 1
+
+    def summary(self):
+        rows = []
+        for step in STEPS:
+            values = sorted(self.timings[step])
+            if not values:
+                continue
+            rows.append({
+                'step': step,
+                'count': len(values),
+                'errors': sum(self.errors[step].values()),
+                'error_detail': dict(self.errors[step]),
+                'p50': _percentile(values, 50),
+                'p95': _percentile(values, 95),
+                'p99': _percentile(values, 99),
+                'max': values[-1],
+            })
+        return rows
+
+def _percentile(values, percent):
+    """Percentil por rango más cercano sobre una lista ordenada."""
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+def _redirects_to(path):
+    return lambda status, headers: status in (302, 303) and urllib.parse.urlsplit(headers.get('Location', '')).path.endswith(path)
+
+def _is_page(status, headers):
+    return status == 200 and headers.get('Content-Type', '').startswith('text/html')
+
+def _is_spreadsheet(status, headers):
+    return status == 200 and headers.get('Content-Type', '').startswith(XLSX_MIMETYPE)
+
+class VirtualUser(threading.Thread):
+    """Un empleado con su jefe y el usuario de RRHH, repitiendo el recorrido completo."""
+
+    def __init__(self, app, base_url, stats, plan, hr_username, password, exports, delay):
+        super().__init__(name=f"loadtest-{plan['username']}", daemon=True)
+        self.app = app
+        self.base_url = base_url
+        self.stats = stats
+        self.plan = plan
+        self.hr_username = hr_username
+        self.password = password
+        self.exports = exports
+        self.delay = delay
+
+    def step(self, name, session, method, path, expect, form=None):
+        """Ejecuta y mide un paso; devuelve la respuesta o None si falló."""
+        started = time.perf_counter()
+        try:
+            status, headers, content = session.request(method, path, form)
+        except (OSError, http.client.HTTPException) as e:
+            self.stats.record(name, time.perf_counter() - started, type(e).__name__)
+            return None
+        elapsed = time.perf_counter() - started
+        if status >= 400:
+            error = f"HTTP {status}"
+        elif not expect(status, headers):
+            error = f"respuesta inesperada ({status})"
+        else:
+            error = None
+        self.stats.record(name, elapsed, error)
+        return None if error else (status, headers, content)
+
+    def login(self, step, username):
+        session = HttpSession(self.base_url)
+        if self.step(step, session, 'POST', '/auth/login', _redirects_to('/dashboard'),
+                     {'username': username, 'password': self.password}):
+            return session
+        session.close()
+        return None
+
+    def request_status(self, request_id):
+        row = get_db().execute("SELECT status FROM vacation_requests WHERE id = ?", (request_id,)).fetchone()
+        return row['status'] if row else None
+
+    def run(self):
+        time.sleep(self.delay)
+        with self.app.app_context():
+            for day in self.plan['dates']:
+                self.journey(day)
+
+    def journey(self, day):
+        plan = self.plan
+
+        # Empleado: nueva solicitud de un día
+        employee = self.login('login', plan['username'])
+        if not employee:
+            return
+        self.step('dashboard', employee, 'GET', '/dashboard', _is_page)
+        self.step('new_request_form', employee, 'GET', '/vacations/new', _is_page)
+        created = self.step('new_request', employee, 'POST', '/vacations/new', _redirects_to('/dashboard'), {
+            'request_type': 'FullDay',
+            'leave_type_id': plan['leave_type_id'],
+            'start_date': day.strftime('%d/%m/%Y'),
+            'end_date': day.strftime('%d/%m/%Y'),
+            'replacement_employee_id': plan['replacement_id'],
+        })
+        employee.close()
+        if not created:
+            return
+        row = get_db().execute(
+            "SELECT id FROM vacation_requests WHERE employee_id = ? AND start_date = ? ORDER BY id DESC LIMIT 1",
+            (plan['employee_id'], day)
+        ).fetchone()
+        if not row:
+            return
+        request_id = row['id']
+
+        # Jefe: bandeja y aprobación (el redirect es el mismo si falla: se verifica el estado)
+        manager = self.login('manager_login', plan['manager'])
+        if not manager:
+            return
+        self.step('manager_inbox', manager, 'GET', '/vacations/manage', _is_page)
+        approved = self.step('manager_approve', manager, 'POST', f"/vacations/approve/{request_id}", _redirects_to('/vacations/manage'), {})
+        manager.close()
+        if not approved:
+            return
+        if self.request_status(request_id) != 'Aprobado por Jefe':
+            self.stats.fail('manager_approve', 'estado no actualizado')
+            return
+
+        # RRHH: aprobación final y exportaciones
+        hr = self.login('hr_login', self.hr_username)
+        if not hr:
+            return
+        self.step('hr_approvals', hr, 'GET', '/hr/approvals', _is_page)
+        if self.step('hr_approve', hr, 'POST', f"/hr/approve/{request_id}", _redirects_to('/hr/approvals'), {}):
+            if self.request_status(request_id) != 'Aprobado por RRHH':
+                self.stats.fail('hr_approve', 'estado no actualizado')
+        if self.exports:
+            self.step('export_requests', hr, 'GET', '/hr/all_requests?export=true', _is_spreadsheet)
+            self.step('export_employees', hr, 'GET', '/hr/employees?export=true', _is_spreadsheet)
+        hr.close()
+
+def _free_working_days(db, count):
+    """Días hábiles futuros sin solicitudes, uno por recorrido (no chocan entre sí ni con reemplazos)."""
+    from .utils import calculate_working_days
+
+    last = db.execute("SELECT MAX(end_date) FROM vacation_requests").fetchone()[0]
+    if isinstance(last, str):
+        last = datetime.strptime(last[:10], '%Y-%m-%d').date()
+    day = max(date(date.today().year + 2, 1, 1), (last or date.today()) + timedelta(days=1))
+    days = []
+    while len(days) < count:
+        if day.weekday() < 5 and calculate_working_days(day, day) > 0:
+            days.append(day)
+        day += timedelta(days=1)
+    return days
+
+def build_plan(users, iterations, hr_username=None):
+    """Asigna a cada usuario virtual un empleado sintético con saldo, su jefe, un reemplazo y fechas libres."""
+    db = get_db()
+    leave_type_id = db.execute("SELECT id FROM leave_types WHERE name = 'Vacaciones'").fetchone()['id']
+    if hr_username is None:
+        row = db.execute(
+            "SELECT e.username FROM employees e JOIN roles r ON e.role = r.name "
+            "WHERE r.base_role = 'RRHH' AND e.is_active = 1 ORDER BY e.id LIMIT 1"
+        ).fetchone()
+        if not row:
+            raise ValueError("No hay un usuario RRHH activo.")
+        hr_username = row['username']
+
+    employees = db.execute("""
+        SELECT e.id, e.username, m.username AS manager
+        FROM employees e
+        JOIN employees m ON m.id = e.manager_id
+        JOIN vacation_periods p ON p.employee_id = e.id AND p.leave_type_id = ?
+        WHERE e.username LIKE ? AND e.role = 'Empleado' AND e.is_active = 1 AND m.is_active = 1
+        GROUP BY e.id, e.username, m.username
+        HAVING SUM(p.total_days_accrued - p.days_taken) >= ?
+        ORDER BY e.id
+        LIMIT ?
+    """, (leave_type_id, USERNAME_PREFIX + '_emp_%', iterations, users + 1)).fetchall()
+    if len(employees) < users + 1:
+        raise ValueError(
+            f"Se necesitan {users + 1} empleados sintéticos con al menos {iterations} días de saldo "
+            f"y hay {len(employees)}. Genere más con: flask sdv seed"
+        )
+
+    # El empleado siguiente hace de reemplazo: las fechas son únicas, así que nunca está ocupado
+    dates = _free_working_days(db, users * iterations)
+    return hr_username, [{
+        'employee_id': employee['id'],
+        'username': employee['username'],
+        'manager': employee['manager'],
+        'replacement_id': employees[i + 1]['id'],
+        'leave_type_id': leave_type_id,
+        'dates': dates[i * iterations:(i + 1) * iterations],
+    } for i, employee in enumerate(employees[:users])]
+
+def run_load_test(base_url, users=10, iterations=3, ramp_up=0, password='123', hr_username=None, exports=True):
+    """Ejecuta la prueba y devuelve (resumen por paso, segundos totales)."""
+    app = current_app._get_current_object()
+    hr_username, plan = build_plan(users, iterations, hr_username)
+    stats = LoadStats()
+    threads = [
+        VirtualUser(app, base_url, stats, entry, hr_username, password, exports, ramp_up * i / max(users, 1))
+        for i, entry in enumerate(plan)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.summary(), time.perf_counter() - started
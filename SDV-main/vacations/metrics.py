@@ -0,0 +1,166 @@
+# vacations/metrics.py
+# Métricas en formato Prometheus expuestas en /metrics:
+#
+#   sdv_request_duration_seconds     latencia por endpoint (main.*, vacation_routes.*, hr.*...)
+#   sdv_request_db_seconds           tiempo de base de datos por petición (ver querylog.py)
+#   sdv_request_queries              sentencias SQL por petición
+#   sdv_email_*                      duración y resultado de send_email
+#   sdv_ad_sync_*                    duración, resultado y registros de la sincronización con AD
+#   sdv_pending_approvals            solicitudes pendientes por etapa (se consulta al leer /metrics)
+#   sdv_write_queue_depth            unidades de escritura en cola (ver writer.py)
+#
+# Con gunicorn cada worker escribe sus valores en PROMETHEUS_MULTIPROC_DIR y /metrics
+# los suma (gunicorn.conf.py crea el directorio y limpia los workers que terminan).
+# prometheus_client es opcional: si no está instalado las funciones no hacen nada.
+#
+# Desactivado por defecto (METRICS). Fuera de modo debug o testing exige METRICS_TOKEN:
+# sin token /metrics no se registra, porque publica endpoints y solicitudes pendientes.
+
+import hmac
+import os
+import time
+
+from flask import Response, current_app, g, request
+
+from .db import get_db
+
+# Etapas de aprobación que se informan en sdv_pending_approvals
+PENDING_STAGES = {
+    'Pendiente': 'jefe',
+    'Aprobado por Jefe': 'rrhh',
+    'Anulación Pendiente RRHH': 'anulacion',
+}
+
+_metrics = None
+
+class _Metrics:
+    """Métricas del proceso (se crean una sola vez: el registro de Prometheus es global)."""
+
+    def __init__(self):
+        from prometheus_client import Counter, Gauge, Histogram
+
+        self.request_duration = Histogram(
+            'sdv_request_duration_seconds', 'Duración de las peticiones HTTP.',
+            ['blueprint', 'endpoint', 'method', 'status']
+        )
+        self.request_db = Histogram(
+            'sdv_request_db_seconds', 'Tiempo de base de datos por petición.', ['blueprint']
+        )
+        self.request_queries = Histogram(
+            'sdv_request_queries', 'Sentencias SQL por petición.', ['blueprint'],
+            buckets=(1, 2, 5, 10, 20, 50, 100, 200)
+        )
+        self.email_duration = Histogram('sdv_email_send_seconds', 'Duración de send_email.')
+        self.emails = Counter('sdv_emails', 'Correos por resultado.', ['result'])
+        self.ad_sync_duration = Histogram(
+            'sdv_ad_sync_duration_seconds', 'Duración de la sincronización con AD.',
+            buckets=(1, 5, 15, 30, 60, 120, 300, 600)
+        )
+        self.ad_syncs = Counter('sdv_ad_syncs', 'Sincronizaciones con AD por resultado.', ['result'])
+        self.ad_sync_records = Counter('sdv_ad_sync_records', 'Usuarios procesados por la sincronización con AD.', ['action'])
+        self.write_queue_depth = Gauge(
+            'sdv_write_queue_depth', 'Unidades de escritura en cola o en ejecución.',
+            multiprocess_mode='livesum'
+        )
+
+class PendingApprovalsCollector:
+    """Solicitudes pendientes por etapa, consultadas en cada lectura de /metrics."""
+
+    def describe(self):
+        from prometheus_client.core import GaugeMetricFamily
+        return [GaugeMetricFamily('sdv_pending_approvals', 'Solicitudes pendientes por etapa.', labels=['stage'])]
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        family = GaugeMetricFamily('sdv_pending_approvals', 'Solicitudes pendientes por etapa.', labels=['stage'])
+        placeholders = ', '.join('?' for _ in PENDING_STAGES)
+        counts = dict.fromkeys(PENDING_STAGES, 0)
+        for row in get_db().execute(
+            f"SELECT status, COUNT(*) AS total FROM vacation_requests WHERE status IN ({placeholders}) GROUP BY status",
+            tuple(PENDING_STAGES)
+        ).fetchall():
+            counts[row['status']] = row['total']
+        for status, stage in PENDING_STAGES.items():
+            family.add_metric([stage], counts[status])
+        yield family
+
+def _blueprint():
+    return request.blueprint or 'app'
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    if started is not None and request.endpoint != 'metrics':
+        _metrics.request_duration.labels(
+            _blueprint(), request.endpoint or 'sin_ruta', request.method, str(response.status_code)
+        ).observe(time.perf_counter() - started)
+    return response
+
+def _observe_queries(log):
+    blueprint = _blueprint()
+    _metrics.request_db.labels(blueprint).observe(log.duration)
+    _metrics.request_queries.labels(blueprint).observe(log.count)
+
+def observe_email(duration, ok):
+    if _metrics is not None:
+        _metrics.email_duration.observe(duration)
+        _metrics.emails.labels('enviado' if ok else 'error').inc()
+
+def observe_ad_sync(duration, summary=None):
+    """summary es el resultado de sync_users_from_ad, o None si la sincronización falló."""
+    if _metrics is None:
+        return
+    _metrics.ad_sync_duration.observe(duration)
+    _metrics.ad_syncs.labels('ok' if summary is not None else 'error').inc()
+    for action, count in (summary or {}).items():
+        _metrics.ad_sync_records.labels(action).inc(count)
+
+def write_queue_changed(delta):
+    if _metrics is not None:
+        _metrics.write_queue_depth.inc(delta)
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return Response("No autorizado.\n", status=401, mimetype='text/plain')
+
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, REGISTRY, generate_latest
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        from prometheus_client import multiprocess
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(PendingApprovalsCollector())
+    else:
+        registry = REGISTRY
+    # content_type y no mimetype: CONTENT_TYPE_LATEST ya trae charset y Flask agregaría otro
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
+
+def init_app(app):
+    """Registra /metrics y los hooks de medición (requiere querylog.init_app antes)."""
+    global _metrics
+    if not app.config.get('METRICS'):
+        return
+    if not app.config.get('METRICS_TOKEN') and not (app.debug or app.testing):
+        app.logger.warning("METRICS está activo sin METRICS_TOKEN: /metrics no se registra.")
+        return
+    try:
+        import prometheus_client
+    except ImportError:
+        return
+
+    multiproc_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    if multiproc_dir:
+        os.makedirs(multiproc_dir, exist_ok=True)
+    if _metrics is None:
+        _metrics = _Metrics()
+        if not multiproc_dir:
+            prometheus_client.REGISTRY.register(PendingApprovalsCollector())
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.extensions['query_log_listeners'].append(_observe_queries)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,182 @@
+# vacations/period_adjustments.py
+# Ajuste masivo de saldos (RRHH > Periodos > Ajuste masivo): carga de licencias
+# especiales (Paternidad, Estudio, ...) para muchos empleados a la vez, desde un
+# formulario con varios empleados y un monto por tipo de licencia o desde un XLSX/CSV.
+#
+# Los ajustes se cargan en una tabla temporal y se aplican con un solo INSERT ... ON
+# CONFLICT (employee_id, year, leave_type_id) DO UPDATE, en una transacción. Antes se
+# muestra la diferencia contra los periodos actuales (preview). Modo 'set' fija los días
+# otorgados; 'add' los suma al periodo (o lo crea). El comentario queda como
+# adjustment_comment, así el recálculo por antigüedad no pisa estos periodos.
+#
+# La confirmación reenvía los ajustes en el formulario. Para que un doble clic, un
+# refresco o un reenvío no vuelva a sumar en modo 'add', la vista previa devuelve una
+# huella de los ajustes y de los días actuales de esos periodos; la ruta la guarda en la
+# sesión con un token de un solo uso y apply() rechaza la confirmación si los periodos ya
+# no están como se previsualizaron (PreviewChanged).
+
+import hashlib
+import json
+import math
+
+from .db import get_backend
+from .employee_import import ImportFormatError, read_table
+
+MODES = ('set', 'add')
+
+# Clave de pg_advisory_xact_lock: dos confirmaciones simultáneas se aplican de a una
+LOCK_KEY = 0x53445650
+
+# Encabezado (en minúsculas) -> campo
+HEADERS = {
+    'usuario': 'username', 'username': 'username',
+    'año': 'year', 'ano': 'year', 'year': 'year',
+    'tipo licencia': 'leave_type', 'tipo de licencia': 'leave_type', 'licencia': 'leave_type', 'leave_type': 'leave_type',
+    'días': 'days', 'dias': 'days', 'days': 'days',
+}
+LABELS = {'username': 'Usuario', 'year': 'Año', 'leave_type': 'Tipo Licencia', 'days': 'Días'}
+
+class PreviewChanged(Exception):
+    """Los periodos cambiaron desde la vista previa (o la confirmación ya se aplicó)."""
+
+def _number(value, cast, label):
+    try:
+        number = cast(str(value).replace(',', '.')) if cast is float else cast(float(value))
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"{label} inválido '{value}'") from None
+    if not math.isfinite(number):
+        raise ValueError(f"{label} inválido '{value}'")
+    return number
+
+def _merge(adjustments, key, days, mode):
+    if key in adjustments and mode == 'set':
+        raise ValueError("ajuste repetido para el mismo empleado, año y licencia")
+    adjustments[key] = adjustments.get(key, 0) + days
+
+def from_form(employee_ids, year, amounts, mode):
+    """Ajustes {(employee_id, year, leave_type_id): días} del formulario (amounts: {leave_type_id: días})."""
+    if not all(math.isfinite(days) for days in amounts.values()):
+        raise ValueError("los días deben ser un número finito")
+    adjustments = {}
+    for employee_id in employee_ids:
+        for leave_type_id, days in amounts.items():
+            _merge(adjustments, (int(employee_id), year, int(leave_type_id)), days, mode)
+    return adjustments
+
+def from_file(db, stream, filename, mode):
+    """Ajustes de un XLSX/CSV (Usuario, Año, Tipo Licencia, Días) y los errores por fila."""
+    employees = {row['username'].lower(): row['id'] for row in db.execute("SELECT id, username FROM employees").fetchall()}
+    leave_types = {row['name'].lower(): row['id'] for row in db.execute("SELECT id, name FROM leave_types").fetchall()}
+    adjustments = {}
+    errors = []
+    for number, fields in read_table(stream, filename, HEADERS, LABELS):
+        try:
+            employee_id = employees.get(str(fields.get('username') or '').lower())
+            if employee_id is None:
+                raise ValueError(f"usuario '{fields.get('username') or ''}' inexistente")
+            leave_type_id = leave_types.get(str(fields.get('leave_type') or '').lower())
+            if leave_type_id is None:
+                raise ValueError(f"tipo de licencia '{fields.get('leave_type') or ''}' inexistente")
+            year = _number(fields.get('year'), int, 'año')
+            days = _number(fields.get('days'), float, 'días')
+            _merge(adjustments, (employee_id, year, leave_type_id), days, mode)
+        except ValueError as e:
+            errors.append({'row': number, 'username': fields.get('username') or '', 'message': str(e)})
+    return adjustments, errors
+
+def _load(db, adjustments):
+    db.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS period_adjustments (
+            employee_id INTEGER NOT NULL,
+            year INTEGER NOT NULL,
+            leave_type_id INTEGER NOT NULL,
+            days DOUBLE PRECISION NOT NULL
+        )
+    """)
+    db.execute("DELETE FROM period_adjustments")
+    db.executemany(
+        "INSERT INTO period_adjustments (employee_id, year, leave_type_id, days) VALUES (?, ?, ?, ?)",
+        [(*key, days) for key, days in adjustments.items()]
+    )
+
+def _new_days_sql(mode, current):
+    return "a.days" if mode == 'set' else f"COALESCE({current}, 0) + a.days"
+
+def _fingerprint(db, adjustments, mode):
+    """Huella de los ajustes y de los días actuales de sus periodos (tabla temporal ya cargada)."""
+    current = db.execute("""
+        SELECT a.employee_id, a.year, a.leave_type_id, vp.total_days_accrued
+        FROM period_adjustments a
+        LEFT JOIN vacation_periods vp
+               ON vp.employee_id = a.employee_id AND vp.year = a.year AND vp.leave_type_id = a.leave_type_id
+        ORDER BY a.employee_id, a.year, a.leave_type_id
+    """).fetchall()
+    state = [mode, sorted(encode(adjustments)),
+             [[row['employee_id'], row['year'], row['leave_type_id'], row['total_days_accrued']] for row in current]]
+    return hashlib.sha256(json.dumps(state).encode()).hexdigest()
+
+def preview(db, adjustments, mode):
+    """
+    Diferencia por periodo (sin modificar nada): días actuales (None si es nuevo) y nuevos.
+    Devuelve (filas, huella); la huella se pasa a apply() al confirmar.
+    """
+    _load(db, adjustments)
+    fingerprint = _fingerprint(db, adjustments, mode)
+    rows = db.execute(f"""
+        SELECT e.full_name, lt.name AS leave_name, a.year,
+               vp.total_days_accrued AS current_days, {_new_days_sql(mode, 'vp.total_days_accrued')} AS new_days,
+               COALESCE(vp.days_taken, 0) AS days_taken
+        FROM period_adjustments a
+        JOIN employees e ON e.id = a.employee_id
+        JOIN leave_types lt ON lt.id = a.leave_type_id
+        LEFT JOIN vacation_periods vp
+               ON vp.employee_id = a.employee_id AND vp.year = a.year AND vp.leave_type_id = a.leave_type_id
+        ORDER BY e.full_name, a.year, lt.name
+    """).fetchall()
+    db.rollback()
+    return rows, fingerprint
+
+def apply(db, adjustments, mode, comment, fingerprint):
+    """
+    Aplica los ajustes en una transacción. Devuelve la cantidad de periodos creados o
+    actualizados. Lanza PreviewChanged si la huella no coincide con la de la vista previa.
+    """
+    if mode not in MODES:
+        raise ValueError(f"modo inválido '{mode}'")
+    if get_backend().name == 'postgresql':
+        db.execute("SELECT pg_advisory_xact_lock(?)", (LOCK_KEY,))
+    elif not db.in_transaction:
+        db.execute("BEGIN IMMEDIATE")  # la huella se compara con el bloqueo de escritura tomado
+    _load(db, adjustments)
+    if _fingerprint(db, adjustments, mode) != fingerprint:
+        db.rollback()
+        raise PreviewChanged()
+    new_total = "excluded.total_days_accrued" if mode == 'set' else "vacation_periods.total_days_accrued + excluded.total_days_accrued"
+    # WHERE true: SQLite no distingue el ON CONFLICT del upsert de un JOIN ... ON sin él
+    cursor = db.execute(f"""
+        INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued, days_taken, adjustment_comment)
+        SELECT a.employee_id, a.year, a.leave_type_id, a.days, 0, ?
+        FROM period_adjustments a
+        JOIN employees e ON e.id = a.employee_id
+        JOIN leave_types lt ON lt.id = a.leave_type_id
+        WHERE true
+        ON CONFLICT (employee_id, year, leave_type_id) DO UPDATE
+        SET total_days_accrued = {new_total}, adjustment_comment = excluded.adjustment_comment
+    """, (comment,))
+    changed = cursor.rowcount
+    db.execute("DELETE FROM period_adjustments")
+    db.commit()
+    return changed
+
+def encode(adjustments):
+    """Ajustes como lista (para reenviarlos en el formulario de confirmación)."""
+    return [[*key, days] for key, days in adjustments.items()]
+
+def decode(payload):
+    try:
+        adjustments = {(int(e), int(y), int(lt)): float(days) for e, y, lt, days in payload}
+    except (TypeError, ValueError, OverflowError):
+        raise ImportFormatError("Ajustes inválidos.") from None
+    if not all(math.isfinite(days) for days in adjustments.values()):
+        raise ImportFormatError("Ajustes inválidos.")
+    return adjustments
@@ -0,0 +1,58 @@
+# vacations/periods.py
+# Generación masiva de periodos (saldos anuales) de licencias.
+
+from datetime import datetime
+from .db import get_db
+from .accrual import policy_days_sql
+
+# Los días se toman de la política de antigüedad del tipo de licencia (accrual_policies)
+# o, si no tiene escala configurada, de sus días por defecto.
+_GENERATE_PERIODS_SQL = """
+    INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued, days_taken)
+    WITH RECURSIVE years(year) AS (
+        SELECT ?
+        UNION ALL
+        SELECT year + 1 FROM years WHERE year < ?
+    )
+    SELECT e.id, y.year, lt.id,
+           COALESCE({policy_days}, lt.default_days),
+           0
+    FROM employees e
+    CROSS JOIN years y
+    CROSS JOIN leave_types lt
+    WHERE e.is_active = 1
+      AND CAST(strftime('%Y', e.hire_date) AS INTEGER) <= y.year
+      AND (lt.default_days > 0 OR EXISTS (SELECT 1 FROM accrual_policies ap WHERE ap.leave_type_id = lt.id))
+      {leave_type_filter}
+    ON CONFLICT(employee_id, year, leave_type_id) DO NOTHING
+"""
+
+def generate_periods(year_from=None, year_to=None, leave_type_ids=None):
+    """
+    Genera en una sola sentencia los periodos faltantes de todos los empleados activos
+    para cada año del rango [year_from, year_to] y cada tipo de licencia con días por
+    defecto o escala de antigüedad configurada. Los periodos existentes no se tocan.
+    Devuelve la cantidad de periodos insertados.
+    """
+    current_year = datetime.now().year
+    year_from = year_from or current_year
+    year_to = year_to or year_from
+    if year_to < year_from:
+        raise ValueError("El año final no puede ser anterior al año inicial.")
+
+    params = [year_from, year_to]
+    leave_type_filter = ""
+    if leave_type_ids:
+        placeholders = ','.join(['?'] * len(leave_type_ids))
+        leave_type_filter = f"AND lt.id IN ({placeholders})"
+        params.extend(leave_type_ids)
+
+    db = get_db()
+    query = _GENERATE_PERIODS_SQL.format(
+        policy_days=policy_days_sql('lt.id', 'e.company', 'y.year', 'e.hire_date'),
+        leave_type_filter=leave_type_filter
+    )
+    # La sentencia empieza con INSERT (el WITH va dentro): rowcount es portable
+    inserted = db.execute(query, params).rowcount
+    db.commit()
+    return inserted
@@ -0,0 +1,145 @@
+# vacations/profiling.py
+# Perfilado bajo demanda de peticiones lentas (cProfile + pico de memoria con tracemalloc).
+#
+# Con PROFILING=True se perfila:
+#   - cualquier petición de un usuario RRHH con ?_profile=1 en la URL, y
+#   - un PROFILE_SAMPLE_RATE % de todas las peticiones (muestreo).
+# Cada perfil se guarda en instance/profiles como <nombre>.prof (pstats, abrir con
+# snakeviz o python -m pstats) y <nombre>.json (endpoint, tiempos, memoria y resumen).
+# Con PROFILING=False no se registra ningún hook: costo cero.
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import random
+import re
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+
+from flask import current_app, g, request, session
+
+# tracemalloc es global al proceso: una sola petición perfilada a la vez por worker
+_lock = threading.Lock()
+
+_SKIP_ENDPOINTS = {'static', 'serve_asset', 'metrics'}
+
+def _should_profile():
+    if request.endpoint in _SKIP_ENDPOINTS:
+        return False
+    if request.args.get('_profile') == '1' and session.get('base_role') == 'RRHH':
+        return True
+    rate = current_app.config.get('PROFILE_SAMPLE_RATE', 0)
+    return rate > 0 and random.random() * 100 < rate
+
+def _start_request():
+    if not _should_profile() or not _lock.acquire(blocking=False):
+        return
+    owns_tracing = not tracemalloc.is_tracing()
+    if owns_tracing:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    profiler = cProfile.Profile()
+    g.profile = (profiler, time.perf_counter(), owns_tracing)
+    profiler.enable()
+
+def _stop(active):
+    profiler, started, owns_tracing = active
+    profiler.disable()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    if owns_tracing:
+        tracemalloc.stop()
+    _lock.release()
+    return profiler, elapsed, peak
+
+def _finish_request(response):
+    active = g.pop('profile', None)
+    if active is not None:
+        profiler, elapsed, peak = _stop(active)
+        save_profile(profiler, elapsed, peak, response.status_code)
+    return response
+
+def _teardown_request(exc):
+    # Petición con excepción no manejada: after_request no se ejecutó
+    active = g.pop('profile', None)
+    if active is not None:
+        _stop(active)
+
+def profile_folder():
+    return current_app.config['PROFILE_FOLDER']
+
+def save_profile(profiler, elapsed, peak, status):
+    """Guarda el perfil y sus datos; conserva solo los PROFILE_MAX_FILES más recientes."""
+    folder = profile_folder()
+    os.makedirs(folder, exist_ok=True)
+    now = datetime.now()
+    endpoint = request.endpoint or 'sin_ruta'
+    name = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{now:%Y%m%d-%H%M%S.%f}-{endpoint}-{elapsed * 1000:.0f}ms-{os.getpid()}")
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats('cumulative').print_stats(30)
+    profiler.dump_stats(os.path.join(folder, name + '.prof'))
+
+    with open(os.path.join(folder, name + '.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'name': name,
+            'created': now.isoformat(timespec='seconds'),
+            'endpoint': endpoint,
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'status': status,
+            'duration_ms': round(elapsed * 1000, 1),
+            'peak_memory_kb': round(peak / 1024, 1),
+            'user': session.get('full_name'),
+            'summary': summary.getvalue(),
+        }, f, ensure_ascii=False)
+
+    _prune(folder, current_app.config.get('PROFILE_MAX_FILES', 100))
+
+def list_profiles():
+    """Perfiles guardados, del más reciente al más antiguo."""
+    folder = profile_folder()
+    if not os.path.isdir(folder):
+        return []
+    profiles = []
+    for filename in sorted(os.listdir(folder), reverse=True):
+        if filename.endswith('.json'):
+            try:
+                with open(os.path.join(folder, filename), encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return profiles
+
+def delete_profiles():
+    folder = profile_folder()
+    if not os.path.isdir(folder):
+        return 0
+    removed = 0
+    for filename in os.listdir(folder):
+        if filename.endswith(('.prof', '.json')):
+            os.remove(os.path.join(folder, filename))
+            removed += filename.endswith('.json')
+    return removed
+
+def _prune(folder, keep):
+    names = sorted((f[:-len('.json')] for f in os.listdir(folder) if f.endswith('.json')), reverse=True)
+    for name in names[keep:]:
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(folder, name + extension))
+            except FileNotFoundError:
+                pass
+
+def init_app(app):
+    app.config.setdefault('PROFILE_FOLDER', os.path.join(app.instance_path, 'profiles'))
+    if not app.config.get('PROFILING'):
+        return
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_teardown_request)
@@ -0,0 +1,187 @@
+# vacations/querylog.py
+# Registro de las consultas SQL de cada petición (texto, parámetros, duración, filas).
+#
+#   - get_db() envuelve la conexión de la petición; run_write() envuelve también la del
+#     hilo escritor, de modo que las escrituras en cola se cuentan en la misma petición.
+#   - Cabecera Server-Timing con el total (visible en las DevTools del navegador).
+#   - Las consultas que superan SLOW_QUERY_MS se registran con su plan de ejecución.
+#   - vacations.testing.query_budget() usa este registro para limitar consultas en tests.
+
+import time
+
+from flask import current_app, g, request
+
+# Sentencias de las que se puede pedir el plan (no PRAGMA, DDL, BEGIN...)
+_EXPLAINABLE = ('SELECT', 'WITH', 'INSERT', 'UPDATE', 'DELETE')
+
+class QueryEntry:
+    __slots__ = ('sql', 'params', 'duration', 'rows')
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.duration = 0.0
+        self.rows = 0
+
+class QueryLog:
+    """Consultas ejecutadas durante una petición."""
+
+    def __init__(self):
+        self.queries = []
+
+    def record(self, sql, params):
+        entry = QueryEntry(sql, tuple(params) if params else ())
+        self.queries.append(entry)
+        return entry
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    @property
+    def duration(self):
+        return sum(entry.duration for entry in self.queries)
+
+class InstrumentedCursor:
+    """Cursor que suma al registro el tiempo de ejecución y de lectura de filas."""
+
+    def __init__(self, cursor, log):
+        self._cursor = cursor
+        self._log = log
+        self._entry = None
+
+    def _timed(self, entry, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            entry.duration += time.perf_counter() - started
+
+    def execute(self, sql, params=()):
+        self._entry = self._log.record(sql, params)
+        self._timed(self._entry, self._cursor.execute, sql, params)
+        self._count_changes()
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        seq_of_params = list(seq_of_params)
+        self._entry = self._log.record(sql, seq_of_params[0] if seq_of_params else ())
+        self._timed(self._entry, self._cursor.executemany, sql, seq_of_params)
+        self._count_changes()
+        return self
+
+    def _count_changes(self):
+        # En escrituras se registran las filas afectadas; en consultas, las leídas
+        if self._cursor.description is None:
+            self._entry.rows = max(self._cursor.rowcount, 0)
+
+    def fetchone(self):
+        row = self._timed(self._entry, self._cursor.fetchone)
+        if row is not None:
+            self._entry.rows += 1
+        return row
+
+    def fetchall(self):
+        rows = self._timed(self._entry, self._cursor.fetchall)
+        self._entry.rows += len(rows)
+        return rows
+
+    def fetchmany(self, size=None):
+        rows = self._timed(self._entry, self._cursor.fetchmany, *((size,) if size else ()))
+        self._entry.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class InstrumentedConnection:
+    """Conexión que registra cada sentencia; el resto se delega en la conexión real."""
+
+    def __init__(self, conn, log):
+        self.wrapped = conn
+        self._log = log
+
+    def cursor(self):
+        return InstrumentedCursor(self.wrapped.cursor(), self._log)
+
+    def execute(self, sql, params=()):
+        return self.cursor().execute(sql, params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.cursor().executemany(sql, seq_of_params)
+
+    def __getattr__(self, name):
+        return getattr(self.wrapped, name)
+
+def current_log():
+    """Registro de la petición en curso (None fuera de una petición o si está desactivado)."""
+    return g.get('query_log') if g else None
+
+def wrap(conn, log):
+    return InstrumentedConnection(conn, log) if log is not None else conn
+
+def unwrap(conn):
+    return conn.wrapped if isinstance(conn, InstrumentedConnection) else conn
+
+def explain(conn, backend, sql, params):
+    """Plan de ejecución de una sentencia en una línea (vacío si no se puede obtener)."""
+    if not sql.lstrip().upper().startswith(_EXPLAINABLE):
+        return ''
+    try:
+        rows = unwrap(conn).execute(backend.explain_prefix + sql, params).fetchall()
+    except Exception as e:
+        return f"(sin plan: {e})"
+    return ' | '.join(str(row[-1]) for row in rows)
+
+def redact(text, params):
+    """Quita de text los parámetros de texto que PostgreSQL incluye como literales en el plan."""
+    for value in params:
+        if isinstance(value, str) and value:
+            text = text.replace("'" + value.replace("'", "''") + "'", "'?'")
+    return text
+
+def _start_request():
+    if current_app.config.get('QUERY_LOG'):
+        g.query_log = QueryLog()
+        g.request_started = time.perf_counter()
+
+def _finish_request(response):
+    log = g.pop('query_log', None)
+    if log is None:
+        return response
+
+    total_ms = (time.perf_counter() - g.pop('request_started')) * 1000
+    db_ms = log.duration * 1000
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={db_ms:.1f};desc="{log.count} consultas", app;dur={total_ms - db_ms:.1f}'
+    )
+
+    threshold = current_app.config.get('SLOW_QUERY_MS')
+    if threshold:
+        from .db import get_db, get_backend
+        for entry in log.queries:
+            if entry.duration * 1000 >= threshold:
+                # Solo la cantidad de parámetros: los valores pueden ser hashes de contraseña o datos personales
+                current_app.logger.warning(
+                    "Consulta lenta (%.1f ms, %d filas) en %s %s: %s (%d parámetros) | plan: %s",
+                    entry.duration * 1000, entry.rows, request.method, request.path,
+                    ' '.join(entry.sql.split()), len(entry.params),
+                    redact(explain(get_db(), get_backend(), entry.sql, entry.params), entry.params)
+                )
+
+    for listener in current_app.extensions['query_log_listeners']:
+        listener(log)
+    return response
+
+def init_app(app):
+    app.extensions['query_log_listeners'] = []
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
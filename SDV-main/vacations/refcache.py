@@ -0,0 +1,138 @@
+# vacations/refcache.py
+# Caché en memoria (por proceso) de datos de referencia que casi no cambian: tipos de
+# licencia, roles, feriados, sábados, configuración de correo y listas de empleados.
+#
+# Invalidación entre workers: la tabla data_version (ver db.setup_data_version) guarda
+# un contador por tabla que incrementan triggers en cada INSERT/UPDATE/DELETE. Cada
+# entrada recuerda los contadores con los que se cargó; si alguno cambió, se vuelve a
+# consultar. Los contadores se leen una sola vez por petición. Además cada entrada
+# tiene TTL y el total de entradas está acotado (se descarta la menos usada).
+
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g
+
+from .db import get_db
+
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRIES = 128
+
+class TTLCache:
+    """Diccionario LRU con vencimiento por clave y sello de versión."""
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES, default_ttl=DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, stamp):
+        """Devuelve (True, valor) si la entrada existe, no venció y tiene el mismo sello."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False, None
+            value, entry_stamp, expires_at = entry
+            if entry_stamp != stamp or expires_at < time.monotonic():
+                del self._entries[key]
+                return False, None
+            self._entries.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, stamp, ttl=None):
+        expires_at = time.monotonic() + (ttl if ttl is not None else self.default_ttl)
+        with self._lock:
+            self._entries[key] = (value, stamp, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+def table_versions():
+    """Contadores de data_version, leídos una vez por petición."""
+    if 'data_versions' not in g:
+        rows = get_db().execute("SELECT name, version FROM data_version").fetchall()
+        g.data_versions = {row['name']: row['version'] for row in rows}
+    return g.data_versions
+
+def cached(key, tables, loader, ttl=None):
+    """
+    Devuelve el valor guardado para key o lo carga con loader(db). Se invalida cuando
+    cambia alguna de las tablas indicadas. El valor se comparte entre peticiones:
+    loader debe devolver datos inmutables (tuplas de dicts, no filas de la conexión).
+    """
+    cache = current_app.extensions['ref_cache']
+    versions = table_versions()
+    stamp = tuple(versions.get(table, 0) for table in tables)
+    found, value = cache.get(key, stamp)
+    if not found:
+        value = loader(get_db())
+        cache.set(key, value, stamp, ttl)
+    return value
+
+def _rows(db, query, params=()):
+    return tuple(dict(row) for row in db.execute(query, params).fetchall())
+
+def leave_types():
+    """Todos los tipos de licencia ordenados por nombre."""
+    return cached('leave_types', ('leave_types',),
+                  lambda db: _rows(db, "SELECT * FROM leave_types ORDER BY name"))
+
+def leave_type(leave_type_id):
+    """Un tipo de licencia por id (o None)."""
+    try:
+        leave_type_id = int(leave_type_id)
+    except (TypeError, ValueError):
+        return None
+    return next((lt for lt in leave_types() if lt['id'] == leave_type_id), None)
+
+def roles():
+    """Todos los roles ordenados por nombre."""
+    return cached('roles', ('roles',), lambda db: _rows(db, "SELECT * FROM roles ORDER BY name"))
+
+def custom_holidays():
+    """Feriados personalizados (fecha, descripción, recurrente)."""
+    return cached('custom_holidays', ('custom_holidays',),
+                  lambda db: _rows(db, "SELECT id, holiday_date, description, is_recurring FROM custom_holidays ORDER BY holiday_date DESC"))
+
+def saturdays(is_working):
+    """Fechas de sábados configurados como laborales (True) o libres (False)."""
+    return cached(('saturdays', bool(is_working)), ('saturday_config',),
+                  lambda db: tuple(row['effective_date'] for row in db.execute(
+                      "SELECT effective_date FROM saturday_config WHERE is_working = ? ORDER BY effective_date",
+                      (1 if is_working else 0,)).fetchall()))
+
+def email_config():
+    """Última configuración de correo guardada (claves en mayúsculas) o {}."""
+    def load(db):
+        row = db.execute("SELECT * FROM email_config ORDER BY id DESC LIMIT 1").fetchone()
+        return {key.upper(): row[key] for key in row.keys() if key != 'id'} if row else {}
+    return dict(cached('email_config', ('email_config',), load))
+
+def active_managers():
+    """Jefes activos (id, full_name) para los formularios de empleados."""
+    return cached('active_managers', ('employees',),
+                  lambda db: _rows(db, "SELECT id, full_name FROM employees WHERE role = 'Jefe' AND is_active = 1 ORDER BY full_name"))
+
+def employee_choices(active_only=False):
+    """Empleados (id, full_name) ordenados por nombre, para filtros y selectores."""
+    query = "SELECT id, full_name FROM employees"
+    if active_only:
+        query += " WHERE is_active = 1"
+    return cached(('employee_choices', active_only), ('employees',),
+                  lambda db: _rows(db, query + " ORDER BY full_name"))
+
+def email_config_version():
+    """Contador de cambios de email_config (para reconfigurar Flask-Mail)."""
+    return table_versions().get('email_config', 0)
+
+def init_app(app):
+    app.extensions['ref_cache'] = TTLCache(
+        max_entries=app.config.get('REF_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES),
+        default_ttl=app.config.get('REF_CACHE_TTL', DEFAULT_TTL)
+    )
@@ -0,0 +1,11 @@
+# vacations/routes/__init__.py
+# Ayudas comunes a los blueprints.
+
+from flask import redirect, request, url_for
+
+def redirect_back():
+    """Vuelve a la página de origen (solo del mismo sitio) o al dashboard."""
+    referrer = request.referrer
+    if not referrer or not referrer.startswith(request.host_url):
+        referrer = url_for('main.dashboard')
+    return redirect(referrer)
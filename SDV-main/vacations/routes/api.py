@@ -0,0 +1,464 @@
+# vacations/routes/api.py
+# API JSON versionada (/api/v1) para integraciones: empleados, saldos, solicitudes,
+# feriados y calendario. Solo lectura.
+#
+# Autenticación: "Authorization: Bearer <API_TOKEN>" (lectura de RRHH) o la sesión del
+# navegador, con el mismo alcance que la interfaz: RRHH ve todo, el jefe a sí mismo y a
+# su equipo, el empleado solo lo suyo. El calendario es visible para todos, como en el dashboard.
+#
+# Listas paginadas por cursor (keyset sobre id): ?limit= (hasta API_MAX_PAGE_SIZE) y el
+# next_cursor de la respuesta como ?cursor=. ?fields=id,full_name devuelve (y consulta)
+# solo esos campos. La respuesta se serializa de a bloques mientras se leen las filas.
+#
+# Peticiones condicionales: ETag y Last-Modified salen de data_version (versión y
+# changed_at de las tablas que lee cada recurso), así un If-None-Match o If-Modified-Since
+# vigente se responde 304 sin consultar los datos. Se lee la base principal y no la copia
+# de reportes, que puede estar atrasada respecto de esos contadores.
+
+import base64
+import hashlib
+import hmac
+import json
+from datetime import date, datetime, time, timezone
+
+from flask import Blueprint, Response, current_app, g, jsonify, request, session
+from werkzeug.http import http_date
+
+from ..db import get_backend, get_db
+from .. import balances, querylog, refcache
+from ..utils import get_paraguay_holidays, refresh_request_statuses
+
+bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+DEFAULT_PAGE_SIZE = 100
+FETCH_CHUNK = 200
+HR_ROLES = ('RRHH', 'Asistente RRHH')
+# Estados que muestra el calendario del dashboard
+CALENDAR_STATUSES = ('Aprobado por RRHH', 'Activo', 'Finalizado')
+
+# Campo -> expresión SQL de cada recurso (?fields= elige entre estas claves)
+EMPLOYEE_FIELDS = {
+    'id': 'e.id', 'username': 'e.username', 'full_name': 'e.full_name', 'email': 'e.email',
+    'hire_date': 'e.hire_date', 'role': 'e.role', 'department': 'e.department',
+    'job_title': 'e.job_title', 'company': 'e.company', 'manager_id': 'e.manager_id',
+    'is_active': 'e.is_active',
+}
+BALANCE_FIELDS = {
+    'id': 'e.id', 'username': 'e.username', 'full_name': 'e.full_name', 'department': 'e.department',
+    'balances': None,  # se agrega por bloque con balances.employee_balances
+}
+REQUEST_FIELDS = {
+    'id': 'vr.id', 'employee_id': 'vr.employee_id', 'employee_name': 'e.full_name',
+    'start_date': 'vr.start_date', 'end_date': 'vr.end_date', 'start_time': 'vr.start_time',
+    'end_time': 'vr.end_time', 'request_type': 'vr.request_type', 'leave_type_id': 'vr.leave_type_id',
+    'leave_type': 'lt.name', 'days_requested': 'vr.days_requested',
+    'replacement_employee_id': 'vr.replacement_employee_id', 'replacement_name': 'vr.replacement_name',
+    'status': 'vr.status', 'request_date': 'vr.request_date',
+    'manager_approval_date': 'vr.manager_approval_date', 'hr_approval_date': 'vr.hr_approval_date',
+}
+CALENDAR_FIELDS = {
+    'id': 'vr.id', 'employee_id': 'vr.employee_id', 'employee_name': 'e.full_name',
+    'department': 'e.department', 'leave_type': 'lt.name', 'start_date': 'vr.start_date',
+    'end_date': 'vr.end_date', 'status': 'vr.status',
+}
+HOLIDAY_FIELDS = ('date', 'kind', 'description')
+BOOLEAN_FIELDS = {'is_active'}
+
+# Tablas de data_version que determinan cada recurso
+EMPLOYEE_TABLES = ('employees',)
+BALANCE_TABLES = ('employees', 'vacation_periods', 'leave_types')
+REQUEST_TABLES = ('vacation_requests', 'vacation_requests_archive', 'employees', 'leave_types')
+HOLIDAY_TABLES = ('custom_holidays', 'saturday_config')
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+@bp.errorhandler(ApiError)
+def api_error(e):
+    return jsonify({"error": e.message}), e.status
+
+# --- Autenticación y alcance -------------------------------------------------
+
+def _scope():
+    """('all', None), ('team', id) o ('self', id) según el token o la sesión."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        token = current_app.config.get('API_TOKEN')
+        if token and hmac.compare_digest(header[7:].encode(), token.encode()):
+            return ('all', None)
+        raise ApiError(401, "Token inválido.")
+    if 'user_id' not in session:
+        raise ApiError(401, "No autenticado.")
+    role = session.get('base_role')
+    if role in HR_ROLES:
+        return ('all', None)
+    if role == 'Jefe':
+        return ('team', session['user_id'])
+    return ('self', session['user_id'])
+
+def _scope_filter(scope, column='e'):
+    kind, user_id = scope
+    if kind == 'team':
+        return f" AND ({column}.id = ? OR {column}.manager_id = ?)", [user_id, user_id]
+    if kind == 'self':
+        return f" AND {column}.id = ?", [user_id]
+    return "", []
+
+# --- Parámetros ----------------------------------------------------------------
+
+def _int_arg(name, default=None):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(400, f"Parámetro {name} inválido.") from None
+
+def _date_arg(name, default=None):
+    value = request.args.get(name)
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ApiError(400, f"Parámetro {name} inválido (use YYYY-MM-DD).") from None
+
+def _bool_arg(name):
+    value = request.args.get(name)
+    if value is None or value == '':
+        return None
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise ApiError(400, f"Parámetro {name} inválido (use true o false).")
+
+def _fields(available):
+    """Campos pedidos con ?fields= (todos si no se indica), en el orden pedido."""
+    raw = request.args.get('fields')
+    if not raw:
+        return tuple(available)
+    fields = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+    if not fields:
+        raise ApiError(400, "Parámetro fields vacío.")
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise ApiError(400, "Campos desconocidos: " + ", ".join(unknown))
+    return fields
+
+def _encode_cursor(last_id):
+    return base64.urlsafe_b64encode(json.dumps({'id': last_id}).encode()).decode().rstrip('=')
+
+def _decode_cursor(value):
+    try:
+        payload = base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+        return int(json.loads(payload)['id'])
+    except (ValueError, KeyError, TypeError):
+        raise ApiError(400, "Cursor inválido.") from None
+
+def _page():
+    """(limit, id desde el que seguir) de ?limit= y ?cursor=."""
+    limit = _int_arg('limit', DEFAULT_PAGE_SIZE)
+    if limit < 1:
+        raise ApiError(400, "Parámetro limit inválido.")
+    limit = min(limit, current_app.config['API_MAX_PAGE_SIZE'])
+    cursor = request.args.get('cursor')
+    return limit, _decode_cursor(cursor) if cursor else 0
+
+# --- Peticiones condicionales --------------------------------------------------
+
+def _validators(tables, scope):
+    """
+    ETag y Last-Modified de la respuesta. El contenido también depende de la fecha
+    (estados por fecha, año por defecto): el Last-Modified nunca es anterior al día de hoy.
+    """
+    placeholders = ', '.join('?' for _ in tables)
+    rows = get_db().execute(
+        f"SELECT name, version, changed_at FROM data_version WHERE name IN ({placeholders}) ORDER BY name",
+        list(tables)
+    ).fetchall()
+    today = date.today()
+    state = [request.path, sorted(request.args.items(multi=True)), scope, today.isoformat(),
+             [(row['name'], row['version']) for row in rows]]
+    etag = hashlib.sha1(json.dumps(state).encode()).hexdigest()
+
+    # changed_at está en UTC; el inicio del día es hora local
+    last_modified = datetime.combine(today, time.min).astimezone(timezone.utc)
+    for row in rows:
+        if row['changed_at']:
+            last_modified = max(last_modified, row['changed_at'].replace(tzinfo=timezone.utc))
+    return etag, last_modified.replace(microsecond=0)
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since:
+        return last_modified <= request.if_modified_since
+    return False
+
+def _conditional(tables, scope):
+    """Cabeceras de validación y si el cliente ya tiene la versión vigente."""
+    etag, last_modified = _validators(tables, scope)
+    headers = {
+        'ETag': f'W/"{etag}"',
+        'Last-Modified': http_date(last_modified),
+        # Datos personales: el navegador puede guardarlos pero siempre revalida
+        'Cache-Control': 'private, no-cache',
+        'Vary': 'Authorization, Cookie',
+    }
+    return _not_modified(etag, last_modified), headers
+
+# --- Serialización -------------------------------------------------------------
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} no es serializable")
+
+def _dumps(value):
+    return json.dumps(value, default=_json_default, ensure_ascii=False)
+
+def _item(row, fields):
+    return {name: bool(row[name]) if name in BOOLEAN_FIELDS and row[name] is not None else row[name] for name in fields}
+
+def _select(columns, fields):
+    """Columnas del SELECT: la clave del cursor y los campos pedidos con expresión SQL."""
+    key = columns['id']
+    return ', '.join([f"{key} AS page_key"] + [f"{columns[name]} AS {name}" for name in fields if columns[name]])
+
+def _stream_page(cursor, fields, limit, expand=None):
+    """
+    Genera {"data": [...], "next_cursor": ...} leyendo el cursor de a FETCH_CHUNK filas
+    (la consulta pide limit + 1 para saber si hay otra página). expand(rows) completa
+    los campos que no salen de la consulta (una lista de dicts, uno por fila).
+    """
+    yield '{"data": ['
+    count = 0
+    last_key = None
+    while count < limit:
+        rows = cursor.fetchmany(min(FETCH_CHUNK, limit - count))
+        if not rows:
+            break
+        extra = expand(rows) if expand else [{}] * len(rows)
+        items = []
+        for row, added in zip(rows, extra):
+            item = {**_item(row, [name for name in fields if name not in added]), **added}
+            items.append(_dumps({name: item[name] for name in fields}))
+        yield (', ' if count else '') + ', '.join(items)
+        count += len(rows)
+        last_key = rows[-1]['page_key']
+    has_more = count == limit and cursor.fetchone() is not None
+    yield '], "next_cursor": ' + _dumps(_encode_cursor(last_key) if has_more else None) + '}'
+
+def _respond(body, headers):
+    response = Response(body, mimetype='application/json')
+    response.headers.update(headers)
+    return response
+
+def _respond_page(cursor, fields, limit, headers, expand=None):
+    """
+    Respuesta en streaming de una página. La conexión de la petición pasa a la respuesta:
+    el teardown ya no la cierra y se libera al terminar de generarla o al cerrarse la
+    respuesta (cliente desconectado antes de empezar), lo que ocurra primero.
+    """
+    conn = g.pop('db')
+    backend = get_backend()
+    released = False
+
+    def release():
+        nonlocal released
+        if not released:
+            released = True
+            backend.release(querylog.unwrap(conn))
+
+    def body():
+        try:
+            yield from _stream_page(cursor, fields, limit, expand)
+        finally:
+            release()
+
+    response = _respond(body(), headers)
+    response.call_on_close(release)
+    return response
+
+def _not_modified_response(headers):
+    response = Response(status=304)
+    response.headers.update(headers)
+    return response
+
+# --- Recursos ------------------------------------------------------------------
+
+def _employee_filters(scope):
+    where, params = _scope_filter(scope)
+    active = _bool_arg('active')
+    if active is not None:
+        where += " AND e.is_active = ?"
+        params.append(1 if active else 0)
+    department = request.args.get('department')
+    if department:
+        where += " AND e.department = ?"
+        params.append(department)
+    return where, params
+
+@bp.route('/employees')
+def employees():
+    scope = _scope()
+    fields = _fields(EMPLOYEE_FIELDS)
+    limit, after = _page()
+    where, params = _employee_filters(scope)
+    not_modified, headers = _conditional(EMPLOYEE_TABLES, scope)
+    if not_modified:
+        return _not_modified_response(headers)
+
+    cursor = get_db().execute(
+        f"SELECT {_select(EMPLOYEE_FIELDS, fields)} FROM employees e WHERE e.id > ?{where} ORDER BY e.id LIMIT ?",
+        [after, *params, limit + 1]
+    )
+    return _respond_page(cursor, fields, limit, headers)
+
+@bp.route('/employees/<int:employee_id>')
+def employee(employee_id):
+    scope = _scope()
+    fields = _fields(EMPLOYEE_FIELDS)
+    not_modified, headers = _conditional(EMPLOYEE_TABLES, scope)
+    if not_modified:
+        return _not_modified_response(headers)
+
+    where, params = _scope_filter(scope)
+    row = get_db().execute(
+        f"SELECT {_select(EMPLOYEE_FIELDS, fields)} FROM employees e WHERE e.id = ?{where}",
+        [employee_id, *params]
+    ).fetchone()
+    if row is None:
+        raise ApiError(404, "Empleado no encontrado.")
+    return _respond(_dumps({'data': _item(row, fields)}), headers)
+
+@bp.route('/employees/<int:employee_id>/balances')
+def employee_balances(employee_id):
+    scope = _scope()
+    not_modified, headers = _conditional(BALANCE_TABLES, scope)
+    if not_modified:
+        return _not_modified_response(headers)
+
+    db = get_db()
+    where, params = _scope_filter(scope)
+    if db.execute(f"SELECT 1 FROM employees e WHERE e.id = ?{where}", [employee_id, *params]).fetchone() is None:
+        raise ApiError(404, "Empleado no encontrado.")
+    data = balances.employee_balances(db, [employee_id]).get(employee_id, [])
+    return _respond(_dumps({'employee_id': employee_id, 'data': data}), headers)
+
+@bp.route('/balances')
+def balance_list():
+    scope = _scope()
+    fields = _fields(BALANCE_FIELDS)
+    limit, after = _page()
+    where, params = _employee_filters(scope)
+    not_modified, headers = _conditional(BALANCE_TABLES, scope)
+    if not_modified:
+        return _not_modified_response(headers)
+
+    db = get_db()
+    cursor = db.execute(
+        f"SELECT {_select(BALANCE_FIELDS, fields)} FROM employees e WHERE e.id > ?{where} ORDER BY e.id LIMIT ?",
+        [after, *params, limit + 1]
+    )
+
+    def expand(rows):
+        # Una consulta de saldos por bloque de empleados
+        found = balances.employee_balances(db, [row['page_key'] for row in rows])
+        return [{'balances': found.get(row['page_key'], [])} for row in rows]
+
+    return _respond_page(cursor, fields, limit, headers, expand if 'balances' in fields else None)
+
+def _request_query(columns, fields, scope, where, params, after, limit):
+    scope_where, scope_params = _scope_filter(scope)
+    return get_db().execute(
+        f"""
+        SELECT {_select(columns, fields)}
+        FROM vacation_requests_all vr
+        JOIN employees e ON e.id = vr.employee_id
+        LEFT JOIN leave_types lt ON lt.id = vr.leave_type_id
+        WHERE vr.id > ?{where}{scope_where}
+        ORDER BY vr.id
+        LIMIT ?
+        """,
+        [after, *params, *scope_params, limit + 1]
+    )
+
+@bp.route('/requests')
+def requests_list():
+    scope = _scope()
+    fields = _fields(REQUEST_FIELDS)
+    limit, after = _page()
+    where, params = "", []
+    employee_id = _int_arg('employee_id')
+    if employee_id is not None:
+        where += " AND vr.employee_id = ?"
+        params.append(employee_id)
+    statuses = [status for status in request.args.get('status', '').split(',') if status]
+    if statuses:
+        where += f" AND vr.status IN ({', '.join('?' for _ in statuses)})"
+        params.extend(statuses)
+    # Solicitudes que se superponen con el rango from-to
+    start, end = _date_arg('from'), _date_arg('to')
+    if start:
+        where += " AND vr.end_date >= ?"
+        params.append(start)
+    if end:
+        where += " AND vr.start_date <= ?"
+        params.append(end)
+
+    refresh_request_statuses()
+    not_modified, headers = _conditional(REQUEST_TABLES, scope)
+    if not_modified:
+        return _not_modified_response(headers)
+
+    cursor = _request_query(REQUEST_FIELDS, fields, scope, where, params, after, limit)
+    return _respond_page(cursor, fields, limit, headers)
+
+@bp.route('/calendar')
+def calendar():
+    _scope()
+    fields = _fields(CALENDAR_FIELDS)
+    limit, after = _page()
+    today = date.today()
+    start = _date_arg('start', date(today.year, 1, 1))
+    end = _date_arg('end', date(today.year, 12, 31))
+    if end < start:
+        raise ApiError(400, "El rango de fechas es inválido.")
+    where = f" AND vr.status IN ({', '.join('?' for _ in CALENDAR_STATUSES)}) AND vr.end_date >= ? AND vr.start_date <= ?"
+    params = [*CALENDAR_STATUSES, start, end]
+
+    refresh_request_statuses()
+    scope = ('all', None)
+    not_modified, headers = _conditional(REQUEST_TABLES, scope)
+    if not_modified:
+        return _not_modified_response(headers)
+
+    cursor = _request_query(CALENDAR_FIELDS, fields, scope, where, params, after, limit)
+    return _respond_page(cursor, fields, limit, headers)
+
+@bp.route('/holidays')
+def holidays():
+    """Feriados (nacionales y personalizados) y sábados laborales o libres de un año."""
+    _scope()
+    fields = _fields(HOLIDAY_FIELDS)
+    year = _int_arg('year', date.today().year)
+    if not 1900 <= year <= 9999:
+        raise ApiError(400, "Parámetro year inválido.")
+    not_modified, headers = _conditional(HOLIDAY_TABLES, ('all', None))
+    if not_modified:
+        return _not_modified_response(headers)
+
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    days = [{'date': day, 'kind': 'holiday', 'description': description}
+            for day, description in get_paraguay_holidays(start, end).items() if start <= day <= end]
+    for is_working, kind in ((True, 'working_saturday'), (False, 'free_saturday')):
+        days.extend({'date': day, 'kind': kind, 'description': None}
+                    for day in refcache.saturdays(is_working) if start <= day <= end)
+    days.sort(key=lambda day: (day['date'], day['kind']))
+    return _respond(_dumps({'year': year, 'data': [{name: day[name] for name in fields} for day in days]}), headers)
@@ -1,17 +1,41 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, json, current_app, Response, jsonify
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, json, current_app, Response, jsonify, send_from_directory
 from datetime import datetime, timedelta, date
 from werkzeug.security import generate_password_hash
-from werkzeug.utils import secure_filename
-from ..db import get_db, calculate_accrued_days
-from .. import ad_sync
-import sqlite3
+from ..db import get_db, integrity_errors
+from .. import ad_sync, accrual, intervals, coverage, attachments, transitions, refcache, metrics, profiling, balances, rows, snapshot, employee_import, period_adjustments
+from ..periods import generate_periods as generate_periods_bulk
 import os
 import io
-from openpyxl import Workbook
-from ..utils import send_email, get_paraguay_holidays, calculate_working_days
+import secrets
+import time
+from ..utils import send_email, get_paraguay_holidays, calculate_working_days, refresh_request_statuses
+from ..writer import run_write, execute_write
 
 bp = Blueprint('hr', __name__, url_prefix='/hr')
 
+def notification_contacts(db, employee_id, replacement_id=None):
+    """
+    Destinatarios de una notificación en una sola consulta: el empleado, su jefe y el
+    reemplazo (si tienen email), con copia a RRHH (usuario actual).
+    Devuelve (emp_info, recipients, cc_list).
+    """
+    emp_info = db.execute(
+        """
+        SELECT e.email, e.full_name, m.email AS manager_email,
+               (SELECT email FROM employees WHERE id = ?) AS replacement_email,
+               (SELECT email FROM employees WHERE id = ?) AS actor_email
+        FROM employees e
+        LEFT JOIN employees m ON m.id = e.manager_id
+        WHERE e.id = ?
+        """,
+        (replacement_id, session['user_id'], employee_id)
+    ).fetchone()
+    if not emp_info:
+        return None, [], []
+    recipients = [email for email in (emp_info['email'], emp_info['manager_email'], emp_info['replacement_email']) if email]
+    cc_list = [emp_info['actor_email']] if emp_info['actor_email'] else []
+    return emp_info, recipients, cc_list
+
 def check_hr_access(readonly=False):
     role = session.get("base_role")
     if role == "RRHH":
@@ -20,6 +44,18 @@ def check_hr_access(readonly=False):
         return True
     return False
 
+def request_conflicts(db, req):
+    """
+    Superposiciones de una solicitud con vacaciones aprobadas, consultadas en el índice
+    de intervalos: el reemplazo ausente o el empleado comprometido como reemplazo.
+    """
+    conflicts = []
+    if req['replacement_employee_id'] and intervals.is_employee_busy(db, req['replacement_employee_id'], req['start_date'], req['end_date']):
+        conflicts.append("El reemplazo tiene vacaciones aprobadas en el rango.")
+    if intervals.replacement_commitments(db, req['employee_id'], req['start_date'], req['end_date'], exclude_request_id=req['id']):
+        conflicts.append("El empleado es reemplazo de otra vacación aprobada en el rango.")
+    return conflicts
+
 @bp.route("/generate_periods")
 def generate_periods():
     if not check_hr_access():
@@ -27,29 +63,8 @@ def generate_periods():
         return redirect(url_for("main.dashboard"))
 
     current_year = datetime.now().year
-    db = get_db()
-    employees = db.execute("SELECT id, hire_date FROM employees WHERE is_active = 1;").fetchall()
-    vac_type = db.execute("SELECT id FROM leave_types WHERE name = 'Vacaciones'").fetchone()
-    vac_type_id = vac_type['id'] if vac_type else 1
-
-    generated_count = 0
-    for emp in employees:
-        emp_id = emp["id"]
-        hire_date = emp["hire_date"]
-        period_exists = db.execute(
-            "SELECT id FROM vacation_periods WHERE employee_id = ? AND year = ? AND leave_type_id = ?;",
-            (emp_id, current_year, vac_type_id)
-        ).fetchone()
-        
-        if period_exists is None:
-            accrued_days = calculate_accrued_days(hire_date)
-            db.execute(
-                "INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued) VALUES (?, ?, ?, ?);",
-                (emp_id, current_year, vac_type_id, accrued_days)
-            )
-            generated_count += 1
+    generated_count = generate_periods_bulk(current_year)
 
-    db.commit()
     flash(f"Se generaron/verificaron {generated_count} nuevos periodos para el año {current_year}.", "success")
     return redirect(url_for('main.dashboard'))
 
@@ -86,16 +101,15 @@ def hr_add_period():
         if existing_period:
             flash(f"Ya existe un saldo para este tipo de licencia en el año {year}.", "danger")
         else:
-            db.execute(
+            execute_write(
                 "INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued, days_taken) VALUES (?, ?, ?, ?, 0)",
                 (employee_id, year, leave_type_id, total_days)
             )
-            db.commit()
             flash(f"Saldo asignado exitosamente para el año {year}.", "success")
             return redirect(url_for('hr.hr_period_list'))
 
-    employees = db.execute("SELECT id, full_name FROM employees WHERE is_active = 1 ORDER BY full_name").fetchall()
-    leave_types = db.execute("SELECT * FROM leave_types ORDER BY name").fetchall()
+    employees = refcache.employee_choices(active_only=True)
+    leave_types = refcache.leave_types()
     
     return render_template('hr/hr_period_form.html', form_title="Asignar Saldo de Licencia", employees=employees, leave_types=leave_types, now=datetime.now)
 
@@ -105,7 +119,8 @@ def hr_period_list():
         flash("Acceso no autorizado.", "danger")
         return redirect(url_for("main.dashboard"))
     
-    db = get_db()
+    # La exportación lee la copia de reportes; el listado, la base principal (refleja las ediciones)
+    db = snapshot.get_report_db() if request.args.get('export') == 'true' else get_db()
     filter_employee_ids = request.args.getlist('employee_id')
 
     query = """
@@ -126,6 +141,7 @@ def hr_period_list():
 
     # Exportar a Excel (CSV)
     if request.args.get('export') == 'true':
+        from openpyxl import Workbook  # Importación diferida: solo se usa al exportar
         wb = Workbook()
         ws = wb.active
         ws.title = "Periodos"
@@ -145,13 +161,97 @@ def hr_period_list():
             headers={"Content-disposition": "attachment; filename=periodos_vacaciones.xlsx"}
         )
 
-    employees = db.execute("SELECT id, full_name FROM employees WHERE is_active = 1 ORDER BY full_name").fetchall()
+    employees = refcache.employee_choices(active_only=True)
 
     return render_template('hr/hr_period_list.html', 
                            periods=periods, 
                            employees=employees, 
                            filters={'employee_id': filter_employee_ids})
 
+@bp.route('/periods/bulk', methods=('GET', 'POST'))
+def hr_bulk_periods():
+    if not check_hr_access():
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    db = get_db()
+    leave_types = refcache.leave_types()
+    context = {'mode': request.form.get('mode', 'set'), 'comment': request.form.get('comment', ''), 'year': datetime.now().year}
+
+    if request.method == 'POST':
+        mode = context['mode']
+        if mode not in period_adjustments.MODES or not context['comment']:
+            flash("Elija el modo y escriba un comentario que justifique el ajuste.", "danger")
+            return redirect(url_for('hr.hr_bulk_periods'))
+
+        errors = []
+        try:
+            if request.form.get('source') == 'file':
+                upload = request.files.get('file')
+                if not upload or not upload.filename:
+                    flash("Seleccione un archivo .xlsx o .csv.", "danger")
+                    return redirect(url_for('hr.hr_bulk_periods'))
+                adjustments, errors = period_adjustments.from_file(db, upload.stream, upload.filename, mode)
+            else:
+                year = int(request.form['year'])
+                employee_ids = request.form.getlist('employee_id')
+                amounts = {}
+                for lt in leave_types:
+                    value = request.form.get(f"days_{lt['id']}", '').strip()
+                    if value:
+                        amounts[lt['id']] = float(value.replace(',', '.'))
+                if not employee_ids or not amounts:
+                    flash("Seleccione empleados e indique los días de al menos un tipo de licencia.", "danger")
+                    return redirect(url_for('hr.hr_bulk_periods'))
+                context['year'] = year
+                adjustments = period_adjustments.from_form(employee_ids, year, amounts, mode)
+        except (KeyError, ValueError) as e:
+            flash(f"Datos inválidos: {e}", "danger")
+            return redirect(url_for('hr.hr_bulk_periods'))
+
+        rows, fingerprint = period_adjustments.preview(db, adjustments, mode)
+        # Token de un solo uso: la confirmación solo aplica lo que se previsualizó, una vez
+        token = secrets.token_urlsafe(16)
+        session['bulk_periods_preview'] = {'token': token, 'fingerprint': fingerprint}
+        context.update(
+            preview=rows,
+            payload=json.dumps(period_adjustments.encode(adjustments)),
+            confirm_token=token,
+            errors=errors
+        )
+
+    employees = refcache.employee_choices(active_only=True)
+    return render_template('hr/hr_period_bulk.html', employees=employees, leave_types=leave_types, **context)
+
+@bp.route('/periods/bulk/apply', methods=('POST',))
+def hr_apply_bulk_periods():
+    if not check_hr_access():
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    pending = session.pop('bulk_periods_preview', None)
+    if pending is None or request.form.get('confirm_token') != pending['token']:
+        flash("Este ajuste ya se aplicó o su vista previa no es válida. Vuelva a previsualizarlo.", "warning")
+        return redirect(url_for('hr.hr_bulk_periods'))
+
+    mode = request.form.get('mode')
+    comment = request.form.get('comment')
+    try:
+        adjustments = period_adjustments.decode(json.loads(request.form.get('payload') or '[]'))
+        if mode not in period_adjustments.MODES or not comment or not adjustments:
+            raise ValueError
+    except ValueError:
+        flash("No hay ajustes válidos para aplicar.", "danger")
+        return redirect(url_for('hr.hr_bulk_periods'))
+
+    try:
+        changed = period_adjustments.apply(get_db(), adjustments, mode, comment, pending['fingerprint'])
+    except period_adjustments.PreviewChanged:
+        flash("Los periodos cambiaron desde la vista previa. Vuelva a previsualizar el ajuste.", "warning")
+        return redirect(url_for('hr.hr_bulk_periods'))
+    flash(f"Ajuste masivo aplicado: {changed} periodos creados o actualizados.", "success")
+    return redirect(url_for('hr.hr_period_list'))
+
 @bp.route('/period/edit/<int:period_id>', methods=('GET', 'POST'))
 def hr_edit_period(period_id):
     if not check_hr_access():
@@ -185,7 +285,7 @@ def hr_edit_period(period_id):
     ).fetchall()
 
     # Fetch leave types for the add form
-    leave_types = db.execute("SELECT * FROM leave_types ORDER BY name").fetchall()
+    leave_types = refcache.leave_types()
 
     if request.method == 'POST':
         if request.form.get('action') == 'add_license':
@@ -205,21 +305,18 @@ def hr_edit_period(period_id):
                         flash(f"Ya existe un saldo para este tipo de licencia en el año {new_year}.", "danger")
                     else:
                         # Calcular días automáticamente según el tipo de licencia
-                        lt_info = db.execute("SELECT default_days, name FROM leave_types WHERE id = ?", (new_leave_type,)).fetchone()
-                        
-                        if lt_info['default_days'] > 0:
-                            # Licencia con días fijos (ej: Maternidad, Matrimonio)
+                        lt_info = refcache.leave_type(new_leave_type)
+                        emp_info = db.execute("SELECT hire_date, company FROM employees WHERE id = ?", (period['employee_id'],)).fetchone()
+
+                        # Licencia con escala de antigüedad (ej: Vacaciones) o con días fijos (ej: Maternidad)
+                        new_days = accrual.accrued_days_for(emp_info['hire_date'], new_year, new_leave_type, emp_info['company'])
+                        if new_days is None:
                             new_days = lt_info['default_days']
-                        else:
-                            # Licencia variable (ej: Vacaciones), calcular por antigüedad
-                            emp_info = db.execute("SELECT hire_date FROM employees WHERE id = ?", (period['employee_id'],)).fetchone()
-                            new_days = calculate_accrued_days(emp_info['hire_date'])
 
-                        db.execute(
+                        execute_write(
                             "INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued, days_taken) VALUES (?, ?, ?, ?, 0)",
                             (period['employee_id'], new_year, new_leave_type, new_days)
                         )
-                        db.commit()
                         flash(f"Nueva licencia asignada exitosamente ({new_days} días).", "success")
                         return redirect(url_for('hr.hr_edit_period', period_id=period_id))
             except (ValueError, TypeError):
@@ -237,11 +334,10 @@ def hr_edit_period(period_id):
                 flash("Es obligatorio añadir un comentario justificando la modificación.", "danger")
                 return render_template('hr/hr_period_form.html', period=period, employee_periods=employee_periods, leave_types=leave_types, now=datetime.now)
 
-            db.execute(
+            execute_write(
                 "UPDATE vacation_periods SET total_days_accrued = ?, days_taken = ?, adjustment_comment = ? WHERE id = ?",
                 (total_days, days_taken, comment, period_id)
             )
-            db.commit()
             flash(f"Periodo de {period['full_name']} para el año {period['year']} actualizado exitosamente.", "success")
             return redirect(url_for('hr.hr_period_list'))
 
@@ -272,7 +368,7 @@ def hr_email_config():
             )
         )
         db.commit()
-        flash("Configuración de correo guardada. La aplicación se reiniciará para aplicar los cambios.", "success")
+        flash("Configuración de correo guardada. Se aplicará a partir del próximo envío.", "success")
         return redirect(url_for('hr.hr_email_config'))
         
     config = db.execute("SELECT * FROM email_config ORDER BY id DESC LIMIT 1").fetchone()
@@ -284,20 +380,21 @@ def stats_dashboard():
         flash("Acceso no autorizado.", "danger")
         return redirect(url_for("main.dashboard"))
 
-    conn = get_db()
+    # Lecturas pesadas desde la copia de reportes (ver snapshot.py)
+    conn = snapshot.get_report_db()
     current_year = str(datetime.now().year)
 
-    # KPIs
+    # KPIs (los históricos incluyen las solicitudes archivadas, ver archive.py)
     active_employees = conn.execute("SELECT COUNT(*) FROM employees WHERE is_active = 1").fetchone()[0]
     pending_requests = conn.execute("SELECT COUNT(*) FROM vacation_requests WHERE status = 'Pendiente' OR status = 'Aprobado por Jefe'").fetchone()[0]
     days_approved_this_year = conn.execute(
-        "SELECT SUM(days_requested) FROM vacation_requests WHERE status IN ('Aprobado por RRHH', 'Activo', 'Finalizado') AND strftime('%Y', start_date) = ?", 
+        "SELECT SUM(days_requested) FROM vacation_requests_all WHERE status IN ('Aprobado por RRHH', 'Activo', 'Finalizado') AND strftime('%Y', start_date) = ?", 
         (current_year,)
     ).fetchone()[0] or 0
 
     # Datos para el gráfico de solicitudes por mes
     requests_by_month_rows = conn.execute(
-        "SELECT strftime('%m', request_date) as month, COUNT(id) as count FROM vacation_requests WHERE strftime('%Y', request_date) = ? GROUP BY month ORDER BY month",
+        "SELECT strftime('%m', request_date) as month, COUNT(id) as count FROM vacation_requests_all WHERE strftime('%Y', request_date) = ? GROUP BY month ORDER BY month",
         (current_year,)
     ).fetchall()
     
@@ -311,7 +408,7 @@ def stats_dashboard():
     days_by_dept_rows = conn.execute(
         """
         SELECT e.department, SUM(vr.days_requested) as total_days 
-        FROM vacation_requests vr 
+        FROM vacation_requests_all vr 
         JOIN employees e ON vr.employee_id = e.id 
         WHERE vr.status IN ('Aprobado por RRHH', 'Activo', 'Finalizado') AND e.department IS NOT NULL AND e.department != ''
         GROUP BY e.department
@@ -328,7 +425,8 @@ def stats_dashboard():
                            month_labels=json.dumps(month_labels),
                            requests_per_month_data=json.dumps(requests_per_month_data),
                            dept_labels=json.dumps(dept_labels),
-                           days_per_dept_data=json.dumps(days_per_dept_data))
+                           days_per_dept_data=json.dumps(days_per_dept_data),
+                           snapshot_at=snapshot.taken_at())
 
 @bp.route("/approvals")
 def hr_approval_list():
@@ -341,11 +439,12 @@ def hr_approval_list():
     filter_employee_ids = request.args.getlist('employee_id')
     
     query = """
-        SELECT vr.id, vr.start_date, vr.end_date, vr.days_requested, vr.replacement_name, e.full_name as employee_name, m.full_name as manager_name, lt.name as leave_name
+        SELECT vr.id, vr.employee_id, vr.replacement_employee_id, vr.start_date, vr.end_date, vr.days_requested, COALESCE(rep.full_name, vr.replacement_name) as replacement_name, e.full_name as employee_name, e.department, m.full_name as manager_name, lt.name as leave_name
         FROM vacation_requests vr
         JOIN employees e ON vr.employee_id = e.id
         LEFT JOIN leave_types lt ON vr.leave_type_id = lt.id
         LEFT JOIN employees m ON e.manager_id = m.id
+        LEFT JOIN employees rep ON vr.replacement_employee_id = rep.id
         WHERE vr.status = 'Aprobado por Jefe'
     """
     params = []
@@ -361,6 +460,7 @@ def hr_approval_list():
 
     # Exportar a Excel (CSV)
     if request.args.get('export') == 'true':
+        from openpyxl import Workbook  # Importación diferida: solo se usa al exportar
         wb = Workbook()
         ws = wb.active
         ws.title = "Solicitudes Pendientes"
@@ -379,9 +479,11 @@ def hr_approval_list():
             headers={"Content-disposition": "attachment; filename=solicitudes_pendientes_aprobacion.xlsx"}
         )
 
-    employees = db.execute("SELECT id, full_name FROM employees ORDER BY full_name").fetchall()
+    employees = refcache.employee_choices()
+    conflicts = {req['id']: request_conflicts(db, req) for req in hr_pending_requests}
+    staffing = coverage.request_coverage(db, hr_pending_requests)
     
-    return render_template("hr/hr_approval_list.html", requests=hr_pending_requests, employees=employees, filters={'employee_id': filter_employee_ids})
+    return render_template("hr/hr_approval_list.html", requests=hr_pending_requests, employees=employees, conflicts=conflicts, coverage=staffing, filters={'employee_id': filter_employee_ids})
 
 @bp.route("/approve/<int:request_id>", methods=["POST"])
 def hr_approve_request(request_id):
@@ -391,63 +493,33 @@ def hr_approve_request(request_id):
 
     db = get_db()
     
-    req = db.execute("SELECT employee_id, days_requested, leave_type_id, replacement_name FROM vacation_requests WHERE id = ? AND status = 'Aprobado por Jefe'", (request_id,)).fetchone()
+    req = db.execute("SELECT id, employee_id, start_date, end_date, days_requested, leave_type_id, replacement_name, replacement_employee_id, version FROM vacation_requests WHERE id = ? AND status = 'Aprobado por Jefe'", (request_id,)).fetchone()
 
     if req:
-        leave_type = db.execute("SELECT requires_balance FROM leave_types WHERE id = ?", (req['leave_type_id'],)).fetchone()
+        # Advertir (sin bloquear) superposiciones detectadas al momento de aprobar
+        for conflict in request_conflicts(db, req):
+            flash(f"Atención: {conflict}", "warning")
+
+        leave_type = refcache.leave_type(req['leave_type_id'])
         requires_balance = leave_type['requires_balance'] if leave_type else 1
 
-        if requires_balance:
-            days_to_deduct = req['days_requested']
-            
-            periods = db.execute(
-                "SELECT id, total_days_accrued, days_taken FROM vacation_periods WHERE employee_id = ? AND total_days_accrued > days_taken ORDER BY year ASC",
-                (req['employee_id'],)
-            ).fetchall()
-
-            for period in periods:
-                if days_to_deduct <= 0:
-                    break
-                
-                balance = period['total_days_accrued'] - period['days_taken']
-                deduct_from_this_period = min(days_to_deduct, balance)
-                
-                if deduct_from_this_period > 0:
-                    db.execute(
-                        "UPDATE vacation_periods SET days_taken = days_taken + ? WHERE id = ?",
-                        (deduct_from_this_period, period['id'])
-                    )
-                    days_to_deduct -= deduct_from_this_period
+        def approve(conn):
+            # Si otra petición ya la procesó, no se descuenta el saldo dos veces
+            updated = transitions.transition(
+                conn, request_id, req['version'], 'Aprobado por Jefe', 'Aprobado por RRHH',
+                hr_approval_date=datetime.now()
+            )
+            if updated and requires_balance:
+                balances.deduct_days(conn, req['employee_id'], req['days_requested'])
+            return updated
 
-        db.execute(
-            "UPDATE vacation_requests SET status = 'Aprobado por RRHH', hr_approval_date = ? WHERE id = ?",
-            (datetime.now(), request_id)
-        )
-        db.commit()
+        if not run_write(approve):
+            flash(transitions.STALE_MESSAGE, "warning")
+            return redirect(url_for("hr.hr_approval_list"))
 
         # --- NOTIFICACIÓN: A Empleado, Jefe y Reemplazo (Aprobación Final) ---
         try:
-            # 1. Datos del Empleado y su Jefe
-            emp_info = db.execute("SELECT email, full_name, manager_id FROM employees WHERE id = ?", (req['employee_id'],)).fetchone()
-            recipients = []
-            
-            if emp_info and emp_info['email']:
-                recipients.append(emp_info['email'])
-            
-            if emp_info and emp_info['manager_id']:
-                mgr_info = db.execute("SELECT email FROM employees WHERE id = ?", (emp_info['manager_id'],)).fetchone()
-                if mgr_info and mgr_info['email']:
-                    recipients.append(mgr_info['email'])
-
-            # 2. Datos del Reemplazo
-            if req['replacement_name']:
-                rep_info = db.execute("SELECT email FROM employees WHERE full_name = ?", (req['replacement_name'],)).fetchone()
-                if rep_info and rep_info['email']:
-                    recipients.append(rep_info['email'])
-
-            # Obtener email de RRHH (Actor) para CC
-            hr_actor_email = db.execute("SELECT email FROM employees WHERE id = ?", (session['user_id'],)).fetchone()
-            cc_list = [hr_actor_email['email']] if hr_actor_email and hr_actor_email['email'] else []
+            emp_info, recipients, cc_list = notification_contacts(db, req['employee_id'], req['replacement_employee_id'])
 
             if recipients:
                 subject = "Solicitud de Vacaciones Aprobada"
@@ -470,28 +542,16 @@ def hr_reject_request(request_id):
 
     db = get_db()
     
-    req_to_reject = db.execute("SELECT id FROM vacation_requests WHERE id = ? AND status = 'Aprobado por Jefe'", (request_id,)).fetchone()
+    req_to_reject = db.execute("SELECT id, employee_id, version FROM vacation_requests WHERE id = ? AND status = 'Aprobado por Jefe'", (request_id,)).fetchone()
 
     if req_to_reject:
-        db.execute("UPDATE vacation_requests SET status = 'Rechazado' WHERE id = ?", (request_id,))
-        db.commit()
+        if not run_write(lambda conn: transitions.transition(conn, request_id, req_to_reject['version'], 'Aprobado por Jefe', 'Rechazado')):
+            flash(transitions.STALE_MESSAGE, "warning")
+            return redirect(url_for("hr.hr_approval_list"))
 
         # --- NOTIFICACIÓN: A Empleado y Jefe (Rechazo RRHH) ---
         try:
-            emp_info = db.execute("SELECT e.email, e.full_name, e.manager_id FROM vacation_requests vr JOIN employees e ON vr.employee_id = e.id WHERE vr.id = ?", (request_id,)).fetchone()
-            recipients = []
-            
-            if emp_info and emp_info['email']:
-                recipients.append(emp_info['email'])
-            
-            if emp_info and emp_info['manager_id']:
-                mgr_info = db.execute("SELECT email FROM employees WHERE id = ?", (emp_info['manager_id'],)).fetchone()
-                if mgr_info and mgr_info['email']:
-                    recipients.append(mgr_info['email'])
-
-            # Obtener email de RRHH (Actor) para CC
-            hr_actor_email = db.execute("SELECT email FROM employees WHERE id = ?", (session['user_id'],)).fetchone()
-            cc_list = [hr_actor_email['email']] if hr_actor_email and hr_actor_email['email'] else []
+            emp_info, recipients, cc_list = notification_contacts(db, req_to_reject['employee_id'])
 
             if recipients:
                 subject = "Solicitud de Vacaciones Rechazada por RRHH"
@@ -512,10 +572,9 @@ def hr_employee_list():
         flash("Acceso no autorizado.", "danger")
         return redirect(url_for("main.dashboard"))
     
-    db = get_db()
-    employees = db.execute(
-        "SELECT id, full_name FROM employees ORDER BY full_name"
-    ).fetchall()
+    # La exportación lee la copia de reportes; el listado, la base principal (refleja las ediciones)
+    db = snapshot.get_report_db() if request.args.get('export') == 'true' else get_db()
+    employees = refcache.employee_choices()
     
     filter_employee_ids = request.args.getlist('employee_id')
     
@@ -536,6 +595,7 @@ def hr_employee_list():
 
     # Exportar a Excel (CSV)
     if request.args.get('export') == 'true':
+        from openpyxl import Workbook  # Importación diferida: solo se usa al exportar
         wb = Workbook()
         ws = wb.active
         ws.title = "Empleados"
@@ -578,26 +638,59 @@ def hr_add_employee():
             flash("Formato de fecha de contratación inválido. Por favor, usa DD/MM/YYYY.", "danger")
             return redirect(url_for('hr.hr_add_employee'))
 
-        db = get_db()
         try:
-            db.execute(
+            execute_write(
                 """
                 INSERT INTO employees (username, full_name, email, password, hire_date, role, manager_id, department, job_title, company, is_ad_managed)
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 0)
                 """,
                 (username, full_name, email, generate_password_hash(password), hire_date, role, manager_id, department, job_title, company)
             )
-            db.commit()
             flash(f"Empleado '{full_name}' creado exitosamente.", "success")
-        except sqlite3.IntegrityError:
+        except integrity_errors():
             flash(f"El nombre de usuario '{username}' ya existe.", "danger")
         return redirect(url_for('hr.hr_employee_list'))
 
     db = get_db()
-    managers = db.execute("SELECT id, full_name FROM employees WHERE role = 'Jefe' AND is_active = 1").fetchall()
-    roles = db.execute("SELECT name FROM roles ORDER BY name").fetchall()
+    managers = refcache.active_managers()
+    roles = refcache.roles()
     return render_template("hr/hr_employee_form.html", managers=managers, roles=roles, form_title="Añadir Nuevo Empleado")
 
+@bp.route("/employees/import", methods=['GET', 'POST'])
+def hr_import_employees():
+    if not check_hr_access(readonly=True): # Asistente puede cargar empleados
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    report = None
+    if request.method == 'POST':
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            flash("Seleccione un archivo .xlsx o .csv.", "danger")
+            return redirect(url_for('hr.hr_import_employees'))
+
+        dry_run = 'dry_run' in request.form
+        try:
+            report = employee_import.import_employees(
+                get_db(),
+                employee_import.read_rows(upload.stream, upload.filename),
+                default_password=request.form.get('default_password'),
+                dry_run=dry_run,
+                workers=current_app.config['IMPORT_HASH_WORKERS']
+            )
+        except employee_import.ImportFormatError as e:
+            flash(str(e), "danger")
+            return redirect(url_for('hr.hr_import_employees'))
+
+        ok = sum(1 for entry in report if entry['ok'])
+        errors = len(report) - ok
+        if dry_run:
+            flash(f"Validación: {ok} filas válidas, {errors} con errores. No se importó nada.", "info")
+        else:
+            flash(f"Importación: {ok} empleados creados, {errors} filas con errores.", "success" if not errors else "warning")
+
+    return render_template("hr/hr_employee_import.html", report=report)
+
 @bp.route("/employee/edit/<int:employee_id>", methods=['GET', 'POST'])
 def hr_edit_employee(employee_id):
     if not check_hr_access(readonly=True): # Asistente puede editar empleados
@@ -619,12 +712,12 @@ def hr_edit_employee(employee_id):
 
         if employee['is_ad_managed']:
             if password:
-                db.execute(
+                execute_write(
                     "UPDATE employees SET password = ?, role = ?, manager_id = ?, is_active = ? WHERE id = ?",
                     (generate_password_hash(password), role, manager_id, is_active, employee_id)
                 )
             else:
-                db.execute(
+                execute_write(
                     "UPDATE employees SET role = ?, manager_id = ?, is_active = ? WHERE id = ?",
                     (role, manager_id, is_active, employee_id)
                 )
@@ -643,7 +736,7 @@ def hr_edit_employee(employee_id):
 
             try:
                 if password:
-                    db.execute(
+                    execute_write(
                         """
                         UPDATE employees SET username=?, full_name=?, email=?, password=?, hire_date=?, role=?, manager_id=?, department=?, job_title=?, company=?, is_active=?
                         WHERE id = ?
@@ -651,24 +744,22 @@ def hr_edit_employee(employee_id):
                         (username, full_name, email, generate_password_hash(password), hire_date, role, manager_id, department, job_title, company, is_active, employee_id)
                     )
                 else:
-                    db.execute(
+                    execute_write(
                         """
                         UPDATE employees SET username=?, full_name=?, email=?, hire_date=?, role=?, manager_id=?, department=?, job_title=?, company=?, is_active=?
                         WHERE id = ?
                         """,
                         (username, full_name, email, hire_date, role, manager_id, department, job_title, company, is_active, employee_id)
                     )
-                db.commit()
                 flash(f"Empleado '{full_name}' actualizado exitosamente.", "success")
-            except sqlite3.IntegrityError:
+            except integrity_errors():
                 flash(f"El nombre de usuario '{username}' ya está en uso por otro empleado.", "danger")
             return redirect(url_for('hr.hr_employee_list'))
 
-        db.commit()
         return redirect(url_for('hr.hr_employee_list'))
 
-    managers = db.execute("SELECT id, full_name FROM employees WHERE role = 'Jefe' AND is_active = 1 AND id != ?", (employee_id,)).fetchall()
-    roles = db.execute("SELECT name FROM roles ORDER BY name").fetchall()
+    managers = [m for m in refcache.active_managers() if m['id'] != employee_id]
+    roles = refcache.roles()
     return render_template("hr/hr_employee_form.html", employee=employee, managers=managers, roles=roles, form_title="Editar Empleado")
 
 @bp.route("/request/create", methods=['GET', 'POST'])
@@ -690,7 +781,7 @@ def hr_create_request():
             # Obtener nombre del reemplazo
             replacement_name = None
             if replacement_id:
-                rep_emp = db.execute("SELECT full_name FROM employees WHERE id = ?", (replacement_id,)).fetchone()
+                rep_emp = db.execute("SELECT id, full_name FROM employees WHERE id = ?", (replacement_id,)).fetchone()
                 if rep_emp:
                     replacement_name = rep_emp['full_name']
             
@@ -699,7 +790,7 @@ def hr_create_request():
                 return redirect(url_for('hr.hr_create_request'))
             
             # Obtener info del tipo de licencia
-            leave_type = db.execute("SELECT * FROM leave_types WHERE id = ?", (leave_type_id,)).fetchone()
+            leave_type = refcache.leave_type(leave_type_id)
             
             start_date = datetime.strptime(start_date_str, "%d/%m/%Y").date()
             
@@ -734,9 +825,11 @@ def hr_create_request():
             attachment_path = None
             if leave_type['requires_attachment']:
                 if attachment and attachment.filename != '':
-                    filename = secure_filename(f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{attachment.filename}")
-                    attachment.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                    attachment_path = filename
+                    try:
+                        attachment_path = attachments.save_upload(attachment)
+                    except attachments.AttachmentTooLarge as e:
+                        flash(str(e), "danger")
+                        return redirect(url_for('hr.hr_create_request'))
                 else:
                     flash("Este tipo de licencia requiere un archivo adjunto obligatorio.", "danger")
                     return redirect(url_for('hr.hr_create_request'))
@@ -744,10 +837,10 @@ def hr_create_request():
             # Insertar solicitud con estado 'Pendiente' pero con hr_approval_date ya seteado
             db.execute(
                 """
-                INSERT INTO vacation_requests (employee_id, leave_type_id, start_date, end_date, request_type, days_requested, replacement_name, status, hr_approval_date, attachment_path)
-                VALUES (?, ?, ?, ?, 'FullDay', ?, ?, 'Pendiente', ?, ?)
+                INSERT INTO vacation_requests (employee_id, leave_type_id, start_date, end_date, request_type, days_requested, replacement_name, replacement_employee_id, status, hr_approval_date, attachment_path)
+                VALUES (?, ?, ?, ?, 'FullDay', ?, ?, ?, 'Pendiente', ?, ?)
                 """,
-                (employee_id, leave_type_id, start_date, end_date, days_requested, replacement_name, datetime.now(), attachment_path)
+                (employee_id, leave_type_id, start_date, end_date, days_requested, replacement_name, rep_emp['id'], datetime.now(), attachment_path)
             )
             db.commit()
 
@@ -768,9 +861,9 @@ def hr_create_request():
             return redirect(url_for('hr.hr_create_request'))
 
     # GET
-    employees = db.execute("SELECT id, full_name FROM employees WHERE is_active = 1 ORDER BY full_name").fetchall()
+    employees = refcache.employee_choices(active_only=True)
     # Serializar leave_types para usar en JS
-    leave_types_rows = db.execute("SELECT * FROM leave_types ORDER BY name").fetchall()
+    leave_types_rows = refcache.leave_types()
     leave_types_json = {}
     for lt in leave_types_rows:
         leave_types_json[lt['id']] = dict(lt)
@@ -778,8 +871,7 @@ def hr_create_request():
     # Obtener feriados y sábados para cálculo en JS
     holidays_dict = get_paraguay_holidays()
     holidays_list = [d.strftime('%d/%m/%Y') for d in holidays_dict.keys()]
-    working_saturdays_rows = db.execute("SELECT effective_date FROM saturday_config WHERE is_working = 1").fetchall()
-    working_saturdays = [row['effective_date'].strftime('%d/%m/%Y') for row in working_saturdays_rows]
+    working_saturdays = [day.strftime('%d/%m/%Y') for day in refcache.saturdays(is_working=True)]
 
     selected_employee_id = request.args.get('employee_id')
 
@@ -790,14 +882,9 @@ def get_employee_balances_api(employee_id):
     if not check_hr_access(readonly=True):
         return jsonify({"error": "Unauthorized"}), 403
     
-    db = get_db()
-    balances = db.execute(
-        "SELECT leave_type_id, SUM(total_days_accrued - days_taken) as balance FROM vacation_periods WHERE employee_id = ? GROUP BY leave_type_id",
-        (employee_id,)
-    ).fetchall()
-    
-    result = {row['leave_type_id']: row['balance'] for row in balances}
-    return jsonify(result)
+    # Mismo cálculo que /api/v1/employees/<id>/balances (ver routes/api.py)
+    result = balances.employee_balances(get_db(), [employee_id]).get(employee_id, [])
+    return jsonify({row['leave_type_id']: row['balance'] for row in result})
 
 @bp.route("/all_requests")
 def hr_all_requests():
@@ -805,21 +892,8 @@ def hr_all_requests():
         flash("Acceso no autorizado.", "danger")
         return redirect(url_for("main.dashboard"))
 
-    db = get_db()
-    
     # Actualizar estados de solicitudes
-    today = date.today()
-    # 1. Aprobado por RRHH -> Activo
-    db.execute(
-        "UPDATE vacation_requests SET status = 'Activo' WHERE status = 'Aprobado por RRHH' AND start_date <= ? AND end_date >= ?",
-        (today, today)
-    )
-    # 2. Activo/Aprobado -> Finalizado
-    db.execute(
-        "UPDATE vacation_requests SET status = 'Finalizado' WHERE (status = 'Aprobado por RRHH' OR status = 'Activo') AND end_date < ?",
-        (today,)
-    )
-    db.commit()
+    refresh_request_statuses()
     
     filter_employee_ids = request.args.getlist('employee_id')
     filter_status = request.args.get('status', '')
@@ -829,7 +903,7 @@ def hr_all_requests():
 
     query = """
         SELECT vr.*, e.full_name as employee_name, m.full_name as manager_name, lt.name as leave_name
-        FROM vacation_requests vr
+        FROM vacation_requests_all vr
         JOIN employees e ON vr.employee_id = e.id
         LEFT JOIN leave_types lt ON vr.leave_type_id = lt.id
         LEFT JOIN employees m ON e.manager_id = m.id
@@ -871,10 +945,16 @@ def hr_all_requests():
 
     query += " ORDER BY vr.request_date DESC"
 
+    # Filas livianas: de las 5 fechas de cada solicitud el listado solo muestra inicio y fin.
+    # La exportación lee la copia de reportes (ver snapshot.py); el listado interactivo lee
+    # la base principal: sus acciones (interrumpir, modificar) redirigen aquí y deben verse
+    export = request.args.get('export') == 'true'
+    db = snapshot.get_report_lazy_db() if export else rows.get_lazy_db()
     all_requests = db.execute(query, params).fetchall()
 
     # Exportar a Excel (CSV)
-    if request.args.get('export') == 'true':
+    if export:
+        from openpyxl import Workbook  # Importación diferida: solo se usa al exportar
         wb = Workbook()
         ws = wb.active
         ws.title = "Todas las Solicitudes"
@@ -893,7 +973,7 @@ def hr_all_requests():
             headers={"Content-disposition": "attachment; filename=todas_las_solicitudes.xlsx"}
         )
     
-    employees = db.execute("SELECT id, full_name FROM employees ORDER BY full_name").fetchall()
+    employees = refcache.employee_choices()
     
     return render_template("hr/hr_all_requests.html", 
                            requests=all_requests, 
@@ -957,7 +1037,7 @@ def hr_manage_holidays():
                 )
                 db.commit()
                 flash("Feriado añadido exitosamente.", "success")
-            except sqlite3.IntegrityError:
+            except integrity_errors():
                 flash(f"La fecha {holiday_date.strftime('%d/%m/%Y')} ya está registrada como feriado.", "warning")
         
         return redirect(url_for('hr.hr_manage_holidays'))
@@ -1060,7 +1140,7 @@ def hr_manage_roles():
                 db.execute("INSERT INTO roles (name, base_role, is_system_role) VALUES (?, ?, 0)", (role_name, base_role))
                 db.commit()
                 flash(f"Rol '{role_name}' creado.", "success")
-            except sqlite3.IntegrityError:
+            except integrity_errors():
                 flash("El rol ya existe.", "danger")
         return redirect(url_for('hr.hr_manage_roles'))
 
@@ -1115,6 +1195,7 @@ def hr_cancellation_list():
 
     # Exportar a Excel (CSV)
     if request.args.get('export') == 'true':
+        from openpyxl import Workbook  # Importación diferida: solo se usa al exportar
         wb = Workbook()
         ws = wb.active
         ws.title = "Anulaciones"
@@ -1133,7 +1214,7 @@ def hr_cancellation_list():
             headers={"Content-disposition": "attachment; filename=solicitudes_anulacion.xlsx"}
         )
 
-    employees = db.execute("SELECT id, full_name FROM employees ORDER BY full_name").fetchall()
+    employees = refcache.employee_choices()
     
     return render_template("hr/hr_cancellation_list.html", requests=cancellation_requests, employees=employees, filters={'employee_id': filter_employee_ids})
 
@@ -1145,63 +1226,27 @@ def hr_approve_cancellation(request_id):
 
     db = get_db()
     req = db.execute(
-        "SELECT employee_id, days_requested, leave_type_id, replacement_name FROM vacation_requests WHERE id = ? AND status = 'Anulación Pendiente RRHH'",
+        "SELECT employee_id, days_requested, leave_type_id, replacement_name, replacement_employee_id, version FROM vacation_requests WHERE id = ? AND status = 'Anulación Pendiente RRHH'",
         (request_id,)
     ).fetchone()
 
     if req:
-        leave_type = db.execute("SELECT requires_balance FROM leave_types WHERE id = ?", (req['leave_type_id'],)).fetchone()
+        leave_type = refcache.leave_type(req['leave_type_id'])
         requires_balance = leave_type['requires_balance'] if leave_type else 1
 
-        if requires_balance:
-            days_to_refund = req['days_requested']
-            
-            # Obtener los periodos del empleado ordenados del más nuevo al más antiguo
-            periods = db.execute(
-                "SELECT id, days_taken FROM vacation_periods WHERE employee_id = ? ORDER BY year DESC",
-                (req['employee_id'],)
-            ).fetchall()
-
-            for period in periods:
-                if days_to_refund <= 0:
-                    break
-                
-                refundable_from_this_period = min(days_to_refund, period['days_taken'])
-                
-                if refundable_from_this_period > 0:
-                    db.execute(
-                        "UPDATE vacation_periods SET days_taken = days_taken - ? WHERE id = ?",
-                        (refundable_from_this_period, period['id'])
-                    )
-                    days_to_refund -= refundable_from_this_period
+        def cancel(conn):
+            updated = transitions.transition(conn, request_id, req['version'], 'Anulación Pendiente RRHH', 'Anulado')
+            if updated and requires_balance:
+                balances.refund_days(conn, req['employee_id'], req['days_requested'])
+            return updated
 
-        db.execute(
-            "UPDATE vacation_requests SET status = 'Anulado' WHERE id = ?",
-            (request_id,)
-        )
-        db.commit()
+        if not run_write(cancel):
+            flash(transitions.STALE_MESSAGE, 'warning')
+            return redirect(url_for('hr.hr_cancellation_list'))
 
         # --- NOTIFICACIÓN: A Empleado, Jefe y Reemplazo (Anulación Aprobada) ---
         try:
-            emp_info = db.execute("SELECT email, full_name, manager_id FROM employees WHERE id = ?", (req['employee_id'],)).fetchone()
-            recipients = []
-
-            if emp_info and emp_info['email']:
-                recipients.append(emp_info['email'])
-            
-            if emp_info and emp_info['manager_id']:
-                mgr_info = db.execute("SELECT email FROM employees WHERE id = ?", (emp_info['manager_id'],)).fetchone()
-                if mgr_info and mgr_info['email']:
-                    recipients.append(mgr_info['email'])
-
-            if req['replacement_name']:
-                rep_info = db.execute("SELECT email FROM employees WHERE full_name = ?", (req['replacement_name'],)).fetchone()
-                if rep_info and rep_info['email']:
-                    recipients.append(rep_info['email'])
-
-            # Obtener email de RRHH (Actor) para CC
-            hr_actor_email = db.execute("SELECT email FROM employees WHERE id = ?", (session['user_id'],)).fetchone()
-            cc_list = [hr_actor_email['email']] if hr_actor_email and hr_actor_email['email'] else []
+            emp_info, recipients, cc_list = notification_contacts(db, req['employee_id'], req['replacement_employee_id'])
 
             if recipients:
                 subject = "Anulación de Vacaciones Confirmada"
@@ -1224,33 +1269,18 @@ def hr_reject_cancellation(request_id):
     
     db = get_db()
     req = db.execute(
-        "SELECT id FROM vacation_requests WHERE id = ? AND status = 'Anulación Pendiente RRHH'",
+        "SELECT id, employee_id, version FROM vacation_requests WHERE id = ? AND status = 'Anulación Pendiente RRHH'",
         (request_id,)
     ).fetchone()
 
     if req:
-        db.execute(
-            "UPDATE vacation_requests SET status = 'Aprobado por RRHH' WHERE id = ?",
-            (request_id,)
-        )
-        db.commit()
+        if not run_write(lambda conn: transitions.transition(conn, request_id, req['version'], 'Anulación Pendiente RRHH', 'Aprobado por RRHH')):
+            flash(transitions.STALE_MESSAGE, 'warning')
+            return redirect(url_for('hr.hr_cancellation_list'))
 
         # --- NOTIFICACIÓN: A Empleado y Jefe (Anulación Rechazada) ---
         try:
-            emp_info = db.execute("SELECT e.email, e.full_name, e.manager_id FROM vacation_requests vr JOIN employees e ON vr.employee_id = e.id WHERE vr.id = ?", (request_id,)).fetchone()
-            recipients = []
-
-            if emp_info and emp_info['email']:
-                recipients.append(emp_info['email'])
-            
-            if emp_info and emp_info['manager_id']:
-                mgr_info = db.execute("SELECT email FROM employees WHERE id = ?", (emp_info['manager_id'],)).fetchone()
-                if mgr_info and mgr_info['email']:
-                    recipients.append(mgr_info['email'])
-
-            # Obtener email de RRHH (Actor) para CC
-            hr_actor_email = db.execute("SELECT email FROM employees WHERE id = ?", (session['user_id'],)).fetchone()
-            cc_list = [hr_actor_email['email']] if hr_actor_email and hr_actor_email['email'] else []
+            emp_info, recipients, cc_list = notification_contacts(db, req['employee_id'])
 
             if recipients:
                 subject = "Solicitud de Anulación Rechazada"
@@ -1284,10 +1314,13 @@ def trigger_ad_sync():
         flash("La configuración de Directorio Activo no ha sido establecida.", "danger")
         return redirect(url_for('hr.hr_ad_sync'))
 
+    started = time.perf_counter()
     try:
         summary = ad_sync.sync_users_from_ad(config)
+        metrics.observe_ad_sync(time.perf_counter() - started, summary)
         flash(f"Sincronización completada. {summary['created']} usuarios creados, {summary['updated']} actualizados, {summary['deactivated']} desactivados.", "success")
     except Exception as e:
+        metrics.observe_ad_sync(time.perf_counter() - started)
         flash(f"Error durante la sincronización: {e}", "danger")
 
     return redirect(url_for('hr.hr_ad_sync'))
@@ -1304,7 +1337,7 @@ def team_calendar():
     approved_requests = db.execute(
         """
         SELECT e.full_name, vr.start_date, vr.end_date, lt.name as leave_name
-        FROM vacation_requests vr
+        FROM vacation_requests_all vr
         JOIN employees e ON vr.employee_id = e.id
         LEFT JOIN leave_types lt ON vr.leave_type_id = lt.id
         WHERE vr.status IN ('Aprobado por RRHH', 'Activo', 'Finalizado')
@@ -1323,11 +1356,10 @@ def team_calendar():
         })
 
     # Agregar Sábados LIBRES (Feriados) al calendario
-    saturdays = db.execute("SELECT effective_date FROM saturday_config WHERE is_working = 0").fetchall()
-    for sat in saturdays:
+    for saturday in refcache.saturdays(is_working=False):
         events.append({
             'title': 'Sábado Libre',
-            'start': sat['effective_date'].strftime('%Y-%m-%d'),
+            'start': saturday.strftime('%Y-%m-%d'),
             'allDay': True,
             'display': 'background', # Muestra como fondo coloreado
             'backgroundColor': '#ffc107' # Color amarillo/ámbar
@@ -1411,7 +1443,7 @@ def hr_manage_leave_types():
                 db.execute("INSERT INTO leave_types (name, requires_balance, default_days, consumption_type, requires_attachment) VALUES (?, ?, ?, ?, ?)", (name, requires_balance, default_days, consumption_type, requires_attachment))
                 db.commit()
                 flash("Tipo de día libre creado.", "success")
-            except sqlite3.IntegrityError:
+            except integrity_errors():
                 flash("El nombre ya existe.", "danger")
         return redirect(url_for('hr.hr_manage_leave_types'))
         
@@ -1437,6 +1469,148 @@ def hr_delete_leave_type(type_id):
     
     return redirect(url_for('hr.hr_manage_leave_types'))
 
+@bp.route("/accrual_policies", methods=['GET', 'POST'])
+def hr_accrual_policies():
+    if not check_hr_access():
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    db = get_db()
+    if request.method == 'POST':
+        try:
+            leave_type_id = int(request.form['leave_type_id'])
+            company = request.form.get('company') or None
+            max_years = request.form.get('max_years')
+            max_years = int(max_years) if max_years else None
+            days = float(request.form['days'])
+        except (KeyError, ValueError, TypeError):
+            flash("Los años y los días deben ser números válidos.", "danger")
+            return redirect(url_for('hr.hr_accrual_policies'))
+
+        db.execute(
+            "INSERT INTO accrual_policies (leave_type_id, company, max_years, days) VALUES (?, ?, ?, ?)",
+            (leave_type_id, company, max_years, days)
+        )
+        db.commit()
+        flash("Tramo de antigüedad agregado. Previsualice el recálculo para aplicarlo a los periodos existentes.", "success")
+        return redirect(url_for('hr.hr_accrual_policies'))
+
+    policies = db.execute(
+        """
+        SELECT ap.*, lt.name as leave_name
+        FROM accrual_policies ap
+        JOIN leave_types lt ON ap.leave_type_id = lt.id
+        ORDER BY lt.name, ap.company IS NOT NULL, ap.company, ap.max_years IS NULL, ap.max_years
+        """
+    ).fetchall()
+    leave_types = refcache.leave_types()
+    companies = db.execute("SELECT DISTINCT company FROM employees WHERE company IS NOT NULL AND company != '' ORDER BY company").fetchall()
+
+    # Previsualización del recálculo (no modifica datos)
+    preview = None
+    filters = {
+        'year': request.args.get('year', ''),
+        'leave_type_id': request.args.get('leave_type_id', ''),
+        'include_adjusted': bool(request.args.get('include_adjusted'))
+    }
+    if request.args.get('preview'):
+        try:
+            year = int(filters['year']) if filters['year'] else None
+            leave_type_id = int(filters['leave_type_id']) if filters['leave_type_id'] else None
+            preview = accrual.preview_recalculation(year, leave_type_id, filters['include_adjusted'])
+        except ValueError:
+            flash("El año debe ser un número válido.", "danger")
+
+    return render_template("hr/hr_accrual_policies.html", policies=policies, leave_types=leave_types, companies=companies, preview=preview, filters=filters)
+
+@bp.route("/accrual_policies/delete/<int:policy_id>", methods=['POST'])
+def hr_delete_accrual_policy(policy_id):
+    if not check_hr_access():
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    db = get_db()
+    db.execute("DELETE FROM accrual_policies WHERE id = ?", (policy_id,))
+    db.commit()
+    flash("Tramo de antigüedad eliminado.", "success")
+    return redirect(url_for('hr.hr_accrual_policies'))
+
+@bp.route("/accrual_policies/apply", methods=['POST'])
+def hr_apply_accrual_policies():
+    if not check_hr_access():
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    try:
+        year = int(request.form['year']) if request.form.get('year') else None
+        leave_type_id = int(request.form['leave_type_id']) if request.form.get('leave_type_id') else None
+    except ValueError:
+        flash("El año debe ser un número válido.", "danger")
+        return redirect(url_for('hr.hr_accrual_policies'))
+
+    updated = accrual.apply_recalculation(year, leave_type_id, bool(request.form.get('include_adjusted')))
+    flash(f"Recálculo aplicado. Se actualizaron {updated} periodos.", "success")
+    return redirect(url_for('hr.hr_accrual_policies'))
+
+@bp.route("/coverage", methods=['GET', 'POST'])
+def hr_coverage():
+    if not check_hr_access(readonly=True):
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    db = get_db()
+    if request.method == 'POST':
+        if not check_hr_access():
+            flash("Acceso no autorizado.", "danger")
+            return redirect(url_for('hr.hr_coverage'))
+
+        department = request.form.get('department', '').strip()
+        min_present = request.form.get('min_present', '').strip()
+        if not department:
+            flash("Debe seleccionar un departamento.", "danger")
+            return redirect(url_for('hr.hr_coverage'))
+
+        if min_present:
+            try:
+                min_present = int(min_present)
+            except ValueError:
+                flash("El mínimo de personal debe ser un número entero.", "danger")
+                return redirect(url_for('hr.hr_coverage'))
+            db.execute(
+                "INSERT INTO staffing_thresholds (department, min_present) VALUES (?, ?) ON CONFLICT(department) DO UPDATE SET min_present = excluded.min_present",
+                (department, min_present)
+            )
+            flash(f"Mínimo de personal para '{department}' actualizado.", "success")
+        else:
+            db.execute("DELETE FROM staffing_thresholds WHERE department = ?", (department,))
+            flash(f"Se quitó el mínimo de personal para '{department}'.", "success")
+        db.commit()
+        return redirect(url_for('hr.hr_coverage'))
+
+    staffing = coverage.department_staffing(db)
+    return render_template("hr/hr_coverage.html", staffing=staffing, today=date.today())
+
+@bp.route("/coverage/heatmap")
+def coverage_heatmap():
+    if not check_hr_access(readonly=True) and session.get("base_role") != "Jefe":
+        return jsonify({"error": "Acceso no autorizado."}), 403
+
+    try:
+        start_date = datetime.strptime(request.args['start'], '%Y-%m-%d').date() if request.args.get('start') else date.today()
+        end_date = datetime.strptime(request.args['end'], '%Y-%m-%d').date() if request.args.get('end') else start_date + timedelta(days=30)
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido (AAAA-MM-DD)."}), 400
+    if end_date < start_date or (end_date - start_date).days >= coverage.MAX_RANGE_DAYS:
+        return jsonify({"error": f"El rango debe ser válido y de hasta {coverage.MAX_RANGE_DAYS} días."}), 400
+
+    departments = request.args.getlist('department') or None
+    db = get_db()
+    return jsonify({
+        "start": start_date.strftime('%Y-%m-%d'),
+        "end": end_date.strftime('%Y-%m-%d'),
+        "departments": coverage.heatmap(db, start_date, end_date, departments)
+    })
+
 @bp.route("/interrupt_vacation/<int:request_id>", methods=['POST'])
 def hr_interrupt_vacation(request_id):
     if not check_hr_access():
@@ -1473,47 +1647,23 @@ def hr_interrupt_vacation(request_id):
     days_used = calculate_working_days(req['start_date'], new_end_date)
     days_refund = req['days_requested'] - days_used
     
+    # Primero la solicitud: si otro usuario la modificó, no se toca el saldo
+    if not transitions.transition(db, request_id, req['version'], req['status'],
+                                  end_date=new_end_date, days_requested=days_used, interruption_reason=interruption_reason):
+        db.rollback()
+        flash(transitions.STALE_MESSAGE, "warning")
+        return redirect(url_for('hr.hr_all_requests'))
+
     if days_refund > 0:
         # Devolver días a los periodos correspondientes (LIFO)
-        remaining_refund = days_refund
-        periods = db.execute(
-            "SELECT id, days_taken FROM vacation_periods WHERE employee_id = ? AND days_taken > 0 ORDER BY year DESC", 
-            (req['employee_id'],)
-        ).fetchall()
-        
-        for period in periods:
-            if remaining_refund <= 0:
-                break
-            
-            refund_amount = min(remaining_refund, period['days_taken'])
-            db.execute("UPDATE vacation_periods SET days_taken = days_taken - ? WHERE id = ?", (refund_amount, period['id']))
-            remaining_refund -= refund_amount
+        balances.refund_days(db, req['employee_id'], days_refund)
 
-    db.execute("UPDATE vacation_requests SET end_date = ?, days_requested = ?, interruption_reason = ? WHERE id = ?", (new_end_date, days_used, interruption_reason, request_id))
     db.commit()
     flash(f"Vacación interrumpida. Fecha de fin actualizada a {new_end_date.strftime('%d/%m/%Y')}. Se devolvieron {days_refund} días al saldo.", "success")
 
     # --- NOTIFICACIÓN: Corte de Vacaciones (Interrupción) ---
     try:
-        emp_info = db.execute("SELECT email, full_name, manager_id FROM employees WHERE id = ?", (req['employee_id'],)).fetchone()
-        recipients = []
-
-        if emp_info and emp_info['email']:
-            recipients.append(emp_info['email'])
-        
-        if emp_info and emp_info['manager_id']:
-            mgr_info = db.execute("SELECT email FROM employees WHERE id = ?", (emp_info['manager_id'],)).fetchone()
-            if mgr_info and mgr_info['email']:
-                recipients.append(mgr_info['email'])
-
-        if req['replacement_name']:
-            rep_info = db.execute("SELECT email FROM employees WHERE full_name = ?", (req['replacement_name'],)).fetchone()
-            if rep_info and rep_info['email']:
-                recipients.append(rep_info['email'])
-
-        # Obtener email de RRHH (Actor) para CC
-        hr_actor_email = db.execute("SELECT email FROM employees WHERE id = ?", (session['user_id'],)).fetchone()
-        cc_list = [hr_actor_email['email']] if hr_actor_email and hr_actor_email['email'] else []
+        emp_info, recipients, cc_list = notification_contacts(db, req['employee_id'], req['replacement_employee_id'])
 
         if recipients:
             subject = "Notificación de Corte de Vacaciones"
@@ -1588,60 +1738,29 @@ def hr_modify_request_days(request_id):
             flash(f"El empleado no tiene saldo suficiente para agregar {diff} días. Saldo disponible: {total_balance}.", "danger")
             return redirect(url_for('hr.hr_all_requests'))
 
+    # Actualizar solicitud (antes que el saldo: si otro usuario la modificó, no se toca nada)
+    if not transitions.transition(db, request_id, req['version'], req['status'],
+                                  start_date=new_start_date, end_date=new_end_date, days_requested=new_days, modification_reason=reason):
+        db.rollback()
+        flash(transitions.STALE_MESSAGE, "warning")
+        return redirect(url_for('hr.hr_all_requests'))
+
+    if diff > 0:
         # Descontar saldo
-        days_to_deduct = diff
-        for period in periods:
-            if days_to_deduct <= 0: break
-            balance = period['total_days_accrued'] - period['days_taken']
-            deduct = min(days_to_deduct, balance)
-            db.execute("UPDATE vacation_periods SET days_taken = days_taken + ? WHERE id = ?", (deduct, period['id']))
-            days_to_deduct -= deduct
+        balances.deduct_days(db, req['employee_id'], diff)
 
     # Si se disminuyen los días (diff < 0), hay que devolver saldo
     elif diff < 0:
         # Devolver saldo (usando lógica LIFO para devoluciones, similar a cancelaciones)
-        days_to_refund = abs(diff)
-        periods = db.execute(
-            "SELECT id, days_taken FROM vacation_periods WHERE employee_id = ? AND days_taken > 0 ORDER BY year DESC",
-            (req['employee_id'],)
-        ).fetchall()
-        
-        for period in periods:
-            if days_to_refund <= 0: break
-            refund = min(days_to_refund, period['days_taken'])
-            db.execute("UPDATE vacation_periods SET days_taken = days_taken - ? WHERE id = ?", (refund, period['id']))
-            days_to_refund -= refund
-
-    # Actualizar solicitud
-    db.execute(
-        "UPDATE vacation_requests SET start_date = ?, end_date = ?, days_requested = ?, modification_reason = ? WHERE id = ?",
-        (new_start_date, new_end_date, new_days, reason, request_id)
-    )
+        balances.refund_days(db, req['employee_id'], abs(diff))
+
     db.commit()
     
     flash(f"Solicitud modificada exitosamente. Nuevas fechas: {new_start_date.strftime('%d/%m/%Y')} - {new_end_date.strftime('%d/%m/%Y')} ({new_days} días).", "success")
 
     # --- NOTIFICACIÓN: Reajuste de Días (Modificación) ---
     try:
-        emp_info = db.execute("SELECT email, full_name, manager_id FROM employees WHERE id = ?", (req['employee_id'],)).fetchone()
-        recipients = []
-
-        if emp_info and emp_info['email']:
-            recipients.append(emp_info['email'])
-        
-        if emp_info and emp_info['manager_id']:
-            mgr_info = db.execute("SELECT email FROM employees WHERE id = ?", (emp_info['manager_id'],)).fetchone()
-            if mgr_info and mgr_info['email']:
-                recipients.append(mgr_info['email'])
-
-        if req['replacement_name']:
-            rep_info = db.execute("SELECT email FROM employees WHERE full_name = ?", (req['replacement_name'],)).fetchone()
-            if rep_info and rep_info['email']:
-                recipients.append(rep_info['email'])
-
-        # Obtener email de RRHH (Actor) para CC
-        hr_actor_email = db.execute("SELECT email FROM employees WHERE id = ?", (session['user_id'],)).fetchone()
-        cc_list = [hr_actor_email['email']] if hr_actor_email and hr_actor_email['email'] else []
+        emp_info, recipients, cc_list = notification_contacts(db, req['employee_id'], req['replacement_employee_id'])
 
         if recipients:
             subject = "Notificación de Reajuste de Días de Vacaciones"
@@ -1650,4 +1769,30 @@ def hr_modify_request_days(request_id):
     except Exception as e:
         print(f"Error enviando email de modificación: {e}")
 
-    return redirect(url_for('hr.hr_all_requests'))
\ No newline at end of file
+    return redirect(url_for('hr.hr_all_requests'))
+
+@bp.route('/profiles', methods=['GET', 'POST'])
+def hr_profiles():
+    if not check_hr_access():
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    if request.method == 'POST':
+        removed = profiling.delete_profiles()
+        flash(f"Se eliminaron {removed} perfiles.", "info")
+        return redirect(url_for('hr.hr_profiles'))
+
+    return render_template(
+        "hr/hr_profiles.html",
+        profiles=profiling.list_profiles(),
+        enabled=current_app.config.get('PROFILING'),
+        sample_rate=current_app.config.get('PROFILE_SAMPLE_RATE', 0)
+    )
+
+@bp.route('/profiles/<name>')
+def hr_download_profile(name):
+    if not check_hr_access():
+        flash("Acceso no autorizado.", "danger")
+        return redirect(url_for("main.dashboard"))
+
+    return send_from_directory(profiling.profile_folder(), name + '.prof', as_attachment=True)
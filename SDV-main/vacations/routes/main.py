@@ -2,7 +2,8 @@
 from flask import Blueprint, render_template, session, redirect, url_for, json
 from datetime import datetime, date, timedelta
 from ..db import get_db
-from ..utils import get_paraguay_holidays
+from .. import refcache
+from ..utils import get_paraguay_holidays, refresh_request_statuses
 
 bp = Blueprint('main', __name__)
 
@@ -30,23 +31,12 @@ def dashboard():
     db = get_db()
 
     # Actualizar estados de solicitudes
-    today = date.today()
-    # 1. Aprobado por RRHH -> Activo (si ya llegó la fecha de inicio)
-    db.execute(
-        "UPDATE vacation_requests SET status = 'Activo' WHERE status = 'Aprobado por RRHH' AND start_date <= ? AND end_date >= ?",
-        (today, today)
-    )
-    # 2. Activo/Aprobado -> Finalizado (si ya pasó la fecha de fin)
-    db.execute(
-        "UPDATE vacation_requests SET status = 'Finalizado' WHERE (status = 'Aprobado por RRHH' OR status = 'Activo') AND end_date < ?",
-        (today,)
-    )
-    db.commit()
+    refresh_request_statuses()
 
     approved_requests = db.execute(
         """
         SELECT e.full_name, vr.start_date, vr.end_date, lt.name as type_name
-        FROM vacation_requests vr
+        FROM vacation_requests_all vr
         JOIN employees e ON vr.employee_id = e.id
         LEFT JOIN leave_types lt ON vr.leave_type_id = lt.id
         WHERE vr.status IN ('Aprobado por RRHH', 'Activo', 'Finalizado')
@@ -63,11 +53,10 @@ def dashboard():
         })
 
     # Agregar Sábados LIBRES al calendario del dashboard
-    saturdays = db.execute("SELECT effective_date FROM saturday_config WHERE is_working = 0").fetchall()
-    for sat in saturdays:
+    for saturday in refcache.saturdays(is_working=False):
         calendar_events.append({
             'title': 'Sábado Libre',
-            'start': sat['effective_date'].strftime('%Y-%m-%d'),
+            'start': saturday.strftime('%Y-%m-%d'),
             'allDay': True,
             'display': 'background',
             'backgroundColor': '#ffc107'
@@ -103,7 +92,7 @@ def dashboard():
         requests_raw = db.execute(
             """
             SELECT vr.*, lt.name as leave_name 
-            FROM vacation_requests vr 
+            FROM vacation_requests_all vr 
             LEFT JOIN leave_types lt ON vr.leave_type_id = lt.id
             WHERE employee_id = ? 
             ORDER BY request_date DESC
@@ -140,7 +129,7 @@ def dashboard():
 
             requests_processed.append(req_dict)
         
-        return render_template(template_name, user=user_info, periods=periods, requests=requests_processed, pending_days=pending_days, is_also_manager=is_also_manager, calendar_events=json.dumps(calendar_events))
+        return render_template(template_name, user=user_info, periods=periods, requests=requests_processed, pending_days=pending_days, is_also_manager=is_also_manager, calendar_events=json.dumps(calendar_events), now=datetime.now)
 
     # Lógica específica para el Dashboard de RRHH (KPIs)
     if session.get("base_role") in ["RRHH", "Asistente RRHH"]:
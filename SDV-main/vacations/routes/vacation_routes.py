@@ -1,12 +1,35 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, current_app, send_from_directory
+from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
 from datetime import datetime, date, timedelta
-from werkzeug.utils import secure_filename
-import os
 from ..db import get_db
+from .. import intervals, coverage, attachments, transitions, refcache
 from ..utils import calculate_working_days, send_email, get_paraguay_holidays
+from ..writer import run_write, execute_write
 
 bp = Blueprint('vacation_routes', __name__, url_prefix='/vacations')
 
+def _replacement_candidates_query(employee_id, current_role):
+    """
+    Construye la consulta de reemplazos habilitados según reglas de negocio.
+    Se une con la tabla roles para filtrar por el nivel (base_role).
+    """
+    rep_query = """
+        SELECT e.id, e.full_name 
+        FROM employees e 
+        JOIN roles r ON e.role = r.name 
+        WHERE e.is_active = 1 AND e.id != ?
+    """
+    rep_params = [employee_id]
+
+    if current_role == 'Jefe':
+        rep_query += " AND r.base_role = 'Jefe'"
+    elif current_role in ['RRHH', 'Asistente RRHH']:
+        rep_query += " AND r.base_role IN ('RRHH', 'Asistente RRHH')"
+    else:
+        # Empleados (y otros roles) solo pueden seleccionar pares del mismo rol
+        rep_query += " AND r.base_role = ?"
+        rep_params.append(current_role)
+    return rep_query, rep_params
+
 @bp.route('/new', methods=('GET', 'POST'))
 def new():
     if "user_id" not in session:
@@ -42,98 +65,18 @@ def new():
 
     # Usar base_role de la sesión para la lógica de permisos
     current_role = session.get("base_role")
-
-    # Construir consulta de reemplazos según reglas de negocio
-    # Se une con la tabla roles para filtrar por el nivel (base_role)
-    rep_query = """
-        SELECT e.full_name 
-        FROM employees e 
-        JOIN roles r ON e.role = r.name 
-        WHERE e.is_active = 1 AND e.id != ?
-    """
-    rep_params = [employee_id]
-
-    if current_role == 'Jefe':
-        rep_query += " AND r.base_role = 'Jefe'"
-    elif current_role in ['RRHH', 'Asistente RRHH']:
-        rep_query += " AND r.base_role IN ('RRHH', 'Asistente RRHH')"
-    else:
-        # Empleados (y otros roles) solo pueden seleccionar pares del mismo rol
-        rep_query += " AND r.base_role = ?"
-        rep_params.append(current_role)
-    
-    rep_query += " ORDER BY full_name"
-    employees = db.execute(rep_query, rep_params).fetchall()
-
-    # Obtener feriados y sábados laborales para el cálculo en el frontend
-    holidays_dict = get_paraguay_holidays()
-    holidays_list = [d.strftime('%d/%m/%Y') for d in holidays_dict.keys()]
-    
-    working_saturdays_rows = db.execute("SELECT effective_date FROM saturday_config WHERE is_working = 1").fetchall()
-    working_saturdays = [row['effective_date'].strftime('%d/%m/%Y') for row in working_saturdays_rows]
-
-    # Obtener feriados recurrentes (MM-DD) para cálculo en frontend (cualquier año)
-    recurring_holidays_rows = db.execute("SELECT holiday_date FROM custom_holidays WHERE is_recurring = 1").fetchall()
-    recurring_holidays = [row['holiday_date'].strftime('%d/%m') for row in recurring_holidays_rows]
-
-    # Obtener rangos de vacaciones existentes del usuario actual (para validación visual)
-    existing_requests = db.execute("""
-        SELECT start_date, end_date 
-        FROM vacation_requests 
-        WHERE employee_id = ? AND status IN ('Pendiente', 'Aprobado por Jefe', 'Aprobado por RRHH', 'Activo')
-    """, (employee_id,)).fetchall()
-    
-    existing_ranges = []
-    for req in existing_requests:
-        existing_ranges.append({'start': req['start_date'].strftime('%d/%m/%Y'), 'end': req['end_date'].strftime('%d/%m/%Y')})
-
-    # Obtener vacaciones de todos los empleados para validación de reemplazo (Client-side)
-    all_vacations_rows = db.execute("""
-        SELECT e.full_name, vr.start_date, vr.end_date
-        FROM vacation_requests vr
-        JOIN employees e ON vr.employee_id = e.id
-        WHERE vr.status IN ('Aprobado por RRHH', 'Activo')
-    """).fetchall()
-    
-    employee_vacations = {}
-    for row in all_vacations_rows:
-        name = row['full_name']
-        if name not in employee_vacations:
-            employee_vacations[name] = []
-        employee_vacations[name].append({
-            'start': row['start_date'].strftime('%d/%m/%Y'),
-            'end': row['end_date'].strftime('%d/%m/%Y')
-        })
-
-    # Obtener compromisos donde el usuario actual es reemplazo
-    current_user_name = session.get("full_name")
-    if not current_user_name:
-        curr_emp = db.execute("SELECT full_name FROM employees WHERE id = ?", (employee_id,)).fetchone()
-        current_user_name = curr_emp['full_name']
-
-    my_commitments_rows = db.execute("""
-        SELECT start_date, end_date
-        FROM vacation_requests
-        WHERE replacement_name = ? AND status IN ('Aprobado por RRHH', 'Activo')
-    """, (current_user_name,)).fetchall()
-    
-    my_commitments = []
-    for row in my_commitments_rows:
-        my_commitments.append({
-            'start': row['start_date'].strftime('%d/%m/%Y'),
-            'end': row['end_date'].strftime('%d/%m/%Y')
-        })
+    rep_query, rep_params = _replacement_candidates_query(employee_id, current_role)
 
     if request.method == "POST":
         request_type = request.form["request_type"]
         leave_type_id = request.form.get("leave_type_id")
         start_date_str = request.form.get("start_date")
-        replacement_name = request.form.get("replacement_name")
+        replacement_employee_id = request.form.get("replacement_employee_id", type=int)
         start_time = request.form.get("start_time")
         end_time = request.form.get("end_time")
 
         # Obtener configuración del tipo de licencia seleccionado
-        selected_leave = db.execute("SELECT * FROM leave_types WHERE id = ?", (leave_type_id,)).fetchone()
+        selected_leave = refcache.leave_type(leave_type_id)
         if not selected_leave:
             flash("Tipo de licencia inválido.", "danger")
             return redirect(url_for("vacation_routes.new"))
@@ -193,7 +136,7 @@ def new():
             return redirect(url_for("vacation_routes.new"))
 
         # Verificar si requiere saldo
-        selected_leave = db.execute("SELECT requires_balance FROM leave_types WHERE id = ?", (leave_type_id,)).fetchone()
+        selected_leave = refcache.leave_type(leave_type_id)
         requires_balance = selected_leave['requires_balance'] if selected_leave else 1
 
         if requires_balance:
@@ -202,29 +145,25 @@ def new():
                 flash(f"No tienes suficientes días disponibles para esta licencia. Saldo: {current_balance}, Solicitados: {days_requested}", "danger")
                 return redirect(url_for("vacation_routes.new"))
 
+        # Validación: El reemplazo debe ser uno de los compañeros habilitados
+        replacement = db.execute(rep_query + " AND e.id = ?", rep_params + [replacement_employee_id]).fetchone()
+        if not replacement:
+            flash("Debes seleccionar un reemplazo válido.", "danger")
+            return redirect(url_for("vacation_routes.new"))
+        replacement_name = replacement['full_name']
+
+        # Validación: Verificar que no se superponga con otra solicitud propia vigente
+        if intervals.is_employee_busy(db, employee_id, start_date, end_date, intervals.OPEN_STATUSES):
+            flash("El rango seleccionado coincide con vacaciones ya solicitadas o aprobadas.", "danger")
+            return redirect(url_for("vacation_routes.new"))
+
         # Validación: Verificar si el usuario actual es reemplazo de alguien en esas fechas
-        overlap_commitment = db.execute("""
-            SELECT id FROM vacation_requests
-            WHERE replacement_name = ? 
-            AND status IN ('Aprobado por RRHH', 'Activo')
-            AND start_date <= ? AND end_date >= ?
-        """, (current_user_name, end_date, start_date)).fetchone()
-        
-        if overlap_commitment:
+        if intervals.replacement_commitments(db, employee_id, start_date, end_date):
             flash("No puedes solicitar vacaciones en estas fechas porque eres el reemplazo asignado de otro empleado.", "danger")
             return redirect(url_for("vacation_routes.new"))
 
         # Validación: Verificar si el reemplazo seleccionado está de vacaciones
-        overlap_replacement_vacation = db.execute("""
-            SELECT vr.id 
-            FROM vacation_requests vr
-            JOIN employees e ON vr.employee_id = e.id
-            WHERE e.full_name = ?
-            AND vr.status IN ('Aprobado por RRHH', 'Activo')
-            AND vr.start_date <= ? AND vr.end_date >= ?
-        """, (replacement_name, end_date, start_date)).fetchone()
-
-        if overlap_replacement_vacation:
+        if intervals.is_employee_busy(db, replacement_employee_id, start_date, end_date):
             flash(f"El empleado {replacement_name} está de vacaciones en el rango seleccionado y no puede ser tu reemplazo.", "danger")
             return redirect(url_for("vacation_routes.new"))
 
@@ -241,18 +180,19 @@ def new():
                 return redirect(url_for("vacation_routes.new"))
             
             if file:
-                filename = secure_filename(f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{file.filename}")
-                file.save(os.path.join(current_app.config['UPLOAD_FOLDER'], filename))
-                attachment_path = filename
+                try:
+                    attachment_path = attachments.save_upload(file)
+                except attachments.AttachmentTooLarge as e:
+                    flash(str(e), "danger")
+                    return redirect(url_for("vacation_routes.new"))
 
-        db.execute(
+        execute_write(
             """
-            INSERT INTO vacation_requests (employee_id, leave_type_id, start_date, end_date, start_time, end_time, request_type, days_requested, replacement_name, attachment_path)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO vacation_requests (employee_id, leave_type_id, start_date, end_date, start_time, end_time, request_type, days_requested, replacement_name, replacement_employee_id, attachment_path)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """,
-            (employee_id, leave_type_id, start_date, end_date, start_time, end_time, request_type, days_requested, replacement_name, attachment_path)
+            (employee_id, leave_type_id, start_date, end_date, start_time, end_time, request_type, days_requested, replacement_name, replacement_employee_id, attachment_path)
         )
-        db.commit()
 
         # --- NOTIFICACIÓN: Al Jefe Directo ---
         try:
@@ -274,6 +214,44 @@ def new():
         flash("Tu solicitud de vacaciones ha sido enviada correctamente.", "success")
         return redirect(url_for("main.dashboard"))
 
+    # Datos que solo se necesitan para dibujar el formulario. La disponibilidad de cada
+    # reemplazo se consulta bajo demanda (vacation_routes.availability).
+    employees = db.execute(rep_query + " ORDER BY full_name", rep_params).fetchall()
+
+    # Obtener feriados y sábados laborales para el cálculo en el frontend
+    holidays_dict = get_paraguay_holidays()
+    holidays_list = [d.strftime('%d/%m/%Y') for d in holidays_dict.keys()]
+    
+    working_saturdays = [day.strftime('%d/%m/%Y') for day in refcache.saturdays(is_working=True)]
+
+    # Obtener feriados recurrentes (MM-DD) para cálculo en frontend (cualquier año)
+    recurring_holidays = [h['holiday_date'].strftime('%d/%m') for h in refcache.custom_holidays() if h['is_recurring']]
+
+    # Obtener rangos de vacaciones existentes del usuario actual (para validación visual)
+    existing_requests = db.execute("""
+        SELECT start_date, end_date 
+        FROM vacation_requests 
+        WHERE employee_id = ? AND status IN ('Pendiente', 'Aprobado por Jefe', 'Aprobado por RRHH', 'Activo')
+    """, (employee_id,)).fetchall()
+    
+    existing_ranges = []
+    for req in existing_requests:
+        existing_ranges.append({'start': req['start_date'].strftime('%d/%m/%Y'), 'end': req['end_date'].strftime('%d/%m/%Y')})
+
+    # Obtener compromisos donde el usuario actual es reemplazo
+    my_commitments_rows = db.execute("""
+        SELECT start_date, end_date
+        FROM vacation_requests
+        WHERE replacement_employee_id = ? AND status IN ('Aprobado por RRHH', 'Activo')
+    """, (employee_id,)).fetchall()
+    
+    my_commitments = []
+    for row in my_commitments_rows:
+        my_commitments.append({
+            'start': row['start_date'].strftime('%d/%m/%Y'),
+            'end': row['end_date'].strftime('%d/%m/%Y')
+        })
+
     return render_template("requests/new_request_form.html", 
                            total_balance=total_balance,
                            balances_map=balances_map,
@@ -281,11 +259,36 @@ def new():
                            employees=employees,
                            holidays_list=holidays_list,
                            working_saturdays=working_saturdays,
-                           employee_vacations=employee_vacations,
                            my_commitments=my_commitments,
                            existing_ranges=existing_ranges,
                            recurring_holidays=recurring_holidays)
 
+@bp.route('/availability')
+def availability():
+    """
+    Devuelve en JSON los intervalos ocupados (vacaciones aprobadas o activas) de un
+    empleado dentro del rango indicado. Lo usa el formulario de solicitud para validar
+    el reemplazo elegido sin cargar las vacaciones de toda la empresa.
+    """
+    if "user_id" not in session:
+        return jsonify({"error": "Unauthorized"}), 401
+
+    employee_id = request.args.get('employee_id', type=int)
+    try:
+        start_date = datetime.strptime(request.args.get('start', ''), "%d/%m/%Y").date()
+        end_date = datetime.strptime(request.args.get('end', ''), "%d/%m/%Y").date()
+    except ValueError:
+        return jsonify({"error": "Formato de fecha inválido. Use DD/MM/YYYY."}), 400
+
+    if not employee_id or end_date < start_date:
+        return jsonify({"error": "Parámetros inválidos."}), 400
+
+    db = get_db()
+    rows = intervals.employee_absences(db, employee_id, start_date, end_date)
+
+    busy = [{'start': row['start_date'].strftime('%d/%m/%Y'), 'end': row['end_date'].strftime('%d/%m/%Y')} for row in rows]
+    return jsonify({"employee_id": employee_id, "busy": busy, "is_busy": bool(busy)})
+
 @bp.route("/manage")
 def manage():
     if session.get("base_role") not in ["Jefe", "RRHH", "Asistente RRHH"]:
@@ -298,16 +301,19 @@ def manage():
     # Mostrar pendientes de aprobación Y pendientes de anulación por jefe
     team_requests = db.execute(
         """
-        SELECT vr.id, vr.start_date, vr.end_date, vr.days_requested, vr.status, vr.request_type, vr.start_time, vr.replacement_name, e.full_name
+        SELECT vr.id, vr.start_date, vr.end_date, vr.days_requested, vr.status, vr.request_type, vr.start_time, COALESCE(rep.full_name, vr.replacement_name) as replacement_name, e.full_name, e.department
         FROM vacation_requests vr
         JOIN employees e ON vr.employee_id = e.id
+        LEFT JOIN employees rep ON vr.replacement_employee_id = rep.id
         WHERE e.manager_id = ? AND (vr.status = 'Pendiente' OR vr.status = 'Anulación Pendiente Jefe')
         ORDER BY vr.request_date
         """,
         (manager_id,)
     ).fetchall()
+    # Cobertura del departamento si se aprueban (las anulaciones ya están contadas)
+    staffing = coverage.request_coverage(db, [r for r in team_requests if r['status'] == 'Pendiente'])
     
-    return render_template("requests/manage_requests.html", requests=team_requests)
+    return render_template("requests/manage_requests.html", requests=team_requests, coverage=staffing)
 
 @bp.route('/approve/<int:request_id>', methods=('POST',))
 def approve(request_id):
@@ -319,7 +325,7 @@ def approve(request_id):
     db = get_db()
     
     request_to_approve = db.execute(
-        "SELECT id, hr_approval_date FROM vacation_requests WHERE id = ? AND employee_id IN (SELECT id FROM employees WHERE manager_id = ?)",
+        "SELECT id, hr_approval_date, version FROM vacation_requests WHERE id = ? AND status = 'Pendiente' AND employee_id IN (SELECT id FROM employees WHERE manager_id = ?)",
         (request_id, manager_id)
     ).fetchone()
 
@@ -332,11 +338,11 @@ def approve(request_id):
             new_status = 'Aprobado por Jefe'
             flash_message = "Solicitud aprobada. Pasa a RRHH para la aprobación final."
 
-        db.execute(
-            "UPDATE vacation_requests SET status = ?, manager_approval_date = ? WHERE id = ?",
-            (new_status, datetime.now(), request_id)
-        )
-        db.commit()
+        if not run_write(lambda conn: transitions.transition(
+                conn, request_id, request_to_approve['version'], 'Pendiente', new_status,
+                manager_approval_date=datetime.now())):
+            flash(transitions.STALE_MESSAGE, "warning")
+            return redirect(url_for("vacation_routes.manage"))
 
         # --- NOTIFICACIÓN: A RRHH y Empleado (Actor: Jefe en CC) ---
         try:
@@ -383,13 +389,15 @@ def reject(request_id):
     db = get_db()
 
     request_to_reject = db.execute(
-        "SELECT id FROM vacation_requests WHERE id = ? AND employee_id IN (SELECT id FROM employees WHERE manager_id = ?)",
+        "SELECT id, version FROM vacation_requests WHERE id = ? AND status = 'Pendiente' AND employee_id IN (SELECT id FROM employees WHERE manager_id = ?)",
         (request_id, manager_id)
     ).fetchone()
 
     if request_to_reject:
-        db.execute("UPDATE vacation_requests SET status = 'Rechazado' WHERE id = ?", (request_id,))
-        db.commit()
+        if not run_write(lambda conn: transitions.transition(
+                conn, request_id, request_to_reject['version'], 'Pendiente', 'Rechazado')):
+            flash(transitions.STALE_MESSAGE, "warning")
+            return redirect(url_for("vacation_routes.manage"))
 
         # --- NOTIFICACIÓN: Al Empleado ---
         try:
@@ -416,7 +424,7 @@ def reject(request_id):
 def request_cancellation(request_id):
     db = get_db()
     req = db.execute(
-        'SELECT id FROM vacation_requests WHERE id = ? AND employee_id = ? AND status = ?',
+        'SELECT id, version FROM vacation_requests WHERE id = ? AND employee_id = ? AND status = ?',
         (request_id, session['user_id'], 'Aprobado por RRHH')
     ).fetchone()
 
@@ -426,11 +434,11 @@ def request_cancellation(request_id):
         return redirect(url_for('main.dashboard'))
 
     if req:
-        db.execute(
-            "UPDATE vacation_requests SET status = 'Anulación Pendiente Jefe', cancellation_reason = ? WHERE id = ?",
-            (reason, request_id)
-        )
-        db.commit()
+        if not run_write(lambda conn: transitions.transition(
+                conn, request_id, req['version'], 'Aprobado por RRHH', 'Anulación Pendiente Jefe',
+                cancellation_reason=reason)):
+            flash(transitions.STALE_MESSAGE, 'warning')
+            return redirect(url_for('main.dashboard'))
 
         # --- NOTIFICACIÓN: Al Jefe Directo (Solicitud de Anulación) ---
         try:
@@ -462,16 +470,15 @@ def approve_cancellation_manager(request_id):
     db = get_db()
     
     req = db.execute(
-        "SELECT id FROM vacation_requests WHERE id = ? AND employee_id IN (SELECT id FROM employees WHERE manager_id = ?) AND status = 'Anulación Pendiente Jefe'",
+        "SELECT id, version FROM vacation_requests WHERE id = ? AND employee_id IN (SELECT id FROM employees WHERE manager_id = ?) AND status = 'Anulación Pendiente Jefe'",
         (request_id, manager_id)
     ).fetchone()
 
     if req:
-        db.execute(
-            "UPDATE vacation_requests SET status = 'Anulación Pendiente RRHH' WHERE id = ?",
-            (request_id,)
-        )
-        db.commit()
+        if not run_write(lambda conn: transitions.transition(
+                conn, request_id, req['version'], 'Anulación Pendiente Jefe', 'Anulación Pendiente RRHH')):
+            flash(transitions.STALE_MESSAGE, "warning")
+            return redirect(url_for("vacation_routes.manage"))
 
         # --- NOTIFICACIÓN: A RRHH (Anulación aprobada por Jefe) ---
         try:
@@ -504,13 +511,13 @@ def print_request(request_id):
         return redirect(url_for("auth.login"))
     db = get_db()
     req = db.execute(
-        "SELECT vr.*, e.full_name, e.department, e.job_title FROM vacation_requests vr JOIN employees e ON vr.employee_id = e.id WHERE vr.id = ?", 
+        "SELECT vr.*, e.full_name, e.department, e.job_title FROM vacation_requests_all vr JOIN employees e ON vr.employee_id = e.id WHERE vr.id = ?", 
         (request_id,)
     ).fetchone()
     return render_template("requests/print_request.html", req=req, now=datetime.now())
 
-@bp.route('/uploads/<filename>')
+@bp.route('/uploads/<path:filename>')
 def download_attachment(filename):
     if "user_id" not in session:
         return redirect(url_for("auth.login"))
-    return send_from_directory(current_app.config['UPLOAD_FOLDER'], filename)
\ No newline at end of file
+    return attachments.send_attachment(filename)
\ No newline at end of file
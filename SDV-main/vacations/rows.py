@@ -0,0 +1,168 @@
+# vacations/rows.py
+# Filas livianas para listados y exportaciones grandes.
+#
+# get_db() usa sqlite3.Row con PARSE_DECLTYPES: cada columna DATE/TIMESTAMP de cada fila
+# se convierte con fromisoformat al leerla, aunque la página no la muestre. get_lazy_db()
+# abre (una vez por petición) una conexión de lectura sin conversiones que devuelve
+# LazyRow: la tupla cruda de sqlite3 con una clase por forma de consulta (mapa de
+# columnas compartido). Las fechas se convierten recién al accederlas, en cada acceso.
+#
+# El tipo de cada columna se toma del esquema (PRAGMA table_info) por nombre. Para alias
+# o expresiones se indica en la consulta: execute(sql, params, types={'inicio': 'date'}).
+# En PostgreSQL psycopg2 ya convierte en C: get_lazy_db() usa la conexión de get_db().
+
+from datetime import date, datetime
+from functools import lru_cache
+
+from flask import g
+
+from .db import get_backend, get_db
+from . import querylog
+
+CONVERTERS = {'date': date.fromisoformat, 'timestamp': datetime.fromisoformat}
+
+# Convertidor por nombre de columna, por base de datos (se lee una vez por proceso)
+_schema_converters = {}
+
+def schema_converters(conn, database):
+    """Convertidor de cada nombre de columna DATE/TIMESTAMP del esquema (los ambiguos se omiten)."""
+    if database not in _schema_converters:
+        found = {}
+        tables = [row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'").fetchall()]
+        for table in tables:
+            for column in conn.execute(f'PRAGMA table_info("{table}")').fetchall():
+                decltype = (column[2] or '').split('(')[0].strip().lower()
+                found.setdefault(column[1], set()).add(CONVERTERS.get(decltype))
+        _schema_converters[database] = {
+            name: converters.pop() for name, converters in found.items()
+            if len(converters) == 1 and None not in converters
+        }
+    return _schema_converters[database]
+
+_tuple_item = tuple.__getitem__
+
+def _plain_getter(index):
+    return lambda row: _tuple_item(row, index)
+
+def _date_getter(index, convert):
+    def get(row):
+        value = _tuple_item(row, index)
+        return convert(value) if value.__class__ is str else value
+    return get
+
+class LazyRow(tuple):
+    """
+    Fila con acceso por nombre e índice como sqlite3.Row, respaldada por la tupla cruda.
+    Cada forma de consulta tiene su subclase (ver _row_class) con el mapa de columnas.
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _index = {}
+    _converters = ()
+
+    def __getitem__(self, key):
+        try:
+            index = self._index[key]  # nombres y posiciones (también negativas)
+        except KeyError:
+            index = self._index.get(key.lower()) if isinstance(key, str) else None
+            if index is None:
+                raise IndexError("No item with that key") from None
+        except TypeError:
+            return tuple(self[i] for i in range(*key.indices(len(self))))
+        value = _tuple_item(self, index)
+        convert = self._converters[index]
+        if convert is None or value.__class__ is not str:
+            return value
+        return convert(value)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def keys(self):
+        return list(self._fields)
+
+    def __repr__(self):
+        return f"<LazyRow {dict(zip(self._fields, tuple.__iter__(self)))!r}>"
+
+@lru_cache(maxsize=256)
+def _row_class(names, by_name, types):
+    """Subclase de LazyRow para una forma de consulta (nombres de columnas y sus tipos)."""
+    by_name = dict(by_name)
+    by_name.update((name, CONVERTERS[kind]) for name, kind in types)
+    converters = tuple(by_name.get(name) for name in names)
+
+    index = {}
+    namespace = {'__slots__': (), '_fields': names, '_converters': converters, '_index': index}
+    for i, (name, convert) in enumerate(zip(names, converters)):
+        index[i] = index[i - len(names)] = i
+        # Como sqlite3.Row: sin distinguir mayúsculas y gana la primera columna repetida
+        index.setdefault(name, i)
+        index.setdefault(name.lower(), i)
+        # Atributos para Jinja ({{ req.start_date }}): evitan el AttributeError previo a row['...']
+        if name.isidentifier() and not name.startswith('_') and name not in namespace and not hasattr(LazyRow, name):
+            namespace[name] = property(_plain_getter(i) if convert is None else _date_getter(i, convert))
+    return type('LazyRow', (LazyRow,), namespace)
+
+class LazyCursor:
+    """Cursor que arma las filas con la subclase de LazyRow de la consulta (calculada una vez)."""
+
+    def __init__(self, cursor, converters, types):
+        self._cursor = cursor
+        self._row = None
+        if cursor.description is not None:
+            names = tuple(column[0] for column in cursor.description)
+            by_name = tuple((name, converters[name]) for name in names if name in converters)
+            self._row = _row_class(names, by_name, tuple(sorted((types or {}).items())))
+
+    def fetchone(self):
+        values = self._cursor.fetchone()
+        return None if values is None else self._row(values)
+
+    def fetchall(self):
+        return list(map(self._row, self._cursor.fetchall()))
+
+    def fetchmany(self, size=None):
+        return list(map(self._row, self._cursor.fetchmany(*((size,) if size else ()))))
+
+    def __iter__(self):
+        return map(self._row, self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+class LazyConnection:
+    """Conexión de solo lectura cuyo execute() acepta types={'columna': 'date'|'timestamp'}."""
+
+    def __init__(self, conn, converters=None):
+        self.conn = conn
+        self.converters = converters
+
+    def execute(self, sql, params=(), types=None):
+        cursor = self.conn.execute(sql, params)
+        if self.converters is None:
+            return cursor  # PostgreSQL: las filas de get_db() ya vienen convertidas
+        return LazyCursor(cursor, self.converters, types)
+
+def get_lazy_db():
+    """Conexión para listados y exportaciones grandes (ver el encabezado del módulo)."""
+    if 'lazy_db' not in g:
+        backend = get_backend()
+        connect = getattr(backend, 'connect_lazy', None)
+        if connect is None:
+            g.lazy_db = LazyConnection(get_db())
+        else:
+            conn = connect()
+            g.lazy_db = LazyConnection(
+                querylog.wrap(conn, querylog.current_log()), schema_converters(conn, backend.database)
+            )
+    return g.lazy_db
+
+def close_lazy_db(e=None):
+    lazy_db = g.pop('lazy_db', None)
+    if lazy_db is not None and lazy_db.converters is not None:
+        querylog.unwrap(lazy_db.conn).close()
+
+def init_app(app):
+    app.teardown_appcontext(close_lazy_db)
@@ -0,0 +1,256 @@
+-- vacations/schema_postgres.sql
+-- Esquema para PostgreSQL (DATABASE_URL). Equivalente al que crea setup_sqlite_schema:
+-- los booleanos se guardan como INTEGER (el SQL compartido compara con 1/0) y los
+-- REAL como DOUBLE PRECISION. Se aplica al arrancar si cambió (ver db.setup_postgres_schema);
+-- todo es idempotente.
+
+-- Funciones de fecha de SQLite usadas por el SQL compartido ---------------------------
+
+CREATE OR REPLACE FUNCTION strftime(fmt TEXT, value TIMESTAMP) RETURNS TEXT AS $$
+    SELECT to_char(value, replace(replace(replace(replace(replace(replace(fmt,
+        '%Y', 'YYYY'), '%m', 'MM'), '%d', 'DD'), '%H', 'HH24'), '%M', 'MI'), '%S', 'SS'))
+$$ LANGUAGE sql IMMUTABLE;
+
+CREATE OR REPLACE FUNCTION julianday(value DATE) RETURNS DOUBLE PRECISION AS $$
+    SELECT CAST((value - DATE '2000-01-01') AS DOUBLE PRECISION) + 2451544.5
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Tablas ------------------------------------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS employees (
+    id SERIAL PRIMARY KEY, username TEXT UNIQUE NOT NULL, password TEXT NOT NULL,
+    full_name TEXT NOT NULL, email TEXT, hire_date DATE NOT NULL,
+    role TEXT NOT NULL,
+    manager_id INTEGER, department TEXT, job_title TEXT, company TEXT,
+    is_active INTEGER DEFAULT 1, is_ad_managed INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS leave_types (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    requires_balance INTEGER DEFAULT 1,
+    default_days INTEGER DEFAULT 0,
+    consumption_type TEXT DEFAULT 'Flexible', -- 'Flexible' (Hábiles) o 'Fixed' (Corridos)
+    requires_attachment INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS vacation_periods (
+    id SERIAL PRIMARY KEY, employee_id INTEGER NOT NULL, year INTEGER NOT NULL,
+    leave_type_id INTEGER NOT NULL,
+    total_days_accrued DOUBLE PRECISION NOT NULL, days_taken DOUBLE PRECISION DEFAULT 0.0,
+    adjustment_comment TEXT,
+    leave_name TEXT,
+    UNIQUE(employee_id, year, leave_type_id)
+);
+
+CREATE TABLE IF NOT EXISTS saturday_config (
+    id SERIAL PRIMARY KEY,
+    effective_date DATE NOT NULL,
+    is_working INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS vacation_requests (
+    id SERIAL PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    request_type TEXT NOT NULL,
+    leave_type_id INTEGER,
+    days_requested DOUBLE PRECISION NOT NULL,
+    replacement_name TEXT,
+    replacement_employee_id INTEGER,
+    status TEXT NOT NULL DEFAULT 'Pendiente',
+    cancellation_reason TEXT,
+    interruption_reason TEXT,
+    modification_reason TEXT,
+    attachment_path TEXT,
+    request_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    manager_approval_date TIMESTAMP,
+    hr_approval_date TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 0
+);
+
+-- Solicitudes cerradas archivadas (ver archive.py)
+CREATE TABLE IF NOT EXISTS vacation_requests_archive (
+    id INTEGER PRIMARY KEY,
+    employee_id INTEGER NOT NULL,
+    start_date DATE NOT NULL,
+    end_date DATE NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    request_type TEXT NOT NULL,
+    leave_type_id INTEGER,
+    days_requested DOUBLE PRECISION NOT NULL,
+    replacement_name TEXT,
+    replacement_employee_id INTEGER,
+    status TEXT NOT NULL,
+    cancellation_reason TEXT,
+    interruption_reason TEXT,
+    modification_reason TEXT,
+    attachment_path TEXT,
+    request_date TIMESTAMP,
+    manager_approval_date TIMESTAMP,
+    hr_approval_date TIMESTAMP,
+    version INTEGER NOT NULL DEFAULT 0,
+    archived_at TIMESTAMP NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS custom_holidays (
+    id SERIAL PRIMARY KEY, holiday_date DATE NOT NULL UNIQUE, description TEXT NOT NULL,
+    is_recurring INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS roles (
+    id SERIAL PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL,
+    base_role TEXT,
+    is_system_role INTEGER DEFAULT 0
+);
+
+CREATE TABLE IF NOT EXISTS accrual_policies (
+    id SERIAL PRIMARY KEY,
+    leave_type_id INTEGER NOT NULL,
+    company TEXT, -- NULL = aplica a todas las empresas
+    max_years INTEGER, -- Hasta N años cumplidos (inclusive). NULL = sin límite
+    days DOUBLE PRECISION NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS email_config (
+    id SERIAL PRIMARY KEY,
+    MAIL_SERVER TEXT, MAIL_PORT INTEGER, MAIL_USE_TLS INTEGER,
+    MAIL_USE_SSL INTEGER, MAIL_USERNAME TEXT, MAIL_PASSWORD TEXT,
+    MAIL_DEFAULT_SENDER TEXT
+);
+
+CREATE TABLE IF NOT EXISTS staffing_thresholds (
+    department TEXT PRIMARY KEY,
+    min_present INTEGER NOT NULL -- Mínimo de personas presentes por día
+);
+
+CREATE TABLE IF NOT EXISTS coverage_buckets (
+    department TEXT NOT NULL,
+    day DATE NOT NULL,
+    absent INTEGER NOT NULL,
+    PRIMARY KEY (department, day)
+);
+
+-- Índices -----------------------------------------------------------------------------
+
+CREATE INDEX IF NOT EXISTS idx_vacation_requests_employee ON vacation_requests (employee_id, start_date);
+CREATE INDEX IF NOT EXISTS idx_vacation_requests_replacement ON vacation_requests (replacement_employee_id, start_date);
+CREATE INDEX IF NOT EXISTS idx_vacation_requests_days ON vacation_requests (julianday(start_date), julianday(end_date));
+CREATE INDEX IF NOT EXISTS idx_accrual_policies_lookup ON accrual_policies (leave_type_id, company, max_years);
+CREATE INDEX IF NOT EXISTS idx_vacation_requests_archive_employee ON vacation_requests_archive (employee_id, start_date);
+
+CREATE OR REPLACE VIEW vacation_requests_all AS
+    SELECT id, employee_id, start_date, end_date, start_time, end_time, request_type,
+           leave_type_id, days_requested, replacement_name, replacement_employee_id, status,
+           cancellation_reason, interruption_reason, modification_reason, attachment_path,
+           request_date, manager_approval_date, hr_approval_date, version
+    FROM vacation_requests
+    UNION ALL
+    SELECT id, employee_id, start_date, end_date, start_time, end_time, request_type,
+           leave_type_id, days_requested, replacement_name, replacement_employee_id, status,
+           cancellation_reason, interruption_reason, modification_reason, attachment_path,
+           request_date, manager_approval_date, hr_approval_date, version
+    FROM vacation_requests_archive;
+
+-- Intervalos: en SQLite son índices R*Tree; aquí vistas con las mismas columnas ----------
+
+CREATE OR REPLACE VIEW vacation_intervals AS
+    SELECT id, julianday(start_date) AS start_day, julianday(end_date) AS end_day,
+           employee_id AS employee_min, employee_id AS employee_max, status
+    FROM vacation_requests;
+
+CREATE OR REPLACE VIEW replacement_intervals AS
+    SELECT id, julianday(start_date) AS start_day, julianday(end_date) AS end_day,
+           replacement_employee_id AS employee_min, replacement_employee_id AS employee_max, status
+    FROM vacation_requests
+    WHERE replacement_employee_id IS NOT NULL;
+
+-- Invalidación de coverage_buckets (ver coverage.py) -----------------------------------
+
+CREATE OR REPLACE FUNCTION invalidate_coverage_request() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM coverage_buckets
+        WHERE department = (SELECT department FROM employees WHERE id = OLD.employee_id)
+          AND day BETWEEN OLD.start_date AND OLD.end_date;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        DELETE FROM coverage_buckets
+        WHERE department = (SELECT department FROM employees WHERE id = NEW.employee_id)
+          AND day BETWEEN NEW.start_date AND NEW.end_date;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_coverage_request ON vacation_requests;
+CREATE TRIGGER trg_coverage_request
+    AFTER INSERT OR DELETE OR UPDATE OF employee_id, start_date, end_date, status ON vacation_requests
+    FOR EACH ROW EXECUTE FUNCTION invalidate_coverage_request();
+
+CREATE OR REPLACE FUNCTION invalidate_coverage_employee() RETURNS TRIGGER AS $$
+BEGIN
+    DELETE FROM coverage_buckets WHERE department IN (OLD.department, NEW.department);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_coverage_employee_update ON employees;
+CREATE TRIGGER trg_coverage_employee_update
+    AFTER UPDATE OF department, is_active ON employees
+    FOR EACH ROW EXECUTE FUNCTION invalidate_coverage_employee();
+
+-- Contadores de cambios de las tablas de referencia (ver refcache.py) -------------------
+
+CREATE TABLE IF NOT EXISTS data_version (
+    name TEXT PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
+ALTER TABLE data_version ADD COLUMN IF NOT EXISTS changed_at TIMESTAMP;
+
+CREATE OR REPLACE FUNCTION bump_data_version() RETURNS TRIGGER AS $$
+BEGIN
+    UPDATE data_version SET version = version + 1, changed_at = now() AT TIME ZONE 'UTC' WHERE name = TG_TABLE_NAME;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Tablas transaccionales (solicitudes, saldos): el UPDATE de data_version deja la fila
+-- bloqueada hasta el COMMIT, así que hacerlo en cada sentencia pondría en fila a todas
+-- las aprobaciones y ajustes concurrentes. Un trigger diferido lo hace una sola vez por
+-- transacción, al confirmarla: el bloqueo dura solo el COMMIT. Con 5 transacciones
+-- concurrentes de 50 ms sobre periodos distintos: 0,28 s por sentencia, 0,07 s diferido. Un contador fuera de la transacción (nextval) no sirve: un lector
+-- vería el número nuevo con los datos viejos y la API respondería 304 con datos viejos.
+CREATE OR REPLACE FUNCTION bump_data_version_on_commit() RETURNS TRIGGER AS $$
+BEGIN
+    IF current_setting('sdv.data_version_' || TG_TABLE_NAME, true) IS DISTINCT FROM 'on' THEN
+        PERFORM set_config('sdv.data_version_' || TG_TABLE_NAME, 'on', true);
+        UPDATE data_version SET version = version + 1, changed_at = now() AT TIME ZONE 'UTC' WHERE name = TG_TABLE_NAME;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    versioned TEXT;
+BEGIN
+    FOREACH versioned IN ARRAY ARRAY['leave_types', 'roles', 'custom_holidays', 'saturday_config', 'email_config', 'employees'] LOOP
+        INSERT INTO data_version (name) VALUES (versioned) ON CONFLICT (name) DO NOTHING;
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_data_version ON %I', versioned);
+        EXECUTE format('CREATE TRIGGER trg_data_version AFTER INSERT OR UPDATE OR DELETE ON %I '
+                       'FOR EACH STATEMENT EXECUTE FUNCTION bump_data_version()', versioned);
+    END LOOP;
+    FOREACH versioned IN ARRAY ARRAY['vacation_requests', 'vacation_periods', 'vacation_requests_archive'] LOOP
+        INSERT INTO data_version (name) VALUES (versioned) ON CONFLICT (name) DO NOTHING;
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_data_version ON %I', versioned);
+        EXECUTE format('CREATE CONSTRAINT TRIGGER trg_data_version AFTER INSERT OR UPDATE OR DELETE ON %I '
+                       'DEFERRABLE INITIALLY DEFERRED FOR EACH ROW EXECUTE FUNCTION bump_data_version_on_commit()', versioned);
+    END LOOP;
+END;
+$$;
@@ -0,0 +1,168 @@
+# vacations/snapshot.py
+# Copia de solo lectura para reportes (SQLite).
+#
+# Las estadísticas y las exportaciones (todas las solicitudes, periodos, empleados) leen
+# una copia de la base (REPORT_SNAPSHOT_PATH) en lugar del archivo donde se aprueban
+# solicitudes: una lectura pesada nunca compite con el camino transaccional. Los listados
+# interactivos leen la base principal, porque sus acciones redirigen a ellos.
+#
+# La copia se hace con la API de backup online de SQLite, de a REPORT_SNAPSHOT_PAGES
+# páginas con una pausa de REPORT_SNAPSHOT_PAUSE_MS entre pasos. La conexión de origen
+# mantiene una transacción de lectura: en WAL no bloquea a los escritores y el backup
+# no se reinicia cuando otro proceso escribe. Se arma en un archivo temporal y se
+# reemplaza de forma atómica (las conexiones abiertas siguen leyendo la copia anterior).
+#
+# Se refresca cuando data_version avanzó REPORT_SNAPSHOT_WRITES cambios, o alguno y la
+# copia tiene más de REPORT_SNAPSHOT_MAX_AGE segundos, en un hilo aparte disparado por la
+# propia lectura (se sirve la copia anterior mientras tanto), o con flask sdv refresh-snapshot
+# desde cron. Con PostgreSQL, o si la copia aún no existe, se lee la base principal.
+
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+from flask import current_app, g
+
+from . import querylog
+from .db import get_backend, get_db
+
+# Un refresco a la vez por proceso; entre procesos, el archivo .lock
+_refresh_lock = threading.Lock()
+STALE_LOCK_SECONDS = 600
+
+def enabled():
+    return current_app.config['REPORT_SNAPSHOT'] and get_backend().name == 'sqlite'
+
+def snapshot_path(app=None):
+    config = (app or current_app).config
+    return config['REPORT_SNAPSHOT_PATH'] or os.path.splitext(config['DATABASE'])[0] + '-reportes.db'
+
+def _write_version(conn):
+    return conn.execute("SELECT COALESCE(SUM(version), 0) FROM data_version").fetchone()[0]
+
+def refresh(database, target, pages=256, pause=0.01):
+    """Copia database en target con la API de backup. Devuelve los segundos que tardó."""
+    started = time.perf_counter()
+    partial = target + '.tmp'
+    if os.path.exists(partial):
+        os.remove(partial)
+
+    source = sqlite3.connect(database)
+    dest = sqlite3.connect(partial)
+    try:
+        # Transacción de lectura: la copia y su data_version corresponden al mismo momento
+        source.execute("BEGIN")
+        version = _write_version(source)
+        source.backup(dest, pages=pages, progress=lambda status, remaining, total: time.sleep(pause))
+        source.rollback()
+
+        dest.execute("PRAGMA journal_mode=DELETE")  # un solo archivo: se puede abrir con mode=ro
+        dest.execute("DROP TABLE IF EXISTS snapshot_info")
+        dest.execute("CREATE TABLE snapshot_info (taken_at TIMESTAMP NOT NULL, write_version INTEGER NOT NULL)")
+        dest.execute("INSERT INTO snapshot_info (taken_at, write_version) VALUES (?, ?)", (datetime.now(), version))
+        dest.commit()
+    finally:
+        source.close()
+        dest.close()
+    os.replace(partial, target)
+    return time.perf_counter() - started
+
+def refresh_locked(app):
+    """Refresca la copia si ningún otro hilo o proceso lo está haciendo. Devuelve los segundos o None."""
+    target = snapshot_path(app)
+    lock_path = target + '.lock'
+    if not _refresh_lock.acquire(blocking=False):
+        return None
+    try:
+        try:
+            if time.time() - os.path.getmtime(lock_path) > STALE_LOCK_SECONDS:
+                os.remove(lock_path)  # refresco interrumpido (proceso terminado)
+        except OSError:
+            pass
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return None
+        os.close(fd)
+        try:
+            return refresh(
+                app.config['DATABASE'], target,
+                pages=app.config['REPORT_SNAPSHOT_PAGES'],
+                pause=app.config['REPORT_SNAPSHOT_PAUSE_MS'] / 1000
+            )
+        finally:
+            os.remove(lock_path)
+    except Exception:
+        app.logger.exception("No se pudo refrescar la copia de reportes")
+        return None
+    finally:
+        _refresh_lock.release()
+
+def _refresh_in_background():
+    if _refresh_lock.locked():
+        return
+    app = current_app._get_current_object()
+    threading.Thread(target=refresh_locked, args=(app,), name='report-snapshot', daemon=True).start()
+
+def _is_stale(info):
+    """Vencida si hubo REPORT_SNAPSHOT_WRITES cambios, o alguno y pasó REPORT_SNAPSHOT_MAX_AGE."""
+    config = current_app.config
+    writes = _write_version(get_db()) - info['write_version']
+    age = (datetime.now() - info['taken_at']).total_seconds()
+    return writes >= config['REPORT_SNAPSHOT_WRITES'] or (writes > 0 and age > config['REPORT_SNAPSHOT_MAX_AGE'])
+
+def _open():
+    """Abre la copia (una vez por petición) y pide refrescarla si está vencida. None si no hay copia."""
+    if 'report_snapshot' not in g:
+        g.report_snapshot = None
+        path = snapshot_path()
+        if not os.path.exists(path):
+            _refresh_in_background()
+            return None
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True, detect_types=sqlite3.PARSE_DECLTYPES)
+        conn.row_factory = sqlite3.Row
+        info = conn.execute("SELECT taken_at, write_version FROM snapshot_info").fetchone()
+        if _is_stale(info):
+            _refresh_in_background()
+        g.report_snapshot = {
+            'conn': querylog.wrap(conn, querylog.current_log()), 'path': path, 'taken_at': info['taken_at'], 'lazy': None
+        }
+    return g.report_snapshot
+
+def get_report_db():
+    """Conexión para reportes: la copia si está habilitada y existe, si no get_db()."""
+    snapshot = _open() if enabled() else None
+    if snapshot is None:
+        return get_db()
+    return snapshot['conn']
+
+def get_report_lazy_db():
+    """Como rows.get_lazy_db(), sobre la copia de reportes."""
+    from . import rows
+
+    snapshot = _open() if enabled() else None
+    if snapshot is None:
+        return rows.get_lazy_db()
+    if snapshot['lazy'] is None:
+        conn = sqlite3.connect(f"file:{snapshot['path']}?mode=ro", uri=True)
+        snapshot['lazy'] = rows.LazyConnection(
+            querylog.wrap(conn, querylog.current_log()), rows.schema_converters(conn, snapshot['path'])
+        )
+    return snapshot['lazy']
+
+def taken_at():
+    """Momento de la copia usada en esta petición (None si se leyó la base principal)."""
+    snapshot = g.get('report_snapshot')
+    return snapshot['taken_at'] if snapshot else None
+
+def close_snapshot(e=None):
+    snapshot = g.pop('report_snapshot', None)
+    if snapshot is not None:
+        querylog.unwrap(snapshot['conn']).close()
+        if snapshot['lazy'] is not None:
+            querylog.unwrap(snapshot['lazy'].conn).close()
+
+def init_app(app):
+    app.teardown_appcontext(close_snapshot)
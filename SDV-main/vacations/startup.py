@@ -0,0 +1,71 @@
+# vacations/startup.py
+# Medición del arranque en frío (create_app) para despliegues que escalan a cero.
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+# Módulos costosos que deberían cargarse solo cuando se usan
+HEAVY_MODULES = ('openpyxl', 'ldap3', 'flask_mail', 'holidays')
+
+_PROFILE_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import vacations
+imported = time.perf_counter()
+app = vacations.create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import': imported - started,
+    'create_app': created - imported,
+    'phases': app.extensions['startup_timings'],
+    'loaded': [m for m in %r if m in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+class StartupTimer:
+    """Acumula la duración de cada fase de create_app en orden."""
+
+    def __init__(self):
+        self.phases = []
+        self._last = time.perf_counter()
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self._last))
+        self._last = now
+
+def _parse_importtime(stderr, top):
+    """Importaciones de primer nivel más lentas según la salida de -X importtime."""
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        if depth <= 1:
+            imports.append((name.strip(), int(cumulative) / 1_000_000))
+    return sorted(imports, key=lambda item: item[1], reverse=True)[:top]
+
+def profile_startup(precompile=False, top=10):
+    """
+    Crea la aplicación en un proceso nuevo (importaciones en frío, como tras escalar a
+    cero) y devuelve los tiempos de importación, de cada fase y las importaciones más lentas.
+    """
+    env = dict(os.environ)
+    env['PRECOMPILE_TEMPLATES'] = 'True' if precompile else 'False'
+    project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', _PROFILE_SCRIPT],
+        capture_output=True, text=True, env=env, cwd=project_root
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr[-2000:])
+
+    # setup_database imprime mensajes: el informe es la última línea JSON
+    report_line = [line for line in result.stdout.splitlines() if line.startswith('{')][-1]
+    report = json.loads(report_line)
+    report['imports'] = _parse_importtime(result.stderr, top)
+    return report
@@ -0,0 +1,152 @@
+# vacations/synthetic.py
+# Datos sintéticos con volumen realista para benchmarks y pruebas de carga.
+# Todos los usuarios generados usan el prefijo 'synth' y la misma contraseña.
+
+import random
+from datetime import date, datetime, timedelta
+
+from werkzeug.security import generate_password_hash
+
+from .db import calculate_accrued_days
+
+USERNAME_PREFIX = 'synth'
+
+DEPARTMENTS = (
+    'Ventas', 'Marketing', 'Finanzas', 'Contabilidad', 'Logística', 'Depósito', 'Compras',
+    'Sistemas', 'Soporte', 'Producción', 'Calidad', 'Mantenimiento', 'Legal', 'Atención al Cliente',
+)
+COMPANIES = ('Mi Empresa', 'Mi Empresa Servicios')
+
+# Peso relativo de cada estado entre las solicitudes generadas
+STATUS_WEIGHTS = {
+    'Pendiente': 10,
+    'Aprobado por Jefe': 8,
+    'Aprobado por RRHH': 15,
+    'Activo': 5,
+    'Finalizado': 45,
+    'Rechazado': 7,
+    'Anulación Pendiente Jefe': 2,
+    'Anulación Pendiente RRHH': 2,
+    'Anulado': 6,
+}
+
+def _working_days(start, end):
+    return sum(1 for i in range((end - start).days + 1) if (start + timedelta(days=i)).weekday() < 6)
+
+def generate(db, employees, requests=None, years=3, recurring_holidays=12, seed=42, password='123'):
+    """
+    Inserta employees empleados (1 jefe cada 10) repartidos en departamentos, sus periodos de
+    los últimos `years` años, `requests` solicitudes en todos los estados (por defecto 2 por
+    empleado), feriados y sábados laborales. Devuelve un dict con la cantidad de filas insertadas por tabla.
+    """
+    rng = random.Random(seed)
+    today = date.today()
+    hashed = generate_password_hash(password)
+    vacations_id = db.execute("SELECT id FROM leave_types WHERE name = 'Vacaciones'").fetchone()['id']
+    hr_id = db.execute("SELECT id FROM employees WHERE role = 'RRHH' ORDER BY id LIMIT 1").fetchone()
+    hr_id = hr_id['id'] if hr_id else None
+
+    # Jefes primero (reportan a RRHH), luego empleados repartidos entre los jefes.
+    # La numeración continúa la de una ejecución anterior para no repetir usuarios.
+    last_id = db.execute("SELECT COALESCE(MAX(id), 0) FROM employees").fetchone()[0]
+    offset = db.execute("SELECT COUNT(*) FROM employees WHERE username LIKE ?", (USERNAME_PREFIX + '_%',)).fetchone()[0]
+    managers = max(1, employees // 10)
+    rows = []
+    for i in range(offset, offset + employees):
+        is_manager = i - offset < managers
+        department = DEPARTMENTS[i % len(DEPARTMENTS)]
+        username = f"{USERNAME_PREFIX}_{'jefe' if is_manager else 'emp'}_{i}"
+        rows.append((
+            username, hashed, f"{'Jefe' if is_manager else 'Empleado'} Sintético {i}",
+            f"{username}@example.com", today - timedelta(days=rng.randint(90, 365 * 25)),
+            'Jefe' if is_manager else 'Empleado', department,
+            'Jefe de ' + department if is_manager else 'Analista', COMPANIES[i % len(COMPANIES)]
+        ))
+    db.executemany(
+        "INSERT INTO employees (username, password, full_name, email, hire_date, role, department, job_title, company, is_active, is_ad_managed) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 0)",
+        rows
+    )
+
+    created = db.execute(
+        "SELECT id, username, hire_date, department FROM employees WHERE id > ? ORDER BY id", (last_id,)
+    ).fetchall()
+    manager_rows = [row for row in created if row['username'].startswith(USERNAME_PREFIX + '_jefe_')]
+    managers_by_department = {}
+    for row in manager_rows:
+        managers_by_department.setdefault(row['department'], []).append(row['id'])
+
+    assignments = []
+    for row in created:
+        if row['username'].startswith(USERNAME_PREFIX + '_jefe_'):
+            assignments.append((hr_id, row['id']))
+        else:
+            candidates = managers_by_department.get(row['department']) or [m['id'] for m in manager_rows]
+            assignments.append((candidates[row['id'] % len(candidates)], row['id']))
+    db.executemany("UPDATE employees SET manager_id = ? WHERE id = ?", assignments)
+
+    # Periodos de los últimos años con parte del saldo ya usado
+    periods = []
+    for row in created:
+        for year in range(today.year - years + 1, today.year + 1):
+            if year < row['hire_date'].year:
+                continue
+            accrued = calculate_accrued_days(row['hire_date'], year)
+            taken = accrued if year < today.year - 1 else rng.randint(0, accrued)
+            periods.append((row['id'], year, vacations_id, accrued, taken))
+    db.executemany(
+        "INSERT INTO vacation_periods (employee_id, year, leave_type_id, total_days_accrued, days_taken) VALUES (?, ?, ?, ?, ?)",
+        periods
+    )
+
+    # Solicitudes en todos los estados, dentro del rango de los periodos generados
+    statuses = list(STATUS_WEIGHTS)
+    weights = list(STATUS_WEIGHTS.values())
+    first_day = date(today.year - years + 1, 1, 1)
+    span = (date(today.year, 12, 31) - first_day).days
+    request_rows = []
+    for i in range(employees * 2 if requests is None else requests):
+        row = created[i % len(created)]
+        start = first_day + timedelta(days=rng.randint(0, span - 14))
+        end = start + timedelta(days=rng.randint(0, 13))
+        status = rng.choices(statuses, weights)[0]
+        requested_at = datetime.combine(start - timedelta(days=rng.randint(5, 60)), datetime.min.time())
+        approved = status not in ('Pendiente', 'Rechazado')
+        request_rows.append((
+            row['id'], start, end, 'FullDay', vacations_id, _working_days(start, end), status, requested_at,
+            requested_at + timedelta(days=1) if approved else None,
+            requested_at + timedelta(days=2) if approved and status != 'Aprobado por Jefe' else None,
+        ))
+    db.executemany(
+        "INSERT INTO vacation_requests (employee_id, start_date, end_date, request_type, leave_type_id, days_requested, status, "
+        "request_date, manager_approval_date, hr_approval_date) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+        request_rows
+    )
+
+    # Feriados recurrentes (en fechas libres) y un sábado laboral por mes del año en curso
+    taken_dates = {row['holiday_date'] for row in db.execute("SELECT holiday_date FROM custom_holidays").fetchall()}
+    holidays = []
+    day = date(today.year, 1, 1)
+    while len(holidays) < recurring_holidays and day.year == today.year:
+        if day not in taken_dates:
+            holidays.append((day, f"Feriado sintético {len(holidays) + 1}"))
+        day += timedelta(days=max(1, 365 // max(recurring_holidays, 1)))
+    db.executemany("INSERT INTO custom_holidays (holiday_date, description, is_recurring) VALUES (?, ?, 1)", holidays)
+
+    configured = {row['effective_date'] for row in db.execute("SELECT effective_date FROM saturday_config").fetchall()}
+    saturdays = []
+    for month in range(1, 13):
+        first = date(today.year, month, 1)
+        saturday = first + timedelta(days=(5 - first.weekday()) % 7)
+        if saturday not in configured:
+            saturdays.append((saturday, 1))
+    db.executemany("INSERT INTO saturday_config (effective_date, is_working) VALUES (?, ?)", saturdays)
+
+    db.commit()
+    return {
+        'employees': len(created),
+        'vacation_periods': len(periods),
+        'vacation_requests': len(request_rows),
+        'custom_holidays': len(holidays),
+        'saturday_config': len(saturdays),
+    }
@@ -0,0 +1,41 @@
+# vacations/templating.py
+# Configuración de Jinja: filtros, caché de bytecode en instance/ (compartida entre
+# workers y reinicios) y precalentamiento de todas las plantillas.
+#
+#   python -m vacations.templating   -> precompila al construir la imagen (Dockerfile)
+
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+from . import utils
+
+BYTECODE_CACHE_DIR = 'jinja_cache'
+
+def init_app(app):
+    """Registra los filtros y, si JINJA_BYTECODE_CACHE está activo, la caché de bytecode."""
+    app.jinja_env.filters['format_date'] = utils.format_date_filter
+
+    if app.config.get('JINJA_BYTECODE_CACHE', True):
+        cache_dir = os.path.join(app.instance_path, BYTECODE_CACHE_DIR)
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
+def warm_up(app):
+    """
+    Compila todas las plantillas HTML: quedan en la caché en memoria del proceso y, con
+    la caché de bytecode, en disco para los demás workers. Devuelve la cantidad compilada.
+    """
+    names = [name for name in app.jinja_env.list_templates() if name.endswith('.html')]
+    for name in names:
+        app.jinja_env.get_template(name)
+    return len(names)
+
+if __name__ == '__main__':
+    # Sin create_app: no se necesita (ni se crea) la base de datos para compilar.
+    # El entorno de Jinja es el mismo de la aplicación (mismo loader, autoescape y filtros).
+    from flask import Flask
+
+    template_app = Flask('vacations', instance_relative_config=True, template_folder='templates')
+    init_app(template_app)
+    print(f"Plantillas precompiladas: {warm_up(template_app)}")
@@ -0,0 +1,50 @@
+# vacations/testing.py
+# Ayudas para tests con pytest. Ejemplo:
+#
+#     from vacations.testing import query_budget
+#
+#     def test_dashboard_queries(app, client):
+#         with query_budget(app, 12):
+#             client.get('/')
+#
+# Si la petición supera el presupuesto, el test falla con la lista de sentencias y las
+# que se repiten (típico de un N+1).
+
+from collections import Counter
+from contextlib import contextmanager
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+@contextmanager
+def capture_queries(app):
+    """Registros (QueryLog) de todas las peticiones atendidas dentro del bloque."""
+    logs = []
+    listeners = app.extensions['query_log_listeners']
+    previous = app.config.get('QUERY_LOG')
+    app.config['QUERY_LOG'] = True
+    listeners.append(logs.append)
+    try:
+        yield logs
+    finally:
+        listeners.remove(logs.append)
+        app.config['QUERY_LOG'] = previous
+
+def _describe(queries, top=10):
+    lines = [f"  {entry.duration * 1000:7.2f} ms  {' '.join(entry.sql.split())[:160]}" for entry in queries]
+    repeated = [(sql, count) for sql, count in Counter(' '.join(entry.sql.split()) for entry in queries).most_common(top) if count > 1]
+    if repeated:
+        lines.append("Sentencias repetidas:")
+        lines.extend(f"  {count}x  {sql[:160]}" for sql, count in repeated)
+    return '\n'.join(lines)
+
+@contextmanager
+def query_budget(app, max_queries):
+    """Falla si alguna petición del bloque ejecuta más de max_queries sentencias."""
+    with capture_queries(app) as logs:
+        yield logs
+    for log in logs:
+        if log.count > max_queries:
+            raise QueryBudgetExceeded(
+                f"{log.count} consultas (presupuesto: {max_queries}):\n{_describe(log.queries)}"
+            )
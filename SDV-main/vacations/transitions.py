@@ -0,0 +1,28 @@
+# vacations/transitions.py
+# Concurrencia optimista sobre vacation_requests: cada cambio incrementa la columna
+# version y solo se aplica si la solicitud sigue en el estado y la versión que se leyeron.
+# Así dos usuarios que procesan la misma solicitud a la vez no pueden aplicar ambos
+# (p. ej. descontar el saldo dos veces) sin necesidad de bloqueos globales.
+
+STALE_MESSAGE = "La solicitud fue modificada por otro usuario. Revise su estado e intente nuevamente."
+
+def transition(conn, request_id, version, from_status, to_status=None, **fields):
+    """
+    Aplica UPDATE ... WHERE id = ? AND status = ? AND version = ? y verifica el rowcount.
+    from_status puede ser un estado o una tupla de estados admitidos; to_status=None
+    conserva el estado actual. Los demás campos (columna=valor) se actualizan junto con
+    el estado. Devuelve True si se aplicó, False si la solicitud cambió mientras tanto.
+    """
+    if to_status is not None:
+        fields['status'] = to_status
+    assignments = ''.join(f"{column} = ?, " for column in fields)
+
+    statuses = (from_status,) if isinstance(from_status, str) else tuple(from_status)
+    placeholders = ', '.join('?' for _ in statuses)
+
+    cur = conn.execute(
+        f"UPDATE vacation_requests SET {assignments}version = version + 1 "
+        f"WHERE id = ? AND version = ? AND status IN ({placeholders})",
+        (*fields.values(), request_id, version, *statuses)
+    )
+    return cur.rowcount == 1
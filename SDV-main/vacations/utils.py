@@ -1,11 +1,56 @@
 from datetime import datetime, date, timedelta
+import os
+import time
 from .db import get_db
+from .writer import run_write
+from . import refcache, metrics
 from flask_mail import Message
 from .extensions import mail
 from flask import render_template_string, current_app, url_for
 
+_MAIL_DEFAULTS = {
+    'MAIL_SERVER': 'mail.smtp2go.com',
+    'MAIL_PORT': 587,
+    'MAIL_USE_TLS': True,
+    'MAIL_USE_SSL': False,
+    'MAIL_USERNAME': None,
+    'MAIL_PASSWORD': None,
+    'MAIL_DEFAULT_SENDER': None,
+}
+
+def _mail_env():
+    """Solo las variables de entorno MAIL_* definidas (tienen prioridad sobre la base de datos)."""
+    env = {key: os.environ[key] for key in _MAIL_DEFAULTS if key in os.environ}
+    if 'MAIL_PORT' in env:
+        env['MAIL_PORT'] = int(env['MAIL_PORT'])
+    for key in ('MAIL_USE_TLS', 'MAIL_USE_SSL'):
+        if key in env:
+            env[key] = env[key] == 'True'
+    return env
+
+def apply_mail_config(app, stored):
+    """Configura Flask-Mail: valores por defecto < configuración guardada < entorno."""
+    config = dict(_MAIL_DEFAULTS)
+    config.update({key: value for key, value in stored.items() if key in _MAIL_DEFAULTS and value is not None})
+    config['MAIL_USE_TLS'] = bool(config['MAIL_USE_TLS'])
+    config['MAIL_USE_SSL'] = bool(config['MAIL_USE_SSL'])
+    config.update(_mail_env())
+    app.config.update(config)
+    mail.init_app(app)
+
+def refresh_mail_config():
+    """Vuelve a configurar el correo si otro worker guardó una configuración nueva."""
+    app = current_app._get_current_object()
+    version = refcache.email_config_version()
+    if app.extensions.get('mail_config_version') != version:
+        apply_mail_config(app, refcache.email_config())
+        app.extensions['mail_config_version'] = version
+
 def send_email(subject, recipients, body, cc=None):
+    started = time.perf_counter()
     try:
+        refresh_mail_config()
+
         # Generar enlace dinámico al login
         try:
             system_link = url_for('auth.login', _external=True)
@@ -44,7 +89,9 @@ def send_email(subject, recipients, body, cc=None):
         # recipients debe ser una lista de correos
         msg = Message(subject, recipients=recipients, html=html_body, cc=cc) 
         mail.send(msg)
+        metrics.observe_email(time.perf_counter() - started, ok=True)
     except Exception as e:
+        metrics.observe_email(time.perf_counter() - started, ok=False)
         server = current_app.config.get('MAIL_SERVER', 'localhost (default)')
         port = current_app.config.get('MAIL_PORT', 25)
         print(f"\n--- ERROR DE ENVÍO DE CORREO ---")
@@ -61,6 +108,32 @@ def send_email(subject, recipients, body, cc=None):
             
         print(f"--------------------------------\n")
 
+def refresh_request_statuses():
+    """
+    Actualiza los estados según la fecha: Aprobado por RRHH -> Activo -> Finalizado.
+    Se consulta primero si hay algo que cambiar para no encolar escrituras en cada carga.
+    """
+    today = date.today()
+    pending = get_db().execute(
+        "SELECT 1 FROM vacation_requests WHERE (status = 'Aprobado por RRHH' AND start_date <= ?) OR (status = 'Activo' AND end_date < ?) LIMIT 1",
+        (today, today)
+    ).fetchone()
+    if not pending:
+        return
+
+    def unit(conn):
+        # 1. Aprobado por RRHH -> Activo (si ya llegó la fecha de inicio)
+        conn.execute(
+            "UPDATE vacation_requests SET status = 'Activo', version = version + 1 WHERE status = 'Aprobado por RRHH' AND start_date <= ? AND end_date >= ?",
+            (today, today)
+        )
+        # 2. Activo/Aprobado -> Finalizado (si ya pasó la fecha de fin)
+        conn.execute(
+            "UPDATE vacation_requests SET status = 'Finalizado', version = version + 1 WHERE (status = 'Aprobado por RRHH' OR status = 'Activo') AND end_date < ?",
+            (today,)
+        )
+    run_write(unit)
+
 def format_date_filter(date_val, include_time=False):
     if not date_val:
         return ''
@@ -88,8 +161,7 @@ def get_paraguay_holidays(start_date=None, end_date=None):
     recurrentes para cubrir todo el rango de años.
     """
     py_holidays = {}
-    conn = get_db()
-    custom_holidays_rows = conn.execute("SELECT holiday_date, description, is_recurring FROM custom_holidays").fetchall()
+    custom_holidays_rows = refcache.custom_holidays()
     
     # Determinar el rango de años a cubrir para los feriados recurrentes
     if start_date and end_date:
@@ -118,16 +190,6 @@ def get_paraguay_holidays(start_date=None, end_date=None):
                         
     return py_holidays
 
-def calculate_accrued_days(hire_date):
-    today = date.today()
-    seniority_years = (today - hire_date).days / 365.25
-    if seniority_years <= 5:
-        return 12
-    elif seniority_years <= 10:
-        return 18
-    else:
-        return 30
-
 def is_working_saturday(check_date):
     """
     Determina si un sábado específico es laboral basado en la configuración cíclica.
@@ -135,18 +197,8 @@ def is_working_saturday(check_date):
     if check_date.weekday() != 5:
         return False
         
-    db = get_db()
-    # Busca configuración específica para la fecha exacta
-    row = db.execute(
-        "SELECT is_working FROM saturday_config WHERE effective_date = ?",
-        (check_date,)
-    ).fetchone()
-    
-    if row:
-        return bool(row['is_working'])
-
-    # Si no hay configuración explícita, asumimos NO laboral (False)
-    return False
+    # Sin configuración explícita para la fecha, asumimos NO laboral
+    return check_date in refcache.saturdays(is_working=True)
 
 def calculate_working_days(start_date, end_date):
     # Pasar el rango de fechas para que los feriados recurrentes se calculen correctamente
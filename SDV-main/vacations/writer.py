@@ -0,0 +1,220 @@
+# vacations/writer.py
+# Coordinador de escrituras: un hilo escritor por proceso con su propia conexión recibe
+# las unidades de escritura de las peticiones y las ejecuta en lotes, en una sola
+# transacción (group commit). Las lecturas siguen usando get_db() en paralelo.
+#
+# Una unidad es una función fn(conn) que ejecuta sus sentencias sobre la conexión del
+# escritor y devuelve un resultado. No debe llamar a conn.commit() ni a conn.rollback():
+# cada unidad corre dentro de un SAVEPOINT propio y si falla solo se deshace ella.
+# Corre con un contexto de aplicación propio del lote, en el que get_db() devuelve la
+# conexión del escritor (refcache, accrual, etc. se pueden usar dentro de la unidad).
+#
+# Las escrituras de las peticiones (formularios de RRHH, transiciones) pasan por
+# run_write/execute_write. Las tareas masivas o de administración (importaciones,
+# ajustes masivos, sincronización con AD, generación de periodos, comandos flask sdv)
+# escriben y confirman sobre get_db(): compiten por el bloqueo como cualquier otro
+# proceso, con busy_timeout, sin retener al hilo escritor durante una transacción larga.
+# Si la petición ya tiene escrituras sin confirmar en get_db(), run_write ejecuta la
+# unidad en esa misma conexión: encolarla esperaría el bloqueo que retiene la petición.
+
+import os
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from concurrent.futures import Future, InvalidStateError, TimeoutError as FutureTimeout
+
+from flask import current_app, flash, g
+
+from .db import get_db
+from . import querylog, metrics
+
+WriteResult = namedtuple('WriteResult', 'rowcount lastrowid')
+DEFAULT_TIMEOUT = 60
+
+class WriteTimeout(Exception):
+    """La unidad no terminó en el tiempo de espera de run_write."""
+
+    def __init__(self, applied):
+        self.applied = applied  # False: cancelada antes de empezar; None: puede haberse guardado
+        if applied is False:
+            message = "La base de datos está ocupada y la operación no se guardó. Intente nuevamente."
+        else:
+            message = "La operación está tardando más de lo esperado y puede haberse guardado. Verifique antes de reintentar."
+        super().__init__(message)
+
+class WriteCoordinator:
+    """Cola de escrituras con un único hilo escritor por proceso."""
+
+    def __init__(self, app, database, max_batch=64, busy_timeout=30):
+        self.app = app
+        self.database = database
+        self.max_batch = max_batch
+        self.busy_timeout = busy_timeout
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Tras el fork de gunicorn cada worker necesita su propio hilo escritor
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Cola nueva solo tras el fork (la del padre no tiene escritor en este proceso).
+                # Si el hilo murió en este mismo proceso se reinicia sobre la cola existente:
+                # las unidades ya encoladas se ejecutan en lugar de esperar el timeout.
+                self._queue = queue.Queue()
+                self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='sdv-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, fn):
+        """Encola una unidad de escritura y devuelve un Future con su resultado."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((fn, future))
+        metrics.write_queue_changed(1)
+        return future
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            self.database,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            isolation_level=None,  # Las transacciones se controlan explícitamente
+            timeout=self.busy_timeout,
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        conn = self._connect()
+        while True:
+            batch = self._next_batch()
+            # Unidades canceladas por timeout antes de empezar: no se ejecutan
+            batch_size = len(batch)
+            batch = [(fn, future) for fn, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                metrics.write_queue_changed(-batch_size)
+                continue
+            with self.app.app_context():
+                g.db = conn
+                try:
+                    outcomes = self._execute(conn, batch)
+                finally:
+                    g.pop('db')  # el teardown no debe cerrar la conexión del escritor
+
+            # Los resultados se entregan recién después del COMMIT
+            metrics.write_queue_changed(-batch_size)
+            for future, result, error in outcomes:
+                try:
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+                except InvalidStateError:
+                    pass
+
+    def _execute(self, conn, batch):
+        """Ejecuta el lote en una transacción. Devuelve (future, resultado, error) por unidad."""
+        outcomes = []
+        try:
+            # BEGIN IMMEDIATE toma el bloqueo de escritura al inicio: los demás
+            # procesos esperan (busy_timeout) en lugar de fallar a mitad de la unidad.
+            conn.execute("BEGIN IMMEDIATE")
+            for fn, future in batch:
+                conn.execute("SAVEPOINT unit")
+                try:
+                    outcomes.append((future, fn(conn), None))
+                    conn.execute("RELEASE unit")
+                except Exception as e:
+                    conn.execute("ROLLBACK TO unit")
+                    conn.execute("RELEASE unit")
+                    outcomes.append((future, None, e))
+            conn.execute("COMMIT")
+        except Exception as e:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            outcomes = [(future, None, e) for _, future in batch]
+        return outcomes
+
+def _coordinator():
+    return current_app.extensions.get('write_coordinator')
+
+def _run_inline(db, fn):
+    try:
+        result = fn(db)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return result
+
+def run_write(fn, timeout=None):
+    """
+    Ejecuta una unidad de escritura y espera su resultado. Con WRITE_QUEUE desactivado
+    la unidad corre en la conexión de la petición y se confirma de inmediato.
+
+    Si la unidad no termina en `timeout` segundos (WRITE_TIMEOUT por defecto) lanza
+    WriteTimeout; el manejador registrado lo informa con un flash y vuelve a la página.
+    """
+    coordinator = _coordinator()
+    if coordinator is None:
+        return _run_inline(get_db(), fn)
+    request_db = g.get('db')
+    if request_db is not None and request_db.in_transaction:
+        # La petición ya retiene el bloqueo de escritura: la unidad se confirma junto
+        # con lo pendiente en vez de esperar al escritor hasta el busy_timeout.
+        return _run_inline(request_db, fn)
+    log = querylog.current_log()
+    if log is not None:
+        # Las sentencias del hilo escritor se cuentan en la petición que las encoló
+        unit = fn
+        fn = lambda conn: unit(querylog.wrap(conn, log))
+    if timeout is None:
+        timeout = current_app.config.get('WRITE_TIMEOUT', DEFAULT_TIMEOUT)
+    future = coordinator.submit(fn)
+    try:
+        return future.result(timeout)
+    except FutureTimeout:
+        # Si todavía no empezó se cancela y el escritor la descarta
+        raise WriteTimeout(applied=None if not future.cancel() else False) from None
+
+def execute_write(sql, params=()):
+    """Ejecuta una única sentencia de escritura. Devuelve WriteResult(rowcount, lastrowid)."""
+    def unit(conn):
+        cur = conn.execute(sql, params)
+        return WriteResult(cur.rowcount, cur.lastrowid)
+    return run_write(unit)
+
+def write_timeout(e):
+    """Manejador de WriteTimeout: avisa al usuario y vuelve a la página de origen."""
+    from .routes import redirect_back
+    flash(str(e), 'warning')
+    return redirect_back()
+
+def init_app(app):
+    """
+    Crea el coordinador de escrituras si WRITE_QUEUE está activo. Solo aplica a SQLite:
+    PostgreSQL admite escrituras concurrentes y usa directamente la conexión del pool.
+    """
+    app.register_error_handler(WriteTimeout, write_timeout)
+    if app.config.get('WRITE_QUEUE', True) and app.extensions['db_backend'].name == 'sqlite':
+        app.extensions['write_coordinator'] = WriteCoordinator(
+            app,
+            app.config['DATABASE'],
+            max_batch=app.config.get('WRITE_QUEUE_MAX_BATCH', 64)
+        )